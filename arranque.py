@@ -0,0 +1,120 @@
+import importlib
+import sys
+import threading
+import time
+
+# === IMPORTACIONES DIFERIDAS Y PRECALENTAMIENTO ===
+# En un arranque en frío de Streamlit Cloud, importar google.generativeai, openai,
+# tenacity y pandas tarda varios segundos, y hasta ahora se pagaba antes de mostrar
+# el formulario de acceso. Los SDK pesados se importan recién cuando se usan (o en
+# un hilo de fondo apenas el usuario ingresa), así la pantalla de acceso se dibuja
+# al instante. Los tiempos de importación y de la primera respuesta de cada
+# proveedor quedan registrados para ver cuánto cuesta el arranque.
+_metricas = {} # nombre -> segundos (solo la primera vez)
+_lock_metricas = threading.Lock()
+
+_claves = {} # proveedor -> API key
+_clientes = {} # proveedor -> módulo del SDK ya importado y configurado
+_lock_clientes = threading.Lock()
+_precalentados = set()
+
+
+def registrar_tiempo(nombre, segundos):
+    """Registra un tiempo de arranque; si ya estaba registrado, se conserva el primero."""
+    with _lock_metricas:
+        if nombre in _metricas:
+            return
+        _metricas[nombre] = segundos
+    print(f"DEBUG: {nombre}: {segundos * 1000:.0f} ms")
+
+
+def registrar_primera_respuesta(proveedor, modelo, segundos):
+    registrar_tiempo(f"Primera respuesta de {proveedor} ({modelo})", segundos)
+
+
+def metricas_arranque():
+    """Lista de (medición, milisegundos) en el orden en que ocurrieron."""
+    with _lock_metricas:
+        return [(nombre, round(segundos * 1000, 1)) for nombre, segundos in _metricas.items()]
+
+
+def importar(nombre):
+    """Importa un módulo la primera vez que se pide y registra cuánto tardó."""
+    modulo = sys.modules.get(nombre)
+    if modulo is not None:
+        return modulo
+    inicio = time.perf_counter()
+    modulo = importlib.import_module(nombre)
+    registrar_tiempo(f"Importación de {nombre}", time.perf_counter() - inicio)
+    return modulo
+
+
+# --- CLIENTES DE LOS PROVEEDORES ---
+def configurar_gemini(api_key):
+    with _lock_clientes:
+        _claves["gemini"] = api_key
+        _clientes.pop("gemini", None) # Se vuelve a configurar en el próximo uso
+
+
+def configurar_openai(api_key):
+    with _lock_clientes:
+        _claves["openai"] = api_key
+        _clientes.pop("openai", None)
+
+
+def gemini():
+    """Módulo google.generativeai, importado y configurado con la API key en el primer uso."""
+    with _lock_clientes: # Si el precalentamiento está importando, se espera a que termine
+        genai = _clientes.get("gemini")
+        if genai is None:
+            genai = importar("google.generativeai")
+            if _claves.get("gemini"):
+                genai.configure(api_key=_claves["gemini"])
+            _clientes["gemini"] = genai
+        return genai
+
+
+def openai_sdk():
+    """Módulo openai, importado y con la API key asignada en el primer uso."""
+    with _lock_clientes:
+        openai = _clientes.get("openai")
+        if openai is None:
+            openai = importar("openai")
+            if _claves.get("openai"):
+                openai.api_key = _claves["openai"]
+            _clientes["openai"] = openai
+        return openai
+
+
+_SDK = {"gemini": gemini, "openai": openai_sdk}
+
+
+def precalentar(*proveedores, modulos=()):
+    """
+    Importa y configura en un hilo de fondo los SDK de los proveedores indicados y
+    otros módulos pesados, para que la primera clasificación no pague ese costo.
+    Cada proveedor o módulo se precalienta una sola vez por proceso.
+
+    Args:
+        proveedores (str): "gemini" y/o "openai".
+        modulos (iterable[str]): Otros módulos a importar (p. ej. "tenacity").
+    """
+    with _lock_clientes:
+        pendientes = [p for p in (*proveedores, *modulos) if p not in _precalentados]
+        _precalentados.update(pendientes)
+    if not pendientes:
+        return
+
+    def _precalentar():
+        inicio = time.perf_counter()
+        for pendiente in pendientes:
+            try:
+                if pendiente in _SDK:
+                    _SDK[pendiente]()
+                else:
+                    importar(pendiente)
+            except Exception as e: # Si falla, el error vuelve a aparecer en el primer uso real
+                print(f"DEBUG: No se pudo precalentar {pendiente}: {e}")
+        registrar_tiempo(f"Precalentamiento ({', '.join(pendientes)})", time.perf_counter() - inicio)
+
+    threading.Thread(target=_precalentar, name="precalentamiento", daemon=True).start()
@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+# === CACHÉ DE CONSULTAS CON VUELO ÚNICO ===
+# En el modo manual varios operadores suelen pegar la misma queja viral con
+# minutos de diferencia, y cada rerun de Streamlit vuelve a disparar la llamada.
+# Esta caché es compartida por todo el proceso: si una consulta idéntica ya está
+# en curso, las demás esperan su resultado en lugar de llamar otra vez a la API
+# (vuelo único), y los resultados terminados quedan en un LRU acotado con TTL.
+MAX_ENTRADAS = 512
+TTL_SEGUNDOS = 30 * 60
+ESPERA_MAXIMA_COMPARTIDA = 5 * 60 # segundos que una consulta espera la llamada idéntica en curso
+
+
+class _EnCurso:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error = None
+        self.interrumpida = False # La llamada se cortó (rerun de Streamlit, Ctrl+C) sin resultado ni error
+
+
+class CacheVueloUnico:
+    def __init__(self, max_entradas=MAX_ENTRADAS, ttl=TTL_SEGUNDOS, espera_maxima=ESPERA_MAXIMA_COMPARTIDA):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.espera_maxima = espera_maxima
+        self._entradas = OrderedDict() # clave -> (vence, valor)
+        self._en_curso = {} # clave -> _EnCurso
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.compartidas = 0 # Consultas que esperaron una llamada ya en curso
+        self.llamadas = 0
+
+    def consultar(self, clave):
+        """Valor en caché de clave, o None si no está (sin calcular ni esperar llamadas en curso)."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or entrada[0] <= time.monotonic():
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def obtener(self, clave, calcular, cachear=None):
+        """
+        Devuelve el valor de clave: de la caché, de una llamada idéntica en curso o
+        ejecutando calcular() una sola vez.
+
+        Args:
+            clave: Clave hasheable de la consulta.
+            calcular (callable): Función sin argumentos que produce el valor.
+            cachear (callable | None): cachear(valor) -> bool; si devuelve False el valor
+                se entrega a quienes esperaban pero no se guarda (p. ej. errores).
+
+        Returns:
+            tuple: (valor, origen) con origen "cache", "compartida" o "api".
+
+        Raises:
+            TimeoutError: Si la llamada idéntica en curso no termina en espera_maxima segundos.
+        """
+        while True:
+            with self._lock:
+                entrada = self._entradas.get(clave)
+                if entrada is not None:
+                    vence, valor = entrada
+                    if vence > time.monotonic():
+                        self._entradas.move_to_end(clave)
+                        self.aciertos += 1
+                        return valor, "cache"
+                    del self._entradas[clave]
+                en_curso = self._en_curso.get(clave)
+                propia = en_curso is None
+                if propia:
+                    en_curso = self._en_curso[clave] = _EnCurso()
+                    self.llamadas += 1
+                else:
+                    self.compartidas += 1
+
+            if propia:
+                break
+            if not en_curso.listo.wait(self.espera_maxima):
+                raise TimeoutError(f"La consulta idéntica en curso no terminó en {self.espera_maxima:.0f}s")
+            if en_curso.interrumpida:
+                continue # Quien llamaba se cortó (p. ej. su sesión se reinició): se vuelve a intentar
+            if en_curso.error is not None:
+                raise en_curso.error
+            return en_curso.valor, "compartida"
+
+        try:
+            en_curso.valor = calcular()
+        except Exception as e:
+            en_curso.error = e
+            raise
+        except BaseException:
+            en_curso.interrumpida = True # No se le pasa a los demás un RerunException o KeyboardInterrupt ajeno
+            raise
+        finally:
+            # Siempre se libera la clave y se despierta a quienes esperan, aunque cachear falle
+            try:
+                with self._lock:
+                    del self._en_curso[clave]
+                    if en_curso.error is None and not en_curso.interrumpida and (cachear is None or cachear(en_curso.valor)):
+                        self._entradas[clave] = (time.monotonic() + self.ttl, en_curso.valor)
+                        self._entradas.move_to_end(clave)
+                        while len(self._entradas) > self.max_entradas:
+                            self._entradas.popitem(last=False)
+            finally:
+                en_curso.listo.set()
+        return en_curso.valor, "api"
+
+    def resumen(self):
+        return (f"{len(self._entradas)} consultas en caché · {self.aciertos} aciertos · "
+                f"{self.compartidas} compartidas · {self.llamadas} llamadas a la API")
@@ -0,0 +1,112 @@
+import hashlib
+from io import BytesIO
+
+import pandas as pd
+import streamlit as st
+
+# === CACHÉ DE ARCHIVOS SUBIDOS ===
+# Streamlit vuelve a ejecutar todo el script con cada cambio de un widget.
+# Para no parsear el archivo en cada rerun, los resultados se guardan con
+# st.cache_data usando como clave el hash del contenido del archivo.
+# El tope de entradas y el TTL evitan que la memoria crezca sin límite:
+# al superarse, Streamlit descarta primero las entradas más viejas.
+MAX_ARCHIVOS_EN_CACHE = 4
+TTL_CACHE_SEGUNDOS = 60 * 60
+
+
+def datos_de_subida(archivo):
+    """
+    Devuelve el contenido en bytes de un archivo subido y su hash SHA-256.
+
+    Args:
+        archivo: Objeto devuelto por st.file_uploader.
+
+    Returns:
+        tuple: (contenido, hash_contenido).
+    """
+    contenido = archivo.getvalue()
+    return contenido, hashlib.sha256(contenido).hexdigest()
+
+
+def _es_csv(nombre):
+    return nombre.lower().endswith(".csv")
+
+
+def _leer_excel(contenido, **kwargs):
+    """
+    Lee un .xlsx con el motor calamine (Rust, mucho más rápido que openpyxl).
+    Si python-calamine no está instalado o pandas es anterior a 2.2, se usa openpyxl;
+    cualquier otro error (columna inexistente, archivo dañado) se propaga tal cual.
+    """
+    try:
+        return pd.read_excel(BytesIO(contenido), engine="calamine", **kwargs)
+    except (ImportError, ValueError) as e:
+        # Solo se cae a openpyxl si falta el motor (python-calamine sin instalar o pandas anterior a 2.2)
+        if isinstance(e, ValueError) and not str(e).startswith("Unknown engine"):
+            raise
+        print(f"DEBUG: No se pudo usar calamine ({e}). Usando openpyxl.") # Debugging
+        return pd.read_excel(BytesIO(contenido), engine="openpyxl", **kwargs)
+
+
+def leer_datos(nombre, contenido, columnas=None):
+    """
+    Lee un .csv o .xlsx sin pasar por la caché de Streamlit (p. ej. desde scripts sin interfaz).
+
+    Args:
+        nombre (str): Nombre del archivo; define si se lee como CSV o Excel.
+        contenido (bytes): Contenido del archivo.
+        columnas (list | None): Si se indica, solo se cargan esas columnas (usecols).
+    """
+    if _es_csv(nombre):
+        return pd.read_csv(BytesIO(contenido), usecols=columnas)
+    return _leer_excel(contenido, usecols=columnas)
+
+
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE, ttl=TTL_CACHE_SEGUNDOS, show_spinner=False)
+def leer_columnas(hash_contenido, nombre, _contenido):
+    """
+    Lee solo la fila de encabezados del archivo para poblar el selector de columnas.
+
+    El contenido (_contenido) no se hashea: la clave de caché es hash_contenido.
+    """
+    if _es_csv(nombre):
+        encabezado = pd.read_csv(BytesIO(_contenido), nrows=0)
+    else:
+        encabezado = _leer_excel(_contenido, nrows=0)
+    return encabezado.columns.tolist()
+
+
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE, ttl=TTL_CACHE_SEGUNDOS, show_spinner="Leyendo archivo...")
+def leer_archivo(hash_contenido, nombre, _contenido):
+    """
+    Lee el archivo completo. Solo hace falta al armar el archivo de salida;
+    para clasificar alcanza con leer_columna.
+
+    st.cache_data devuelve una copia en cada llamada, así que el DataFrame
+    se puede modificar (agregar columnas de resultado) sin alterar la caché.
+    """
+    return leer_datos(nombre, _contenido)
+
+
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE, ttl=TTL_CACHE_SEGUNDOS, show_spinner="Leyendo columna...")
+def leer_columna(hash_contenido, nombre, columna, _contenido):
+    """
+    Lee únicamente la columna a clasificar (usecols), sin cargar el resto de la planilla.
+
+    Returns:
+        pd.Series: La columna elegida, con el mismo índice que el archivo completo.
+    """
+    return leer_datos(nombre, _contenido, [columna])[columna]
+
+
+@st.cache_data(max_entries=MAX_ARCHIVOS_EN_CACHE, ttl=TTL_CACHE_SEGUNDOS, show_spinner="Leyendo hojas...")
+def leer_hojas(hash_contenido, nombre, _contenido):
+    """
+    Lee todas las hojas de un .xlsx (sheet_name=None). Un CSV se devuelve como una sola hoja.
+
+    Returns:
+        dict: {nombre_hoja: DataFrame} en el orden del libro.
+    """
+    if _es_csv(nombre):
+        return {nombre.rsplit(".", 1)[0]: pd.read_csv(BytesIO(_contenido))}
+    return _leer_excel(_contenido, sheet_name=None)
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+
+from arranque import gemini, registrar_primera_respuesta
+
+# === CASETE: GRABAR Y REPRODUCIR RESPUESTAS DEL PROVEEDOR ===
+# Cada corrida de prueba o demo sobre el mismo archivo de muestra gasta llamadas
+# reales y sufre la latencia de la red. Con el casete activo, las respuestas de
+# Gemini (texto, uso de tokens y duración) se graban en un SQLite local, con el
+# texto comprimido, y se reproducen de forma determinista, opcionalmente
+# simulando la latencia grabada. Así se puede trabajar sobre parseo, lotes e
+# interfaz sin conexión y a máxima velocidad.
+#
+# Se configura por variables de entorno:
+#   CASETE_MODO: apagado (por defecto) | grabar | reproducir | reproducir_o_grabar
+#   CASETE_RUTA: archivo SQLite (por defecto casete.sqlite)
+#   CASETE_LATENCIA: factor sobre la duración grabada (0 = sin espera, 1 = latencia real)
+APAGADO = "apagado"
+GRABAR = "grabar"
+REPRODUCIR = "reproducir"
+REPRODUCIR_O_GRABAR = "reproducir_o_grabar"
+MODOS = (APAGADO, GRABAR, REPRODUCIR, REPRODUCIR_O_GRABAR)
+
+_config = {
+    "modo": os.getenv("CASETE_MODO", APAGADO),
+    "ruta": os.getenv("CASETE_RUTA", "casete.sqlite"),
+    "latencia": float(os.getenv("CASETE_LATENCIA", "0")),
+}
+_lock = threading.Lock()
+_conexion = None
+
+
+class GrabacionNoEncontrada(LookupError):
+    """En modo reproducir, el prompt no está en el casete."""
+
+
+def configurar_casete(modo=None, ruta=None, latencia=None):
+    """Cambia la configuración en tiempo de ejecución (p. ej. desde un script de prueba)."""
+    global _conexion
+    with _lock:
+        if modo is not None:
+            if modo not in MODOS:
+                raise ValueError(f"Modo de casete desconocido: {modo}")
+            _config["modo"] = modo
+        if ruta is not None and ruta != _config["ruta"]:
+            _config["ruta"] = ruta
+            if _conexion is not None:
+                _conexion.close()
+                _conexion = None
+        if latencia is not None:
+            _config["latencia"] = latencia
+
+
+def modo_casete():
+    return _config["modo"]
+
+
+def _db():
+    """Conexión única compartida entre hilos (se usa siempre bajo _lock)."""
+    global _conexion
+    if _conexion is None:
+        _conexion = sqlite3.connect(_config["ruta"], check_same_thread=False)
+        _conexion.execute(
+            "CREATE TABLE IF NOT EXISTS grabaciones ("
+            "clave TEXT PRIMARY KEY, modelo TEXT, respuesta BLOB, "
+            "tokens_entrada INTEGER, tokens_salida INTEGER, tokens_razonamiento INTEGER, "
+            "segundos REAL, grabado TEXT)"
+        )
+    return _conexion
+
+
+def _clave(modelo, prompt, generation_config):
+    datos = json.dumps([modelo, prompt, generation_config], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(datos.encode("utf-8")).hexdigest()
+
+
+def _respuesta(texto, entrada, salida, razonamiento):
+    """Objeto con la misma forma que usa el código de la respuesta de Gemini (.text y .usage_metadata)."""
+    uso = SimpleNamespace(
+        prompt_token_count=entrada,
+        candidates_token_count=salida,
+        thoughts_token_count=razonamiento,
+        total_token_count=entrada + salida + razonamiento,
+    )
+    return SimpleNamespace(text=texto, usage_metadata=uso)
+
+
+class _RespuestaEnVivo:
+    """
+    Envuelve una respuesta en streaming: se itera por fragmentos (.text) igual que la
+    de Gemini y, al terminar, graba el texto completo si corresponde. usage_metadata
+    está disponible después de recorrerla.
+    """
+
+    def __init__(self, fragmentos, usage_metadata=None, al_terminar=None):
+        self._fragmentos = fragmentos
+        self._usage_metadata = usage_metadata
+        self._al_terminar = al_terminar
+        self.text = ""
+
+    def __iter__(self):
+        for fragmento in self._fragmentos:
+            try:
+                texto = fragmento.text
+            except ValueError: # Fragmentos sin partes de texto (p. ej. el de cierre)
+                continue
+            self.text += texto
+            yield SimpleNamespace(text=texto)
+        if self._al_terminar:
+            self._al_terminar(self)
+
+    @property
+    def usage_metadata(self):
+        if self._usage_metadata is not None:
+            return self._usage_metadata
+        return getattr(self._fragmentos, "usage_metadata", None)
+
+
+def _fragmentos_grabados(texto, segundos):
+    """Reproduce una respuesta grabada línea por línea, repartiendo la latencia simulada."""
+    lineas = texto.splitlines(keepends=True) or [texto]
+    for linea in lineas:
+        if _config["latencia"] > 0:
+            time.sleep(segundos * _config["latencia"] / len(lineas))
+        yield SimpleNamespace(text=linea)
+
+
+def _buscar(clave):
+    with _lock:
+        fila = _db().execute(
+            "SELECT respuesta, tokens_entrada, tokens_salida, tokens_razonamiento, segundos FROM grabaciones WHERE clave = ?",
+            (clave,),
+        ).fetchone()
+    if fila is None:
+        return None
+    respuesta, entrada, salida, razonamiento, segundos = fila
+    return _respuesta(zlib.decompress(respuesta).decode("utf-8"), entrada, salida, razonamiento), segundos
+
+
+def _grabar(clave, modelo, response, segundos):
+    uso = getattr(response, "usage_metadata", None)
+    with _lock:
+        conexion = _db()
+        conexion.execute(
+            "INSERT OR REPLACE INTO grabaciones VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                clave, modelo, zlib.compress(response.text.encode("utf-8")),
+                getattr(uso, "prompt_token_count", 0) or 0,
+                getattr(uso, "candidates_token_count", 0) or 0,
+                getattr(uso, "thoughts_token_count", 0) or 0,
+                segundos, datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        conexion.commit()
+
+
+def _llamar(modelo, prompt, generation_config, stream):
+    inicio = time.perf_counter()
+    response = gemini().GenerativeModel(modelo).generate_content(prompt, generation_config=generation_config, stream=stream)
+    registrar_primera_respuesta("Gemini", modelo, time.perf_counter() - inicio)
+    return response
+
+
+def generar_contenido(modelo, prompt, generation_config=None, stream=False):
+    """
+    Equivalente a genai.GenerativeModel(modelo).generate_content(prompt, generation_config=..., stream=...)
+    que pasa por el casete según el modo configurado. Con stream=True la respuesta se
+    recorre por fragmentos; las grabadas se reproducen línea por línea.
+
+    Raises:
+        GrabacionNoEncontrada: En modo reproducir, si el prompt no fue grabado.
+    """
+    modo = _config["modo"]
+    if modo == APAGADO:
+        response = _llamar(modelo, prompt, generation_config, stream)
+        return _RespuestaEnVivo(response) if stream else response
+
+    clave = _clave(modelo, prompt, generation_config)
+    if modo in (REPRODUCIR, REPRODUCIR_O_GRABAR):
+        grabada = _buscar(clave)
+        if grabada is not None:
+            response, segundos = grabada
+            if stream:
+                return _RespuestaEnVivo(_fragmentos_grabados(response.text, segundos), response.usage_metadata)
+            if _config["latencia"] > 0:
+                time.sleep(segundos * _config["latencia"])
+            return response
+        if modo == REPRODUCIR:
+            raise GrabacionNoEncontrada(f"Sin grabación en {_config['ruta']} para este prompt ({modelo})")
+
+    inicio = time.perf_counter()
+    response = _llamar(modelo, prompt, generation_config, stream)
+    if stream:
+        return _RespuestaEnVivo(response, al_terminar=lambda r: _grabar(clave, modelo, r, time.perf_counter() - inicio))
+    _grabar(clave, modelo, response, time.perf_counter() - inicio)
+    return response
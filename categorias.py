@@ -0,0 +1,124 @@
+import difflib
+import functools
+import re
+import unicodedata
+
+# === CATEGORÍAS CANÓNICAS ===
+# Son las 11 etiquetas que aparecen en los prompts. Cualquier salida del modelo
+# se mapea sobre esta lista antes de guardarse en el archivo.
+CATEGORIAS = [
+    "Servicio Operativo y Frecuencia",
+    "Infraestructura y Mantenimiento",
+    "Seguridad y Control",
+    "Atención al Usuario",
+    "Otros",
+    "Conducta de Terceros",
+    "Incidentes y Emergencias",
+    "Accesibilidad y Público Vulnerable",
+    "Personal y Desempeño Laboral",
+    "Ambiente y Confort",
+    "Tarifas y Boletos",
+]
+CATEGORIAS_VALIDAS = frozenset(CATEGORIAS)
+
+# Similitud mínima (difflib, 0 a 1) para aceptar una coincidencia aproximada
+UMBRAL_SIMILITUD = 0.8
+
+
+def _clave(texto):
+    """Pasa a minúsculas, quita acentos, signos de puntuación y espacios repetidos."""
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^a-z0-9 ]", " ", texto.lower())
+    return " ".join(texto.split())
+
+
+# Tabla precalculada clave normalizada -> categoría canónica
+_CLAVES = {_clave(c): c for c in CATEGORIAS}
+
+
+@functools.lru_cache(maxsize=2048)
+def normalizar_categoria(texto):
+    """
+    Mapea la categoría devuelta por el modelo a una de las 11 categorías canónicas.
+
+    Acepta variantes de mayúsculas, acentos, puntuación y markdown
+    (p. ej. "servicio operativo y frecuencia." o "**Otros**").
+
+    Args:
+        texto (str): Categoría tal como la devolvió el modelo.
+
+    Returns:
+        str | None: La categoría canónica, o None si no hay una coincidencia confiable.
+    """
+    clave = _clave(texto or "")
+    if not clave:
+        return None
+    if clave in _CLAVES:
+        return _CLAVES[clave]
+
+    # El modelo a veces agrega texto alrededor ("categoria otros", "otros ninguna aplica")
+    contenidas = [c for k, c in _CLAVES.items() if re.search(rf"\b{re.escape(k)}\b", clave)]
+    if len(contenidas) == 1:
+        return contenidas[0]
+
+    parecidas = difflib.get_close_matches(clave, _CLAVES.keys(), n=1, cutoff=UMBRAL_SIMILITUD)
+    if parecidas:
+        return _CLAVES[parecidas[0]]
+    return None
+
+
+def es_categoria_valida(categoria):
+    return categoria in CATEGORIAS_VALIDAS
+
+
+def parsear_respuesta(respuesta):
+    """
+    Extrae categoría y razón de una respuesta con el formato
+    "Categoría: ... / Razón: ...". La categoría se normaliza cuando es posible;
+    si no coincide con ninguna canónica se devuelve tal cual vino.
+
+    Returns:
+        tuple: (categoria, razon)
+    """
+    categoria, razon = "", ""
+    for linea in respuesta.splitlines():
+        # Quita viñetas y markdown al inicio ("- ", "**Categoría:**")
+        linea = linea.strip().lstrip("-*#> ").replace("**", "")
+        if linea.lower().startswith("categoría:") or linea.lower().startswith("categoria:"):
+            categoria = linea.split(":", 1)[1].strip()
+        elif linea.lower().startswith("razón:") or linea.lower().startswith("razon:"):
+            razon = linea.split(":", 1)[1].strip()
+    return normalizar_categoria(categoria) or categoria, razon
+
+
+def armar_prompt(texto):
+    """Prompt de clasificación individual (categoría + razón) para una queja."""
+    lista = "\n".join(f"- {c}" for c in CATEGORIAS)
+    return f"""Leé la siguiente queja de un pasajero y devolvé SOLO:
+
+1. La categoría más adecuada según esta lista centrándote en la causa raíz:
+{lista}
+
+2. Una breve razón de por qué fue clasificada así.
+
+Formato de salida:
+Categoría: <nombre de categoría>
+Razón: <explicación>
+
+Texto: {texto}
+"""
+
+
+def prompt_repregunta(texto, categoria_recibida):
+    """
+    Prompt corto para volver a preguntar solo la categoría de una fila cuya
+    respuesta no coincidió con ninguna categoría válida.
+    """
+    lista = "\n".join(f"- {c}" for c in CATEGORIAS)
+    return f"""Para la siguiente queja se respondió la categoría "{categoria_recibida}", que no es válida.
+Respondé SOLO con el nombre exacto de una de estas categorías, sin nada más:
+{lista}
+
+Texto: {texto}
+"""
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import deque
+
+# === CORTACIRCUITOS POR PROVEEDOR/MODELO ===
+# En lugar de abortar la corrida tras N errores consecutivos, el circuito se abre
+# cuando la tasa de errores de las últimas llamadas supera un umbral, pausa los
+# envíos y luego deja pasar una única llamada de prueba (semiabierto). Si la prueba
+# funciona, el circuito se cierra y la corrida sigue sola; si falla, se vuelve a
+# abrir con una pausa más larga.
+CERRADO = "cerrado"
+ABIERTO = "abierto"
+SEMIABIERTO = "semiabierto"
+
+VENTANA_LLAMADAS = 20
+MINIMO_LLAMADAS = 5
+UMBRAL_TASA_ERRORES = 0.5
+PAUSA_INICIAL = 15 # segundos
+PAUSA_MAXIMA = 300
+TIEMPO_MAXIMO_ABIERTO = 60 * 60 # Tras una hora sin recuperarse se da la corrida por cortada
+
+
+class Circuito:
+    """
+    Cortacircuitos de un proveedor/modelo. Es seguro entre hilos y se comparte
+    entre todas las corridas del proceso (ver obtener_circuito).
+    """
+
+    def __init__(self, nombre, ventana=VENTANA_LLAMADAS, minimo_llamadas=MINIMO_LLAMADAS,
+                 umbral=UMBRAL_TASA_ERRORES, pausa_inicial=PAUSA_INICIAL,
+                 pausa_maxima=PAUSA_MAXIMA, tiempo_maximo_abierto=TIEMPO_MAXIMO_ABIERTO):
+        self.nombre = nombre
+        self.minimo_llamadas = minimo_llamadas
+        self.umbral = umbral
+        self.pausa_inicial = pausa_inicial
+        self.pausa_maxima = pausa_maxima
+        self.tiempo_maximo_abierto = tiempo_maximo_abierto
+        self.estado = CERRADO
+        self.aperturas = 0
+        self._resultados = deque(maxlen=ventana) # True = éxito, False = error
+        self._pausa = pausa_inicial
+        self._reintentar_en = 0.0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def tasa_errores(self):
+        if not self._resultados:
+            return 0.0
+        return self._resultados.count(False) / len(self._resultados)
+
+    def permitir(self):
+        """
+        Indica si se puede enviar una llamada ahora. En estado semiabierto solo
+        se permite una llamada de prueba a la vez.
+        """
+        with self._lock:
+            if self.estado == CERRADO:
+                return True
+            if self.estado == ABIERTO and time.monotonic() >= self._reintentar_en:
+                self.estado = SEMIABIERTO
+                self._prueba_en_curso = False
+            if self.estado == SEMIABIERTO and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            return False
+
+    def esperar_turno(self, al_esperar=None, intervalo_aviso=5.0):
+        """
+        Bloquea hasta que el circuito permita enviar una llamada.
+
+        Args:
+            al_esperar (callable | None): Se llama cada intervalo_aviso segundos con
+                los segundos que faltan para la próxima prueba (para avisar en la UI).
+
+        Returns:
+            bool: False si el circuito lleva abierto más de tiempo_maximo_abierto.
+        """
+        ultimo_aviso = 0.0
+        while not self.permitir():
+            if self._abierto_desde and time.monotonic() - self._abierto_desde > self.tiempo_maximo_abierto:
+                return False
+            if al_esperar and time.monotonic() - ultimo_aviso >= intervalo_aviso:
+                ultimo_aviso = time.monotonic()
+                al_esperar(max(0.0, self._reintentar_en - time.monotonic()))
+            time.sleep(0.5)
+        return True
+
+    def registrar_exito(self):
+        with self._lock:
+            if self.estado != CERRADO:
+                print(f"DEBUG: Circuito {self.nombre} cerrado tras una prueba exitosa.")
+                self.estado = CERRADO
+                self._resultados.clear()
+                self._pausa = self.pausa_inicial
+                self._abierto_desde = None
+            self._prueba_en_curso = False
+            self._resultados.append(True)
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._prueba_en_curso = False
+            if self.estado == SEMIABIERTO:
+                # La prueba falló: se vuelve a abrir con una pausa más larga
+                self._pausa = min(self._pausa * 2, self.pausa_maxima)
+                self._abrir()
+                return
+            self._resultados.append(False)
+            if (self.estado == CERRADO and len(self._resultados) >= self.minimo_llamadas
+                    and self.tasa_errores() >= self.umbral):
+                self._abrir()
+
+    def _abrir(self):
+        self.estado = ABIERTO
+        self.aperturas += 1
+        self._reintentar_en = time.monotonic() + self._pausa
+        if self._abierto_desde is None:
+            self._abierto_desde = time.monotonic()
+        print(f"DEBUG: Circuito {self.nombre} abierto. Próxima prueba en {self._pausa:.0f}s.")
+
+
+_circuitos = {}
+_lock_circuitos = threading.Lock()
+
+
+def obtener_circuito(proveedor, modelo):
+    """Devuelve el circuito compartido de un proveedor/modelo, creándolo si no existe."""
+    clave = f"{proveedor}/{modelo}"
+    with _lock_circuitos:
+        if clave not in _circuitos:
+            _circuitos[clave] = Circuito(clave)
+        return _circuitos[clave]
@@ -0,0 +1,157 @@
+from arranque import configurar_gemini
+from categorias import armar_prompt, parsear_respuesta, normalizar_categoria, es_categoria_valida, prompt_repregunta
+from planificador import registrar_uso
+from modelo_local import MODELO_LOCAL, obtener_clasificador_local
+from perfilado import medir
+from casete import generar_contenido
+from cache_consultas import CacheVueloUnico
+
+# === NÚCLEO DE CLASIFICACIÓN (SIN STREAMLIT) ===
+# La llamada a Gemini vive acá para que la use tanto la app de Streamlit como el
+# procesamiento por fragmentos sin interfaz (fragmentos.py).
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Modelo liviano para repreguntar solo la categoría cuando la respuesta no es válida
+MODELO_REPREGUNTA = "gemini-2.5-flash-lite"
+
+
+def configurar(api_key):
+    """Guarda la API key; el SDK de Gemini se importa y configura en el primer uso (ver arranque.py)."""
+    configurar_gemini(api_key)
+
+
+def clasificar_queja_con_razon(texto, presupuesto=None, modelo=GEMINI_MODEL, perfilador=None):
+    if modelo == MODELO_LOCAL:
+        return clasificar_quejas_local([texto], perfilador=perfilador)[0]
+
+    with medir(perfilador, "Armado del prompt"):
+        prompt = armar_prompt(texto)
+    try:
+        with medir(perfilador, "Red (llamada a Gemini)"):
+            response = generar_contenido(modelo, prompt)
+        with medir(perfilador, "Parseo de la respuesta"):
+            # Uso real de tokens: calibra la estimación previa y descuenta del presupuesto
+            registrar_uso(prompt, getattr(response, "usage_metadata", None), presupuesto=presupuesto)
+            respuesta = response.text.strip()
+
+            categoria, razon = parsear_respuesta(respuesta)
+        return categoria, razon
+
+    except Exception as e:
+        print(f"DEBUG: Error en clasificar_queja_con_razon para texto '{texto[:50]}...': {e}") # Debugging
+        return "ERROR", str(e)
+
+
+def clasificar_queja_en_vivo(texto, al_recibir, modelo=GEMINI_MODEL):
+    """
+    Clasifica una queja con la respuesta en streaming. Llama a al_recibir("categoria", valor)
+    apenas se completa la línea de la categoría y a al_recibir("razon", parcial) a medida
+    que llega la razón.
+
+    Returns:
+        tuple: (categoria, razon), igual que clasificar_queja_con_razon.
+    """
+    prompt = armar_prompt(texto)
+    try:
+        response = generar_contenido(modelo, prompt, stream=True)
+        recibido, categoria = "", ""
+        for fragmento in response:
+            recibido += fragmento.text
+            if not categoria:
+                # Solo se miran las líneas completas para no mostrar una categoría cortada
+                categoria, _ = parsear_respuesta(recibido[:recibido.rfind("\n") + 1])
+                if categoria:
+                    al_recibir("categoria", categoria)
+            else:
+                _, razon = parsear_respuesta(recibido)
+                if razon:
+                    al_recibir("razon", razon)
+        registrar_uso(prompt, getattr(response, "usage_metadata", None))
+
+        categoria, razon = parsear_respuesta(recibido.strip())
+        return categoria, razon
+
+    except Exception as e:
+        print(f"DEBUG: Error en clasificar_queja_en_vivo para texto '{texto[:50]}...': {e}") # Debugging
+        return "ERROR", str(e)
+
+
+def clasificar_quejas_local(textos, al_avanzar=None, perfilador=None):
+    """
+    Clasifica muchas quejas de una vez con el modelo ONNX local (sin API ni costo).
+    Devuelve [(categoria, razon)] en el mismo orden; ante un error, todas quedan como ERROR.
+    """
+    try:
+        with medir(perfilador, "Inferencia del modelo local"):
+            return obtener_clasificador_local().clasificar(textos, al_avanzar)
+    except Exception as e:
+        print(f"DEBUG: Error en el modelo local: {e}") # Debugging
+        return [("ERROR", str(e))] * len(textos)
+
+
+def repreguntar_categoria(texto, categoria_recibida, presupuesto=None):
+    """
+    Vuelve a pedir únicamente la categoría de una queja cuya respuesta no coincidió
+    con ninguna categoría canónica. Devuelve la categoría normalizada o None.
+    El uso de tokens se descuenta del presupuesto de la corrida, si se pasa.
+    """
+    try:
+        prompt = prompt_repregunta(texto, categoria_recibida)
+        response = generar_contenido(MODELO_REPREGUNTA, prompt, generation_config={"temperature": 0})
+        registrar_uso(prompt, getattr(response, "usage_metadata", None), presupuesto=presupuesto, calibrar_salida=False)
+        return normalizar_categoria(response.text.strip())
+    except Exception as e:
+        print(f"DEBUG: Error al repreguntar la categoría para texto '{texto[:50]}...': {e}") # Debugging
+        return None
+
+
+# Compartida por todas las sesiones del proceso (el módulo se importa una sola vez)
+_cache_consultas = CacheVueloUnico()
+
+
+def clasificar_queja_cacheada(texto, modelo=GEMINI_MODEL, al_recibir=None, presupuesto=None):
+    """
+    Clasificación con caché de proceso (modo manual y modo de varios archivos):
+    reutiliza resultados recientes de la misma queja y comparte la llamada si otra
+    sesión o hilo ya la está clasificando. Solo se guardan en caché las respuestas
+    con categoría válida; si ni la repregunta da una categoría reconocida, la fila
+    queda como ERROR_CATEGORIA (igual que en el modo archivo). Si se pasa al_recibir, la llamada a la API se hace en
+    streaming (ver clasificar_queja_en_vivo).
+
+    Returns:
+        tuple: (categoria, razon, origen) con origen "cache", "compartida" o "api".
+    """
+    def calcular():
+        if al_recibir:
+            categoria, razon = clasificar_queja_en_vivo(texto, al_recibir, modelo)
+        else:
+            categoria, razon = clasificar_queja_con_razon(texto, presupuesto, modelo)
+        if categoria != "ERROR" and not es_categoria_valida(categoria):
+            canonica = repreguntar_categoria(texto, categoria, presupuesto)
+            if canonica:
+                categoria = canonica
+            else:
+                categoria, razon = "ERROR_CATEGORIA", f"Categoría no reconocida: '{categoria}'. {razon}"
+        return categoria, razon
+
+    try:
+        (categoria, razon), origen = _cache_consultas.obtener(
+            _clave_consulta(texto, modelo), calcular, cachear=lambda r: es_categoria_valida(r[0])
+        )
+    except TimeoutError as e: # La llamada idéntica de otra sesión quedó colgada
+        print(f"DEBUG: {e}") # Debugging
+        return "ERROR", str(e), "compartida"
+    return categoria, razon, origen
+
+
+def consultar_cache(texto, modelo=GEMINI_MODEL):
+    """(categoria, razon) si la queja ya está en la caché de proceso; None si no."""
+    return _cache_consultas.consultar(_clave_consulta(texto, modelo))
+
+
+def _clave_consulta(texto, modelo):
+    return (modelo, " ".join(texto.split()))
+
+
+def resumen_cache():
+    return _cache_consultas.resumen()
@@ -1,9 +1,7 @@
 import streamlit as st
-import pandas as pd
 import time
-from io import BytesIO
 import os
-import google.generativeai as genai
+from arranque import configurar_gemini, precalentar, registrar_tiempo, metricas_arranque
 
 # === CONFIGURACIÓN BÁSICA DE LA APP ===
 # st.set_page_config(page_title="Clasificador de Quejas", layout="centered")
@@ -38,55 +36,39 @@ if not API_KEY:
     st.error("❌ API Key no configurada. Definila como variable de entorno GEMINI_API_KEY en Streamlit Cloud.")
     st.stop()
 
-genai.configure(api_key=API_KEY)
-
-# === FUNCIÓN DE CLASIFICACIÓN ===
-def clasificar_queja_con_razon(texto):
-    prompt = f"""Leé la siguiente queja de un pasajero y devolvé SOLO:
-
-1. La categoría más adecuada según esta lista centrándote en la causa raíz:
-- Servicio Operativo y Frecuencia
-- Infraestructura y Mantenimiento
-- Seguridad y Control
-- Atención al Usuario
-- Otros
-- Conducta de Terceros
-- Incidentes y Emergencias
-- Accesibilidad y Público Vulnerable
-- Personal y Desempeño Laboral
-- Ambiente y Confort
-- Tarifas y Boletos
-
-2. Una breve razón de por qué fue clasificada así.
-
-Formato de salida:
-Categoría: <nombre de categoría>
-Razón: <explicación>
-
-Texto: {texto}
-"""
-    try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        response = model.generate_content(prompt)
-        respuesta = response.text.strip()
-
-        categoria, razon = "", ""
-        for linea in respuesta.splitlines():
-            if linea.lower().startswith("categoría:") or linea.lower().startswith("categoria:"):
-                categoria = linea.split(":", 1)[1].strip()
-            elif linea.lower().startswith("razón:") or linea.lower().startswith("razon:"):
-                razon = linea.split(":", 1)[1].strip()
-        return categoria, razon
-
-    except Exception as e:
-        print(f"DEBUG: Error en clasificar_queja_con_razon para texto '{texto[:50]}...': {e}") # Debugging
-        return "ERROR", str(e)
+# El SDK se importa y configura en segundo plano mientras se cargan los módulos de la app
+configurar_gemini(API_KEY)
+precalentar("gemini")
+
+# === IMPORTACIONES (DESPUÉS DEL ACCESO) ===
+# La pantalla de acceso se dibuja solo con streamlit: pandas y los módulos de la app
+# se importan recién con el usuario adentro (ver arranque.py).
+inicio_importacion = time.perf_counter()
+import pandas as pd
+from io import BytesIO
+from carga_archivos import datos_de_subida, leer_columnas, leer_columna, leer_archivo, leer_hojas
+from progreso import ReporteProgreso
+from modo_batch import enviar_trabajo, iniciar_sondeo, cargar_trabajos, actualizar_estado, descargar_resultados, combinar_resultados, ESTADOS_FINALES
+from planificador import planificar, describir_plan, Presupuesto
+from circuito import obtener_circuito
+from reintentos import es_fila_fallida, drenar_cola
+from preprocesamiento import preprocesar, describir_preprocesamiento, CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO, MAX_TOKENS_POR_QUEJA
+from incremental import reutilizar_clasificaciones, COLUMNA_CATEGORIA, COLUMNA_RAZON
+from categorias import es_categoria_valida, CATEGORIAS
+from clasificacion import clasificar_queja_con_razon, clasificar_quejas_local, clasificar_queja_cacheada, consultar_cache, repreguntar_categoria, GEMINI_MODEL
+from modelo_local import MODELO_LOCAL, backend_local_disponible
+from perfilado import Perfilador, medir
+from limitador import obtener_limitador, SOLICITUDES_POR_MINUTO
+from multiarchivo import armar_cola, clasificador_compartido, clasificar_en_paralelo, resultados_por_fila, armar_libro_salida, HILOS_POR_DEFECTO
+from resultados import BufferResultados
+from historial import guardar_corrida, reutilizar_del_historial, resumen_historial, archivos_en_historial, quejas_por_mes, quejas_por_categoria, buscar_quejas
+registrar_tiempo("Importación de pandas y módulos de la app", time.perf_counter() - inicio_importacion)
 
 # === INTERFAZ STREAMLIT ===
 st.set_page_config(page_title="Clasificador de Quejas", layout="centered")
 st.title("🧾 Clasificador de Quejas de Pasajeros")
 
-modo = st.radio("¿Qué querés hacer?", ["📝 Clasificar una queja manualmente", "📂 Clasificar archivo Excel/CSV"])
+modo = st.radio("¿Qué querés hacer?", ["📝 Clasificar una queja manualmente", "📂 Clasificar archivo Excel/CSV", "📚 Varios archivos y hojas", "🌙 Clasificación masiva (batch)", "📊 Historial y análisis"])
 
 # === MODO 1: CLASIFICACIÓN MANUAL ===
 if modo == "📝 Clasificar una queja manualmente":
@@ -96,105 +78,301 @@ if modo == "📝 Clasificar una queja manualmente":
         if not texto.strip():
             st.warning("Ingresá una queja antes de clasificar.")
         else:
-            with st.spinner("Clasificando..."):
-                categoria, razon = clasificar_queja_con_razon(texto)
-            if categoria == "ERROR":
+            inicio = time.perf_counter()
+            # La respuesta llega en streaming: la categoría se muestra apenas se completa su línea
+            # y la razón se va escribiendo a medida que llega
+            estado = st.empty()
+            estado.info("Clasificando...")
+            caja_categoria = st.empty()
+            caja_razon = st.empty()
+
+            def mostrar_parcial(campo, valor):
+                if campo == "categoria":
+                    estado.empty()
+                    caja_categoria.write(f"**📌 Categoría:** {valor}")
+                else:
+                    caja_razon.write(f"**💬 Razón:** {valor}")
+
+            # Quejas repetidas salen de la caché; si otra sesión ya la está clasificando, se comparte la llamada
+            categoria, razon, origen = clasificar_queja_cacheada(texto, al_recibir=mostrar_parcial)
+            duracion = time.perf_counter() - inicio
+            estado.empty()
+            if categoria.startswith("ERROR"):
+                caja_categoria.empty()
+                caja_razon.empty()
                 st.error(f"❌ Error: {razon}")
             else:
+                caja_categoria.write(f"**📌 Categoría:** {categoria}")
+                caja_razon.write(f"**💬 Razón:** {razon}")
                 st.success("✅ Clasificación exitosa")
-                st.write(f"**📌 Categoría:** {categoria}")
-                st.write(f"**💬 Razón:** {razon}")
+                if origen != "api":
+                    st.caption(f"⚡ Resultado {'reutilizado de la caché' if origen == 'cache' else 'compartido con otra consulta idéntica en curso'} ({duracion * 1000:.1f} ms).")
 
 # === MODO 2: CLASIFICACIÓN POR ARCHIVO ===
-else:
+elif modo == "📂 Clasificar archivo Excel/CSV":
     archivo = st.file_uploader("📁 Subí un archivo Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"])
 
     if archivo:
-        if archivo.name.endswith(".csv"):
-            df = pd.read_csv(archivo)
-        else:
-            df = pd.read_excel(archivo)
+        # Solo se leen los encabezados; el archivo completo se carga al clasificar
+        contenido, hash_contenido = datos_de_subida(archivo)
+        columnas = leer_columnas(hash_contenido, archivo.name, contenido)
 
         st.write("✅ Archivo cargado. Columnas:")
-        st.write(df.columns.tolist())
+        st.write(columnas)
 
-        columna = st.selectbox("Seleccioná la columna con las quejas:", df.columns)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
+
+        # Backend local: modelo ONNX en CPU, sin API externa (solo si está instalado el modelo)
+        usar_modelo_local = False
+        if backend_local_disponible():
+            usar_modelo_local = st.radio("Motor de clasificación:", ["Gemini (API)", "Modelo local (CPU, sin API)"]) != "Gemini (API)"
+        modelo_archivo = MODELO_LOCAL if usar_modelo_local else GEMINI_MODEL
         # Ajustamos el valor por defecto de espera a algo pequeño para evitar rate limits
         espera = st.slider("⏱ Espera entre clasificaciones (segundos)", 0.0, 10.0, 0.5) 
 
-        if st.button("🚀 Clasificar archivo"):
-            categorias = []
-            razones = []
-            total = len(df)
-            progreso = st.progress(0)
-            estado = st.empty()
+        # --- Modo incremental: se reutilizan las filas ya clasificadas de una exportación anterior ---
+        archivo_previo = None
+        columna_id = None
+        if st.checkbox("🔁 Modo incremental (reutilizar un archivo _clasificado.xlsx anterior)"):
+            archivo_previo = st.file_uploader("📁 Subí el archivo clasificado anterior", type=["xlsx"], key="archivo_previo")
+            opcion_id = st.selectbox("Columna de ID para emparejar filas (opcional):", ["(ninguna)"] + columnas)
+            columna_id = None if opcion_id == "(ninguna)" else opcion_id
+
+        # --- Historial local: reutilizar quejas ya clasificadas y guardar la corrida para análisis ---
+        reutilizar_historial = st.checkbox("♻️ Reutilizar resultados del historial (quejas con el mismo texto)")
+        guardar_historial = st.checkbox("💾 Guardar en el historial", value=True)
+        opcion_fecha = st.selectbox("Columna de fecha de las quejas (para el análisis por mes, opcional):", ["(ninguna)"] + columnas)
+        columna_fecha = None if opcion_fecha == "(ninguna)" else opcion_fecha
+
+        reintentar_fallidas = st.checkbox("🔁 Reintentar al final las filas con error", value=True)
+        opcion_respaldo = st.selectbox("Modelo de respaldo para la última pasada de reintentos:", ["(ninguno)", "gemini-2.5-flash-lite", "gemini-2.0-flash"])
+        modelo_respaldo = None if opcion_respaldo == "(ninguno)" else opcion_respaldo
+
+        max_tokens_queja = st.slider("✂️ Máximo de tokens por queja (el resto se trunca)", 100, 4000, MAX_TOKENS_POR_QUEJA, step=100)
+        presupuesto_max = st.number_input("💰 Presupuesto máximo de la corrida (USD, 0 = sin límite)", min_value=0.0, value=0.0, step=1.0)
+
+        # --- Perfilado: tiempos por etapa y, opcionalmente, perfil completo con cProfile ---
+        medir_etapas = st.checkbox("⏱ Medir tiempos por etapa")
+        usar_cprofile = medir_etapas and st.checkbox("🔬 Perfil detallado con cProfile (más lento)")
+
+        if st.button("🧮 Estimar tokens, tiempo y costo"):
+            quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+            textos, clasificables, resumen_pre = preprocesar(quejas, max_tokens_queja)
+            st.info(describir_preprocesamiento(resumen_pre))
+            st.info(describir_plan(planificar(textos[clasificables], modelo_archivo, espera=espera), presupuesto_max))
 
-            errores_consecutivos = 0
-            limite_errores = 20
+        if st.button("🚀 Clasificar archivo"):
+            perfilador = Perfilador(cprofile=usar_cprofile) if medir_etapas else None
+            if perfilador:
+                perfilador.iniciar()
+            # Para clasificar solo se carga la columna elegida
+            with medir(perfilador, "Lectura del archivo (columna)"):
+                quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+            # Limpieza vectorizada: sin celdas vacías ("nan"), firmas ni hilos citados, y con truncado
+            with medir(perfilador, "Preprocesamiento"):
+                textos, clasificables, resumen_pre = preprocesar(quejas, max_tokens_queja)
+            st.info(describir_preprocesamiento(resumen_pre))
+            total = len(quejas)
+
+            # Categorías y razones en arrays compactos; las vistas se indexan como listas
+            buffer_resultados = BufferResultados(total)
+            categorias, razones = buffer_resultados.categorias, buffer_resultados.razones
+            indices_a_clasificar = list(range(total))
+
+            if archivo_previo:
+                contenido_previo, hash_previo = datos_de_subida(archivo_previo)
+                previo = leer_archivo(hash_previo, archivo_previo.name, contenido_previo)
+                ids = leer_columna(hash_contenido, archivo.name, columna_id, contenido) if columna_id else None
+                try:
+                    categorias_previas, razones_previas = reutilizar_clasificaciones(quejas, previo, columna, ids, columna_id)
+                except ValueError as e:
+                    st.error(f"❌ No se pudo usar el archivo anterior: {e}")
+                    st.stop()
+                for i in categorias_previas.notna().to_numpy().nonzero()[0]:
+                    categorias[i], razones[i] = categorias_previas.iloc[i], razones_previas.iloc[i]
+                indices_a_clasificar = categorias_previas.isna().to_numpy().nonzero()[0].tolist()
+                st.info(f"🔁 Se reutilizan {total - len(indices_a_clasificar)} filas del archivo anterior. Quedan {len(indices_a_clasificar)} filas nuevas o modificadas por clasificar.")
+
+            if reutilizar_historial and indices_a_clasificar:
+                with medir(perfilador, "Búsqueda en el historial"):
+                    categorias_hist, razones_hist = reutilizar_del_historial(textos.iloc[indices_a_clasificar])
+                pendientes = []
+                for i, categoria, razon in zip(indices_a_clasificar, categorias_hist, razones_hist):
+                    if pd.isna(categoria):
+                        pendientes.append(i)
+                    else:
+                        categorias[i], razones[i] = categoria, razon
+                st.info(f"♻️ Se reutilizan {len(indices_a_clasificar) - len(pendientes)} filas del historial. Quedan {len(pendientes)} por clasificar.")
+                indices_a_clasificar = pendientes
+
+            # Las filas vacías o triviales se etiquetan directamente, sin llamar al modelo
+            es_clasificable = clasificables.to_numpy()
+            sin_texto = [i for i in indices_a_clasificar if not es_clasificable[i]]
+            buffer_resultados.asignar(sin_texto, CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO)
+            indices_a_clasificar = [i for i in indices_a_clasificar if es_clasificable[i]]
+
+            if not usar_modelo_local:
+                st.info(describir_plan(planificar(textos.iloc[indices_a_clasificar], GEMINI_MODEL, espera=espera), presupuesto_max))
+            presupuesto = Presupuesto(modelo_archivo, max_costo_usd=presupuesto_max)
+            motivo_corte = "No procesado"
+
+            reporte = ReporteProgreso(len(indices_a_clasificar))
+
+            # El circuito pausa los envíos ante una racha de errores y reanuda solo
+            circuito = obtener_circuito("gemini", GEMINI_MODEL)
+            procesadas = 0
+            pendientes_repregunta = [] # Filas cuya categoría no coincidió con ninguna válida
             
             # --- NUEVO TRY-EXCEPT ALREDEDOR DEL BUCLE COMPLETO ---
             try:
-                for i, texto in enumerate(df[columna].astype(str)):
-                    estado.text(f"Clasificando fila {i + 1} de {total}...")
-                    
-                    try:
-                        categoria, razon = clasificar_queja_con_razon(texto)
-                        if categoria == "ERROR":
-                            errores_consecutivos += 1
-                            razon = razon or "Error sin mensaje" # Asegura que haya un mensaje de error
-                            print(f"DEBUG: Error clasif. en fila {i+1}: {razon}") # Debugging
-                        else:
-                            errores_consecutivos = 0 # Reinicia el contador si la clasificación es exitosa
-                    except Exception as e: # Captura errores inesperados dentro de clasificar_queja_con_razon si no fueron devueltos como "ERROR"
-                        categoria = "ERROR_INESPERADO"
-                        razon = str(e)
-                        errores_consecutivos += 1
-                        print(f"DEBUG: Excepción inesperada en fila {i+1}: {razon}") # Debugging
-                    
-                    categorias.append(categoria)
-                    razones.append(razon)
-                    progreso.progress((i + 1) / total)
+                if usar_modelo_local:
+                    # Todo el archivo de una vez: lotes dinámicos repartidos entre los núcleos
+                    resultados_locales = clasificar_quejas_local(
+                        textos.iloc[indices_a_clasificar].tolist(),
+                        al_avanzar=lambda filas: reporte.avanzar(filas),
+                        perfilador=perfilador,
+                    )
+                    for i, (categoria, razon) in zip(indices_a_clasificar, resultados_locales):
+                        categorias[i], razones[i] = categoria, razon
+                    procesadas = len(indices_a_clasificar)
+                else:
+                    for i in indices_a_clasificar:
+                        if presupuesto.agotado():
+                            motivo_corte = "No procesado: se alcanzó el presupuesto máximo de la corrida"
+                            st.warning(f"💰 Se alcanzó el presupuesto máximo ({presupuesto.resumen()}). Se detiene el envío de solicitudes.")
+                            break
+                        with medir(perfilador, "Espera del cortacircuitos"):
+                            habilitado = circuito.esperar_turno(al_esperar=lambda s: reporte.nota(f"⏸️ Gemini devuelve errores. Envíos en pausa; próxima prueba en {s:.0f}s..."))
+                        if not habilitado:
+                            motivo_corte = "No procesado: Gemini no se recuperó dentro del tiempo máximo de espera"
+                            st.error("❌ Gemini sigue fallando tras el tiempo máximo de espera. Se detiene la clasificación.")
+                            break
+                        texto = textos.iloc[i]
+                        try:
+                            categoria, razon = clasificar_queja_con_razon(texto, presupuesto, perfilador=perfilador)
+                            if categoria == "ERROR":
+                                circuito.registrar_fallo()
+                                razon = razon or "Error sin mensaje" # Asegura que haya un mensaje de error
+                                print(f"DEBUG: Error clasif. en fila {i+1}: {razon}") # Debugging
+                            else:
+                                circuito.registrar_exito()
+                                if not es_categoria_valida(categoria):
+                                    pendientes_repregunta.append(i)
+                        except Exception as e: # Captura errores inesperados dentro de clasificar_queja_con_razon si no fueron devueltos como "ERROR"
+                            categoria = "ERROR_INESPERADO"
+                            razon = str(e)
+                            circuito.registrar_fallo()
+                            print(f"DEBUG: Excepción inesperada en fila {i+1}: {razon}") # Debugging
                     
-                    if errores_consecutivos >= limite_errores:
-                        st.error(f"❌ Se detectaron {errores_consecutivos} errores consecutivos. Se detiene la clasificación.")
-                        print(f"DEBUG: Límite de errores consecutivos alcanzado en fila {i+1}.") # Debugging
-                        break # Sale del bucle for
+                        categorias[i] = categoria
+                        razones[i] = razon
+                        procesadas += 1
+                        with medir(perfilador, "Actualización de la UI"):
+                            reporte.avanzar(errores=int(categoria.startswith("ERROR")))
                     
-                    time.sleep(espera) # Se mantiene para permitir un respiro si es necesario
+                        with medir(perfilador, "Espera entre solicitudes"):
+                            time.sleep(espera) # Se mantiene para permitir un respiro si es necesario
                 
                 # --- Lógica de relleno si el bucle se detuvo prematuramente ---
-                if len(categorias) < total:
-                    st.warning(f"La clasificación se detuvo prematuramente en la fila {len(categorias)}. Rellenando el resto con 'NO_CLASIFICADO' y 'No procesado debido a errores consecutivos'.")
-                    print(f"DEBUG: Rellenando filas restantes. Procesadas: {len(categorias)}, Total: {total}") # Debugging
-                    while len(categorias) < total:
-                        categorias.append("NO_CLASIFICADO")
-                        razones.append("No procesado debido a errores consecutivos")
+                if procesadas < len(indices_a_clasificar):
+                    st.warning(f"La clasificación se detuvo prematuramente tras {procesadas} filas. Rellenando el resto con 'NO_CLASIFICADO' y '{motivo_corte}'.")
+                    print(f"DEBUG: Rellenando filas restantes. Procesadas: {procesadas}, Pendientes: {len(indices_a_clasificar)}") # Debugging
+                    buffer_resultados.asignar(indices_a_clasificar[procesadas:], "NO_CLASIFICADO", motivo_corte)
+                
+                # --- Cola de reintentos: filas con ERROR* o NO_CLASIFICADO ---
+                fallidas = buffer_resultados.fallidas(indices_a_clasificar)
+                if reintentar_fallidas and fallidas and not usar_modelo_local and not presupuesto.agotado():
+                    def reintentar(indices, modelo):
+                        resultados = {}
+                        for i in indices:
+                            if not circuito.esperar_turno():
+                                resultados[i] = (categorias[i], razones[i])
+                                continue
+                            categoria, razon = clasificar_queja_con_razon(textos.iloc[i], presupuesto, modelo or GEMINI_MODEL, perfilador)
+                            if categoria == "ERROR":
+                                circuito.registrar_fallo()
+                            else:
+                                circuito.registrar_exito()
+                            resultados[i] = (categoria, razon)
+                        return resultados
+
+                    reintentadas = drenar_cola(
+                        fallidas, reintentar,
+                        modelo_respaldo=modelo_respaldo,
+                        al_iniciar_pasada=lambda n, cantidad: reporte.reiniciar(cantidad, f"🔁 Pasada de reintentos {n}: {cantidad} filas con error..."),
+                        al_avanzar=lambda filas, errores: reporte.avanzar(filas, errores),
+                        detener=presupuesto.agotado,
+                    )
+                    for i, (categoria, razon) in reintentadas.items():
+                        categorias[i], razones[i] = categoria, razon
+                        if not es_fila_fallida(categoria) and not es_categoria_valida(categoria) and i not in pendientes_repregunta:
+                            pendientes_repregunta.append(i)
+                    recuperadas = len(fallidas) - len(buffer_resultados.fallidas(fallidas))
+                    st.info(f"🔁 Reintentos: se recuperaron {recuperadas} de {len(fallidas)} filas con error.")
+
+                # --- Repregunta solo para las filas con categoría no reconocida ---
+                if pendientes_repregunta:
+                    reporte.nota(f"Repreguntando la categoría de {len(pendientes_repregunta)} filas no reconocidas...")
+                    for i in pendientes_repregunta:
+                        with medir(perfilador, "Repregunta de categoría"):
+                            # Con el presupuesto agotado no se repregunta: la fila queda para reintentar
+                            canonica = None if presupuesto.agotado() else repreguntar_categoria(textos.iloc[i], categorias[i], presupuesto)
+                        if canonica:
+                            categorias[i] = canonica
+                        else:
+                            razones[i] = f"Categoría no reconocida: '{categorias[i]}'. {razones[i]}"
+                            categorias[i] = "ERROR_CATEGORIA"
+                    print(f"DEBUG: Repreguntadas {len(pendientes_repregunta)} filas con categoría no reconocida.") # Debugging
                 
                 # Asegura que la barra de progreso llegue al 100% al finalizar o detenerse
-                progreso.progress(1.0)
-                estado.text("Clasificación finalizada.")
+                reporte.finalizar(f"Clasificación finalizada. Consumo: {presupuesto.resumen()}")
                 print("DEBUG: Proceso de clasificación completado (o detenido por errores).") # Debugging
 
             except Exception as e: # Captura cualquier error que ocurra durante el bucle principal
                 st.error(f"❌ ¡Ocurrió un error inesperado durante el procesamiento del archivo! Por favor, revisa los logs de la aplicación. Error: {e}")
                 print(f"DEBUG: Excepción crítica en el bucle principal: {e}") # Debugging
                 # Asegura que la barra de progreso se detenga y muestre el estado final
-                progreso.progress(1.0)
-                estado.text("Clasificación detenida por error crítico.")
+                reporte.finalizar("Clasificación detenida por error crítico.")
 
             # --- FIN DEL NUEVO TRY-EXCEPT ---
 
-            df["Clasificacion-Gemini"] = categorias
-            df["Razon-Gemini"] = razones
+            # El archivo completo se lee recién para armar la salida
+            with medir(perfilador, "Lectura del archivo completo"):
+                df = leer_archivo(hash_contenido, archivo.name, contenido)
+            df[COLUMNA_CATEGORIA] = buffer_resultados.columna_categorias()
+            df[COLUMNA_RAZON] = buffer_resultados.columna_razones()
+
+            if guardar_historial:
+                with medir(perfilador, "Guardado en el historial"):
+                    fechas = df[columna_fecha] if columna_fecha else None
+                    ids_quejas = df[columna_id] if columna_id else None
+                    guardadas = guardar_corrida(archivo.name, hash_contenido, textos, df[COLUMNA_CATEGORIA].array, df[COLUMNA_RAZON].array, modelo_archivo, fechas, ids=ids_quejas)
+                st.info(f"💾 {guardadas} filas guardadas en el historial.")
 
             # Descargar resultado
             salida = BytesIO()
-            df.to_excel(salida, index=False)
+            with medir(perfilador, "Escritura del Excel (to_excel)"):
+                df.to_excel(salida, index=False)
             salida.seek(0)
 
             nombre_base = archivo.name.rsplit(".", 1)[0]
             nombre_resultado = f"{nombre_base}_clasificado.xlsx"
 
+            if perfilador:
+                perfilador.detener()
+                st.markdown("### ⏱ Tiempo por etapa")
+                st.dataframe(perfilador.tabla())
+                perfil = perfilador.archivo_perfil()
+                if perfil:
+                    with st.expander("🔬 Funciones con más tiempo acumulado (cProfile)"):
+                        st.text(perfilador.resumen_perfil())
+                    st.download_button(
+                        label="⬇️ Descargar perfil (.prof)",
+                        data=perfil,
+                        file_name=f"{nombre_base}_perfil.prof",
+                        mime="application/octet-stream"
+                    )
+
             st.success("✅ Clasificación completada")
             st.download_button(
                 label="⬇️ Descargar archivo clasificado",
@@ -203,6 +381,224 @@ else:
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
 
+# === MODO 3: VARIOS ARCHIVOS Y HOJAS EN UNA SOLA CORRIDA ===
+elif modo == "📚 Varios archivos y hojas":
+    st.info("Todas las hojas de todos los archivos van a una sola cola: las quejas repetidas se clasifican una vez, las solicitudes salen en paralelo y el resultado es un único libro con una hoja por cada hoja de entrada.")
+    archivos = st.file_uploader("📁 Subí uno o más archivos Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"], accept_multiple_files=True, key="archivos_multiples")
+
+    if archivos:
+        libros = {}
+        hashes = {}
+        for archivo in archivos:
+            contenido, hash_contenido = datos_de_subida(archivo)
+            libros[archivo.name] = leer_hojas(hash_contenido, archivo.name, contenido)
+            hashes[archivo.name] = hash_contenido
+        st.write(f"✅ {len(libros)} archivos, {sum(len(h) for h in libros.values())} hojas.")
+
+        columnas = sorted({c for hojas in libros.values() for df in hojas.values() for c in df.columns}, key=str)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
+        hilos = st.slider("🧵 Solicitudes simultáneas", 1, 16, HILOS_POR_DEFECTO)
+        solicitudes_por_minuto = st.number_input("⏱ Máximo de solicitudes por minuto a Gemini", min_value=1, value=SOLICITUDES_POR_MINUTO, step=10)
+        max_tokens_queja = st.slider("✂️ Máximo de tokens por queja (el resto se trunca)", 100, 4000, MAX_TOKENS_POR_QUEJA, step=100, key="max_tokens_multiples")
+        presupuesto_max = st.number_input("💰 Presupuesto máximo de la corrida (USD, 0 = sin límite)", min_value=0.0, value=0.0, step=1.0, key="presupuesto_multiples")
+        guardar_historial = st.checkbox("💾 Guardar en el historial", value=True, key="historial_multiples")
+
+        cola, unicos, omitidas = armar_cola(libros, columna, max_tokens_queja)
+        if omitidas:
+            st.warning(f"Estas hojas no tienen la columna '{columna}' y se copian sin clasificar: {', '.join(omitidas)}")
+        st.write(f"📋 {len(cola)} filas en total; {len(unicos)} quejas distintas para enviar al modelo.")
+
+        if st.button("🚀 Clasificar todo"):
+            st.info(describir_plan(planificar(pd.Series(unicos, dtype=object), GEMINI_MODEL, solicitudes_por_minuto=solicitudes_por_minuto), presupuesto_max))
+            presupuesto = Presupuesto(GEMINI_MODEL, max_costo_usd=presupuesto_max)
+            # Limitador, cortacircuitos y caché son de proceso: compartidos con las otras corridas y sesiones
+            limitador = obtener_limitador("gemini", GEMINI_MODEL, solicitudes_por_minuto)
+            circuito = obtener_circuito("gemini", GEMINI_MODEL)
+
+            # Corre en los hilos del pool: sin llamadas a Streamlit
+            clasificar_compartida = clasificador_compartido(
+                lambda texto: clasificar_queja_cacheada(texto, presupuesto=presupuesto),
+                consultar_cache, circuito, limitador, presupuesto,
+            )
+
+            resultados_unicos = BufferResultados(len(unicos))
+            categorias_unicas, razones_unicas = resultados_unicos.categorias, resultados_unicos.razones
+            reporte = ReporteProgreso(len(unicos))
+            for i, categoria, razon, origen in clasificar_en_paralelo(unicos, clasificar_compartida, hilos):
+                categorias_unicas[i], razones_unicas[i] = categoria, razon
+                reporte.avanzar(errores=int(es_fila_fallida(categoria)), aciertos_cache=int(origen != "api"))
+
+            # --- Cola de reintentos sobre los textos únicos que fallaron ---
+            fallidas = resultados_unicos.fallidas()
+            if fallidas and not presupuesto.agotado():
+                reintentadas = drenar_cola(
+                    fallidas,
+                    lambda indices, modelo: {i: clasificar_compartida(unicos[i])[:2] for i in indices},
+                    al_iniciar_pasada=lambda n, cantidad: reporte.reiniciar(cantidad, f"🔁 Pasada de reintentos {n}: {cantidad} quejas con error..."),
+                    al_avanzar=lambda filas, errores: reporte.avanzar(filas, errores),
+                    detener=presupuesto.agotado,
+                )
+                for i, (categoria, razon) in reintentadas.items():
+                    categorias_unicas[i], razones_unicas[i] = categoria, razon
+            reporte.finalizar(f"Clasificación finalizada. Consumo: {presupuesto.resumen()}")
+
+            resultados_filas = resultados_por_fila(cola, resultados_unicos)
+            categorias, razones = resultados_filas.columna_categorias(), resultados_filas.columna_razones()
+            salida = armar_libro_salida(libros, cola, categorias, razones)
+            if guardar_historial:
+                # Una corrida por hoja: la clave del historial es (hash del archivo, hoja, fila)
+                resultados = cola.assign(categoria=categorias, razon=razones)
+                guardadas = sum(
+                    guardar_corrida(nombre, hashes[nombre], grupo["texto"], grupo["categoria"].tolist(), grupo["razon"].tolist(), GEMINI_MODEL, hoja=hoja)
+                    for (nombre, hoja), grupo in resultados.groupby(["archivo", "hoja"], sort=False)
+                )
+                st.info(f"💾 {guardadas} filas guardadas en el historial.")
+            st.success(f"✅ {len(cola)} filas clasificadas en {len(cola.groupby(['archivo', 'hoja']))} hojas")
+            st.download_button(
+                label="⬇️ Descargar libro clasificado",
+                data=salida,
+                file_name="quejas_clasificadas.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+
+# === MODO 4: CLASIFICACIÓN MASIVA CON API BATCH ===
+elif modo == "🌙 Clasificación masiva (batch)":
+    st.info("Para cargas grandes sin apuro: las filas se envían como un trabajo batch al proveedor (precio reducido, resultados en hasta 24 h). El estado se consulta en segundo plano.")
+    proveedor = st.selectbox("Proveedor:", ["gemini", "openai"])
+    modelo_batch = st.text_input("Modelo:", "gemini-2.5-flash" if proveedor == "gemini" else "gpt-4o-mini")
+    claves_batch = {"gemini": API_KEY, "openai": os.getenv("OPENAI_API_KEY")}
+
+    archivo = st.file_uploader("📁 Subí un archivo Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"], key="archivo_batch")
+    hash_contenido = None
+
+    if archivo:
+        contenido, hash_contenido = datos_de_subida(archivo)
+        columnas = leer_columnas(hash_contenido, archivo.name, contenido)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
+
+        if st.button("🧮 Estimar tokens y costo"):
+            quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+            textos, clasificables, resumen_pre = preprocesar(quejas)
+            st.info(describir_preprocesamiento(resumen_pre))
+            st.info(describir_plan(planificar(textos[clasificables], modelo_batch, modo="batch")))
+
+        if st.button("📤 Enviar trabajo batch"):
+            if not claves_batch[proveedor]:
+                st.error(f"❌ No hay API Key configurada para {proveedor}.")
+            else:
+                quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+                # Solo se envían las filas con contenido; las vacías se etiquetan al combinar
+                textos, clasificables, _ = preprocesar(quejas)
+                posiciones = clasificables.to_numpy().nonzero()[0].tolist()
+                try:
+                    with st.spinner("Enviando trabajo batch..."):
+                        trabajo = enviar_trabajo(
+                            textos.iloc[posiciones], proveedor, modelo_batch, claves_batch[proveedor],
+                            archivo.name, hash_contenido, columna, total=len(quejas), posiciones=posiciones,
+                        )
+                    iniciar_sondeo(trabajo, claves_batch[proveedor])
+                    st.success(f"✅ Trabajo enviado: {trabajo['id']} ({trabajo['total']} filas)")
+                except Exception as e:
+                    st.error(f"❌ No se pudo enviar el trabajo batch: {e}")
+                    print(f"DEBUG: Error enviando trabajo batch: {e}") # Debugging
+
+    # --- Trabajos enviados (persisten entre sesiones) ---
+    trabajos = cargar_trabajos()
+    if trabajos:
+        st.markdown("### 📋 Trabajos enviados")
+        st.dataframe(pd.DataFrame(trabajos)[["id", "proveedor", "modelo", "archivo_origen", "total", "estado"]])
+
+        id_elegido = st.selectbox("Elegí un trabajo:", [t["id"] for t in trabajos])
+        trabajo = next(t for t in trabajos if t["id"] == id_elegido)
+        clave_trabajo = claves_batch[trabajo["proveedor"]]
+
+        # Si la app se reinició, se retoma el sondeo de los trabajos pendientes
+        if trabajo["estado"] not in ESTADOS_FINALES and clave_trabajo:
+            iniciar_sondeo(trabajo, clave_trabajo)
+
+        if st.button("🔄 Actualizar estado"):
+            try:
+                actualizar_estado(trabajo, clave_trabajo)
+                st.rerun()
+            except Exception as e:
+                st.error(f"❌ No se pudo consultar el estado: {e}")
+
+        if trabajo.get("error"):
+            st.warning(f"El proveedor informó errores: {trabajo['error']}")
+
+        if trabajo["estado"] == "completado":
+            if hash_contenido != trabajo["hash_contenido"]:
+                st.warning(f"Para combinar los resultados subí el archivo original: {trabajo['archivo_origen']}")
+            else:
+                guardar_historial = st.checkbox("💾 Guardar en el historial", value=True, key="historial_batch")
+                if st.button("📥 Combinar resultados"):
+                    with st.spinner("Descargando resultados..."):
+                        resultados = descargar_resultados(trabajo, clave_trabajo)
+                    combinados = combinar_resultados(trabajo["total"], resultados)
+                    textos, clasificables, _ = preprocesar(leer_columna(hash_contenido, archivo.name, trabajo["columna"], contenido))
+                    combinados.asignar(~clasificables.to_numpy(), CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO)
+
+                    df = leer_archivo(hash_contenido, archivo.name, contenido)
+                    df[COLUMNA_CATEGORIA] = combinados.columna_categorias()
+                    df[COLUMNA_RAZON] = combinados.columna_razones()
+                    if guardar_historial:
+                        guardadas = guardar_corrida(archivo.name, hash_contenido, textos, df[COLUMNA_CATEGORIA].array, df[COLUMNA_RAZON].array, trabajo["modelo"])
+                        st.info(f"💾 {guardadas} filas guardadas en el historial.")
+
+                    salida = BytesIO()
+                    df.to_excel(salida, index=False)
+                    salida.seek(0)
+
+                    nombre_base = archivo.name.rsplit(".", 1)[0]
+                    st.success(f"✅ Se combinaron {len(resultados)} resultados en un archivo de {trabajo['total']} filas")
+                    st.download_button(
+                        label="⬇️ Descargar archivo clasificado",
+                        data=salida,
+                        file_name=f"{nombre_base}_clasificado.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+
+# === MODO 5: HISTORIAL Y ANÁLISIS ===
+else:
+    resumen = resumen_historial()
+    if not resumen["filas"]:
+        st.info("El historial está vacío. Las corridas se guardan acá al clasificar un archivo con \"💾 Guardar en el historial\".")
+    else:
+        st.write(f"🗄️ {resumen['filas']} quejas clasificadas de {resumen['archivos']} archivos, del {resumen['desde']} al {resumen['hasta']}.")
+        desde = st.date_input("Desde:", pd.to_datetime(resumen["desde"]).date())
+        hasta = st.date_input("Hasta:", pd.to_datetime(resumen["hasta"]).date())
+        filtro_categorias = st.multiselect("Categorías (vacío = todas):", CATEGORIAS)
+        filtro_archivos = st.multiselect("Archivos de origen (vacío = todos):", archivos_en_historial())
+
+        inicio = time.perf_counter()
+        por_mes = quejas_por_mes(desde, hasta, filtro_categorias, filtro_archivos)
+        por_categoria = quejas_por_categoria(desde, hasta, filtro_archivos)
+        st.caption(f"Consultas resueltas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+
+        st.markdown("### 📅 Quejas por mes y categoría")
+        if por_mes.empty:
+            st.write("Sin quejas para estos filtros.")
+        else:
+            st.bar_chart(por_mes)
+            st.dataframe(por_mes)
+        st.markdown("### 🏷️ Quejas por categoría")
+        st.dataframe(por_categoria)
+
+        st.markdown("### 🔎 Buscar quejas")
+        consulta = st.text_input("Palabras a buscar (admite \"frases\", prefijo* y OR):")
+        if consulta:
+            inicio = time.perf_counter()
+            try:
+                encontradas = buscar_quejas(consulta, desde, hasta, filtro_categorias)
+            except Exception as e: # Sintaxis de búsqueda inválida
+                st.error(f"❌ No se pudo buscar: {e}")
+            else:
+                st.caption(f"{len(encontradas)} quejas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+                st.dataframe(encontradas)
+
+with st.expander("⏱ Tiempos de arranque"):
+    st.dataframe(pd.DataFrame(metricas_arranque(), columns=["Medición", "ms"]))
+
 if st.session_state.autenticado:
     if st.button("🔒 Cerrar sesión"):
         st.session_state.autenticado = False
@@ -1,9 +1,7 @@
 import streamlit as st
-import pandas as pd
 import time
-from io import BytesIO
 import os
-import openai
+from arranque import configurar_openai, openai_sdk, precalentar, registrar_tiempo, registrar_primera_respuesta
 
 # === CONFIGURACIÓN BÁSICA DE LA APP ===
 st.set_page_config(page_title="Clasificador de Quejas", layout="centered")
@@ -35,7 +33,18 @@ if not OPENAI_API_KEY:
     st.error("❌ API Key no configurada. Definila como variable de entorno OPENAI_API_KEY en Streamlit Cloud.")
     st.stop()
 
-openai.api_key = OPENAI_API_KEY
+# El SDK se importa y configura en segundo plano mientras se cargan los módulos de la app
+configurar_openai(OPENAI_API_KEY)
+precalentar("openai")
+
+# === IMPORTACIONES (DESPUÉS DEL ACCESO) ===
+inicio_importacion = time.perf_counter()
+from io import BytesIO
+from carga_archivos import datos_de_subida, leer_columnas, leer_columna, leer_archivo
+from progreso import ReporteProgreso
+from categorias import parsear_respuesta
+from resultados import BufferResultados
+registrar_tiempo("Importación de pandas y módulos de la app", time.perf_counter() - inicio_importacion)
 
 # === FUNCIÓN DE CLASIFICACIÓN ===
 def clasificar_queja_con_razon(texto, modelo="gpt-4o"):
@@ -64,7 +73,8 @@ Texto: {texto}
 """
 
     try:
-        response = openai.chat.completions.create(
+        inicio = time.perf_counter()
+        response = openai_sdk().chat.completions.create(
             model=modelo,
             messages=[
                 {"role": "system", "content": "Sos un asistente experto en analizar y categorizar quejas de pasajeros."},
@@ -74,13 +84,9 @@ Texto: {texto}
             max_tokens=256
         )
 
+        registrar_primera_respuesta("OpenAI", modelo, time.perf_counter() - inicio)
         respuesta = response.choices[0].message.content.strip()
-        categoria, razon = "", ""
-        for linea in respuesta.splitlines():
-            if linea.lower().startswith("categoría:") or linea.lower().startswith("categoria:"):
-                categoria = linea.split(":", 1)[1].strip()
-            elif linea.lower().startswith("razón:") or linea.lower().startswith("razon:"):
-                razon = linea.split(":", 1)[1].strip()
+        categoria, razon = parsear_respuesta(respuesta)
 
         return categoria, razon
 
@@ -113,30 +119,28 @@ else:
     archivo = st.file_uploader("📁 Subí un archivo Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"])
 
     if archivo:
-        if archivo.name.endswith(".csv"):
-            df = pd.read_csv(archivo)
-        else:
-            df = pd.read_excel(archivo)
+        # Solo se leen los encabezados; el archivo completo se carga al clasificar
+        contenido, hash_contenido = datos_de_subida(archivo)
+        columnas = leer_columnas(hash_contenido, archivo.name, contenido)
 
         st.write("✅ Archivo cargado. Columnas:")
-        st.write(df.columns.tolist())
+        st.write(columnas)
 
-        columna = st.selectbox("Seleccioná la columna con las quejas:", df.columns)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
         espera = st.slider("⏱ Espera entre clasificaciones (segundos)", 0, 10, 5)
 
         if st.button("🚀 Clasificar archivo"):
-            categorias = []
-            razones = []
-            total = len(df)
-            progreso = st.progress(0)
-            estado = st.empty()
+            # Para clasificar solo se carga la columna elegida
+            quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+
+            total = len(quejas)
+            resultados = BufferResultados(total) # Categorías y razones en arrays compactos
+            reporte = ReporteProgreso(total)
 
             errores_consecutivos = 0
             limite_errores = 20
 
-            for i, texto in enumerate(df[columna].astype(str)):
-                estado.text(f"Clasificando fila {i + 1} de {total}...")
-
+            for i, texto in enumerate(quejas.astype(str)):
                 try:
                     categoria, razon = clasificar_queja_con_razon(texto, modelo)
                     if categoria == "ERROR":
@@ -149,9 +153,9 @@ else:
                     razon = str(e)
                     errores_consecutivos += 1
 
-                categorias.append(categoria)
-                razones.append(razon)
-                progreso.progress((i + 1) / total)
+                resultados.categorias[i] = categoria
+                resultados.razones[i] = razon
+                reporte.avanzar(errores=int(categoria.startswith("ERROR")))
 
                 if errores_consecutivos >= limite_errores:
                     st.error(f"❌ Se detectaron {errores_consecutivos} errores consecutivos. Se detiene la clasificación.")
@@ -159,8 +163,14 @@ else:
 
                 time.sleep(espera)
 
-            df["Clasificacion-OpenAI"] = categorias
-            df["Razon-OpenAI"] = razones
+            # Si se cortó por errores consecutivos, el resto del archivo queda sin clasificar
+            resultados.asignar(resultados.pendientes(), "NO_CLASIFICADO", "No procesado debido a errores consecutivos")
+            reporte.finalizar("Clasificación finalizada.")
+
+            # El archivo completo se lee recién para armar la salida
+            df = leer_archivo(hash_contenido, archivo.name, contenido)
+            df["Clasificacion-OpenAI"] = resultados.columna_categorias()
+            df["Razon-OpenAI"] = resultados.columna_razones()
 
             salida = BytesIO()
             df.to_excel(salida, index=False)
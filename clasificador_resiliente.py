@@ -1,11 +1,7 @@
 import streamlit as st
-import pandas as pd
 import time
-from io import BytesIO
 import os
-import google.generativeai as genai
-from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
-import google.api_core.exceptions as g_exceptions # Importar excepciones específicas de Google API
+from arranque import configurar_gemini, gemini, precalentar, registrar_tiempo, registrar_primera_respuesta
 
 # === CONFIGURACIÓN BÁSICA DE LA APP ===
 #st.set_page_config(page_title="Clasificador de Quejas", layout="centered")
@@ -40,7 +36,23 @@ if not API_KEY:
     st.error("❌ API Key no configurada. Definila como variable de entorno GEMINI_API_KEY en Streamlit Cloud.")
     st.stop()
 
-genai.configure(api_key=API_KEY)
+# El SDK se importa y configura en segundo plano mientras se cargan los módulos de la app
+configurar_gemini(API_KEY)
+precalentar("gemini")
+
+# === IMPORTACIONES (DESPUÉS DEL ACCESO) ===
+inicio_importacion = time.perf_counter()
+from io import BytesIO
+from tenacity import retry, wait_exponential, stop_after_attempt, retry_if_exception_type
+import google.api_core.exceptions as g_exceptions # Importar excepciones específicas de Google API
+from carga_archivos import datos_de_subida, leer_columnas, leer_columna, leer_archivo
+from progreso import ReporteProgreso
+from circuito import obtener_circuito
+from categorias import parsear_respuesta
+from resultados import BufferResultados
+registrar_tiempo("Importación de pandas y módulos de la app", time.perf_counter() - inicio_importacion)
+
+GEMINI_MODEL = "gemini-2.0-flash"
 
 # Define las excepciones específicas de Gemini que quieres reintentar
 RETRY_EXCEPTIONS = (
@@ -82,17 +94,14 @@ Razón: <explicación>
 
 Texto: {texto_queja}
 """
-    model = genai.GenerativeModel("gemini-2.0-flash")
+    model = gemini().GenerativeModel(GEMINI_MODEL)
     # Añade un timeout explícito para la llamada a la API
+    inicio = time.perf_counter()
     response = model.generate_content(prompt, request_options={"timeout": 120}) # 120 segundos de timeout
+    registrar_primera_respuesta("Gemini", GEMINI_MODEL, time.perf_counter() - inicio)
     respuesta = response.text.strip()
 
-    categoria, razon = "", ""
-    for linea in respuesta.splitlines():
-        if linea.lower().startswith("categoría:") or linea.lower().startswith("categoria:"):
-            categoria = linea.split(":", 1)[1].strip()
-        elif linea.lower().startswith("razón:") or linea.lower().startswith("razon:"):
-            razon = linea.split(":", 1)[1].strip()
+    categoria, razon = parsear_respuesta(respuesta)
             
     if not categoria or not razon:
         raise ValueError(f"Formato de respuesta inesperado de Gemini: {respuesta}") # Levanta un error si el formato no es el esperado
@@ -141,65 +150,65 @@ else:
     archivo = st.file_uploader("📁 Subí un archivo Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"])
 
     if archivo:
-        if archivo.name.endswith(".csv"):
-            df = pd.read_csv(archivo)
-        else:
-            df = pd.read_excel(archivo)
+        # Solo se leen los encabezados; el archivo completo se carga al clasificar
+        contenido, hash_contenido = datos_de_subida(archivo)
+        columnas = leer_columnas(hash_contenido, archivo.name, contenido)
 
         st.write("✅ Archivo cargado. Columnas:")
-        st.write(df.columns.tolist())
+        st.write(columnas)
 
-        columna = st.selectbox("Seleccioná la columna con las quejas:", df.columns)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
         espera = st.slider("⏱ Espera entre clasificaciones (segundos)", 0, 10, 5)
 
         if st.button("🚀 Clasificar archivo"):
-            categorias = []
-            razones = []
-            total = len(df)
+            # Para clasificar solo se carga la columna elegida
+            quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+
+            total = len(quejas)
+            resultados = BufferResultados(total) # Categorías y razones en arrays compactos
             
-            # Usar un placeholder para la barra de progreso y el estado para evitar re-renderizados
-            progress_bar = st.progress(0, text="Iniciando clasificación...")
-            status_text = st.empty()
+            # El reporte agrupa las actualizaciones de la UI para no enviar un mensaje por fila
+            reporte = ReporteProgreso(total)
 
-            errores_consecutivos = 0
-            limite_errores = 20
+            # Tras los reintentos de Tenacity, el circuito pausa los envíos si Gemini
+            # sigue fallando y reanuda solo cuando una llamada de prueba funciona
+            circuito = obtener_circuito("gemini", GEMINI_MODEL)
+
+            for i, texto in enumerate(quejas.astype(str)):
+                if not circuito.esperar_turno(al_esperar=lambda s: reporte.nota(f"⏸️ Gemini devuelve errores. Envíos en pausa; próxima prueba en {s:.0f}s...")):
+                    st.error("❌ Gemini sigue fallando tras el tiempo máximo de espera. Se detiene la clasificación.")
+                    break
 
-            for i, texto in enumerate(df[columna].astype(str)):
-                status_text.text(f"Clasificando fila {i + 1} de {total}...")
-                
                 categoria, razon = clasificar_queja_con_razon(texto)
                 
-                if categoria.startswith("ERROR"):
-                    errores_consecutivos += 1
-                    status_text.warning(f"Error en fila {i+1}: {razon}. Errores consecutivos: {errores_consecutivos}. Reintentando...")
-                    # No añadimos al progreso aquí para dar tiempo a Tenacity
+                if categoria in ("ERROR_API", "ERROR_GENERAL"):
+                    circuito.registrar_fallo()
+                    print(f"DEBUG: Error en fila {i+1}: {razon}. Estado del circuito: {circuito.estado}.") # Debugging
                 else:
-                    errores_consecutivos = 0
+                    # Un ERROR_FORMATO es un problema de la respuesta, no de disponibilidad del servicio
+                    circuito.registrar_exito()
                     
-                categorias.append(categoria)
-                razones.append(razon)
-                
-                # Actualiza la barra de progreso. La etiqueta de texto ya está en el progress_bar
-                progress_bar.progress((i + 1) / total, text=f"Progreso: {((i + 1) / total)*100:.2f}% ({i+1}/{total} filas)")
+                resultados.categorias[i] = categoria
+                resultados.razones[i] = razon
                 
-                if errores_consecutivos >= limite_errores:
-                    st.error(f"❌ Se detectaron {errores_consecutivos} errores consecutivos. Se detiene la clasificación.")
-                    break
+                reporte.avanzar(errores=int(categoria.startswith("ERROR")))
                 
                 time.sleep(espera)
             
             # --- Manejo del fin prematuro ---
-            if len(categorias) < total:
-                status_text.warning(f"La clasificación se detuvo prematuramente en la fila {len(categorias)}. Rellenando el resto del archivo.")
-                while len(categorias) < total:
-                    categorias.append("NO_CLASIFICADO")
-                    razones.append("No procesado debido a errores consecutivos (posibles errores de API o límites)")
+            pendientes = resultados.pendientes()
+            if len(pendientes):
+                reporte.finalizar("Clasificación detenida prematuramente.")
+                st.warning(f"La clasificación se detuvo prematuramente en la fila {total - len(pendientes)}. Rellenando el resto del archivo.")
+                resultados.asignar(pendientes, "NO_CLASIFICADO", "No procesado: Gemini no se recuperó dentro del tiempo máximo de espera")
             else:
-                status_text.success("✅ Clasificación de archivo completada.")
+                reporte.finalizar("✅ Clasificación de archivo completada.")
 
 
-            df["Clasificacion-Gemini"] = categorias
-            df["Razon-Gemini"] = razones
+            # El archivo completo se lee recién para armar la salida
+            df = leer_archivo(hash_contenido, archivo.name, contenido)
+            df["Clasificacion-Gemini"] = resultados.columna_categorias()
+            df["Razon-Gemini"] = resultados.columna_razones()
 
             # Descargar resultado
             salida = BytesIO()
@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+import pandas as pd
+
+from carga_archivos import leer_datos
+from categorias import CATEGORIAS, normalizar_categoria
+from incremental import COLUMNA_CATEGORIA
+from modelo_local import ARCHIVO_ONNX, ARCHIVO_TOKENIZADOR, ARCHIVO_ETIQUETAS, DIRECTORIO_MODELO_LOCAL, MAX_LONGITUD
+from preprocesamiento import preprocesar
+
+# === ENTRENAMIENTO Y EXPORTACIÓN DEL MODELO LOCAL ===
+# Ajusta un clasificador multilingüe chico sobre el historial ya etiquetado por
+# Gemini (archivos _clasificado.xlsx) y lo exporta a ONNX para modelo_local.py.
+# Es una destilación: el modelo chico aprende a imitar las etiquetas del LLM.
+#
+# Dependencias (solo para entrenar, no hacen falta en la app):
+#   pip install torch transformers onnx
+# Uso:
+#   python entrenar_modelo_local.py historial1_clasificado.xlsx historial2_clasificado.xlsx --columna Queja
+MODELO_BASE = "distilbert-base-multilingual-cased"
+EPOCAS = 3
+TAMANO_LOTE = 32
+TASA_APRENDIZAJE = 5e-5
+PROPORCION_VALIDACION = 0.1
+SEMILLA = 42
+
+
+def cargar_historial(rutas, columna):
+    """
+    Junta los textos y las categorías de Gemini de los archivos clasificados.
+    Descarta filas sin texto y filas con ERROR, NO_CLASIFICADO o categorías no reconocidas.
+    """
+    partes = []
+    for ruta in rutas:
+        with open(ruta, "rb") as f:
+            datos = leer_datos(ruta, f.read(), [columna, COLUMNA_CATEGORIA])
+        textos, clasificables, _ = preprocesar(datos[columna])
+        etiquetas = datos[COLUMNA_CATEGORIA].fillna("").astype(str).map(normalizar_categoria)
+        partes.append(pd.DataFrame({"texto": textos, "categoria": etiquetas})[clasificables & etiquetas.notna()])
+    historial = pd.concat(partes, ignore_index=True).drop_duplicates("texto")
+    print(f"DEBUG: {len(historial)} filas etiquetadas para entrenar")
+    print(historial["categoria"].value_counts().to_string())
+    return historial
+
+
+def entrenar(historial, modelo_base=MODELO_BASE, epocas=EPOCAS):
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+    # Se conservan solo las categorías presentes en el historial, en el orden canónico
+    etiquetas = [c for c in CATEGORIAS if c in set(historial["categoria"])]
+    id_etiqueta = {c: i for i, c in enumerate(etiquetas)}
+
+    tokenizador = AutoTokenizer.from_pretrained(modelo_base, use_fast=True)
+    modelo = AutoModelForSequenceClassification.from_pretrained(modelo_base, num_labels=len(etiquetas))
+
+    filas = list(zip(historial["texto"], historial["categoria"].map(id_etiqueta)))
+    random.Random(SEMILLA).shuffle(filas)
+    corte = int(len(filas) * (1 - PROPORCION_VALIDACION))
+    entrenamiento, validacion = filas[:corte], filas[corte:]
+
+    def lotes(datos):
+        for inicio in range(0, len(datos), TAMANO_LOTE):
+            textos, clases = zip(*datos[inicio:inicio + TAMANO_LOTE])
+            entradas = tokenizador(list(textos), truncation=True, max_length=MAX_LONGITUD, padding=True, return_tensors="pt")
+            yield entradas, torch.tensor(clases)
+
+    optimizador = torch.optim.AdamW(modelo.parameters(), lr=TASA_APRENDIZAJE)
+    for epoca in range(epocas):
+        modelo.train()
+        random.Random(SEMILLA + epoca).shuffle(entrenamiento)
+        perdida_total = 0.0
+        for entradas, clases in lotes(entrenamiento):
+            salida = modelo(**entradas, labels=clases)
+            salida.loss.backward()
+            optimizador.step()
+            optimizador.zero_grad()
+            perdida_total += salida.loss.item()
+
+        modelo.eval()
+        aciertos = 0
+        with torch.no_grad():
+            for entradas, clases in lotes(validacion):
+                aciertos += int((modelo(**entradas).logits.argmax(dim=1) == clases).sum())
+        acuerdo = aciertos / len(validacion) if validacion else 0.0
+        print(f"DEBUG: Época {epoca + 1}/{epocas}: pérdida {perdida_total:.2f}, acuerdo con Gemini en validación {acuerdo:.1%}")
+
+    return modelo, tokenizador, etiquetas
+
+
+def exportar(modelo, tokenizador, etiquetas, directorio=DIRECTORIO_MODELO_LOCAL):
+    """Exporta a ONNX con ejes dinámicos (lote y longitud) y guarda tokenizador y etiquetas."""
+    import torch
+
+    os.makedirs(directorio, exist_ok=True)
+    modelo.eval()
+    ejemplo = tokenizador(["queja de ejemplo"], return_tensors="pt")
+    nombres_entrada = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in ejemplo]
+    ejes = {n: {0: "lote", 1: "longitud"} for n in nombres_entrada}
+    ejes["logits"] = {0: "lote"}
+    torch.onnx.export(
+        modelo,
+        tuple(ejemplo[n] for n in nombres_entrada),
+        os.path.join(directorio, ARCHIVO_ONNX),
+        input_names=nombres_entrada,
+        output_names=["logits"],
+        dynamic_axes=ejes,
+        opset_version=14,
+    )
+    tokenizador.backend_tokenizer.save(os.path.join(directorio, ARCHIVO_TOKENIZADOR))
+    with open(os.path.join(directorio, ARCHIVO_ETIQUETAS), "w", encoding="utf-8") as f:
+        json.dump(etiquetas, f, ensure_ascii=False, indent=2)
+    print(f"DEBUG: Modelo local exportado en {directorio}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entrena y exporta a ONNX el clasificador local.")
+    parser.add_argument("archivos", nargs="+", help="Archivos _clasificado.xlsx/.csv con la columna de Gemini.")
+    parser.add_argument("--columna", required=True, help="Columna con el texto de las quejas.")
+    parser.add_argument("--modelo-base", default=MODELO_BASE)
+    parser.add_argument("--epocas", type=int, default=EPOCAS)
+    parser.add_argument("--salida", default=DIRECTORIO_MODELO_LOCAL)
+    args = parser.parse_args(argv)
+
+    historial = cargar_historial(args.archivos, args.columna)
+    if historial.empty:
+        print("❌ No hay filas etiquetadas válidas para entrenar.", file=sys.stderr)
+        return 1
+    modelo, tokenizador, etiquetas = entrenar(historial, args.modelo_base, args.epocas)
+    exportar(modelo, tokenizador, etiquetas, args.salida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
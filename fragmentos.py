@@ -0,0 +1,349 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from carga_archivos import leer_datos
+from categorias import es_categoria_valida
+from circuito import obtener_circuito
+from clasificacion import configurar, clasificar_queja_con_razon, repreguntar_categoria, GEMINI_MODEL
+from incremental import COLUMNA_CATEGORIA, COLUMNA_RAZON
+from preprocesamiento import preprocesar, CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO, MAX_TOKENS_POR_QUEJA
+from reintentos import es_fila_fallida, filas_fallidas, drenar_cola
+
+# === PROCESAMIENTO POR FRAGMENTOS EN VARIAS MÁQUINAS ===
+# Un solo proceso de Streamlit es el techo de rendimiento. Para cargas grandes el
+# archivo se divide en N fragmentos con un manifiesto (hash del contenido, rangos
+# de filas y configuración). Cada fragmento se procesa sin interfaz en otra máquina
+# o proceso, con su propia API key, y al final se combinan los resultados en el
+# orden original verificando que no falte ningún fragmento.
+#
+# Uso:
+#   python fragmentos.py dividir quejas.xlsx --columna Queja --fragmentos 4 --carpeta frag/
+#   GEMINI_API_KEY=... python fragmentos.py procesar frag/manifiesto.json --fragmento 0
+#   python fragmentos.py combinar frag/manifiesto.json quejas.xlsx --salida quejas_clasificado.xlsx
+NOMBRE_MANIFIESTO = "manifiesto.json"
+VERSION_MANIFIESTO = 1
+COLUMNA_FILA = "fila" # Posición de la fila en el archivo original
+COLUMNA_TEXTO = "texto"
+GUARDAR_CADA = 50 # Filas entre guardados parciales del resultado (permite retomar)
+ESPERA_POR_DEFECTO = 0.5
+
+
+# --- ARCHIVOS ---
+def _hash_archivo(ruta):
+    sha = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(1 << 20), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _escribir_atomico(ruta, escribir):
+    """Escribe en un temporal y lo renombra, para no dejar archivos a medias."""
+    temporal = f"{ruta}.tmp"
+    escribir(temporal)
+    os.replace(temporal, ruta)
+
+
+def nombre_fragmento(numero):
+    return f"fragmento_{numero:03d}.csv"
+
+
+def nombre_resultado(numero):
+    return f"resultado_{numero:03d}.csv"
+
+
+def cargar_manifiesto(ruta_manifiesto):
+    with open(ruta_manifiesto, encoding="utf-8") as f:
+        manifiesto = json.load(f)
+    if manifiesto.get("version") != VERSION_MANIFIESTO:
+        raise ValueError(f"Versión de manifiesto no soportada: {manifiesto.get('version')}")
+    return manifiesto
+
+
+# --- DIVISIÓN ---
+def dividir(ruta_archivo, columna, cantidad, carpeta, modelo=GEMINI_MODEL, max_tokens=MAX_TOKENS_POR_QUEJA):
+    """
+    Divide la columna de quejas en fragmentos contiguos y escribe el manifiesto.
+
+    Args:
+        ruta_archivo (str): Archivo .xlsx o .csv original.
+        columna (str): Columna con las quejas.
+        cantidad (int): Cantidad de fragmentos.
+        carpeta (str): Carpeta donde se escriben los fragmentos y el manifiesto.
+        modelo (str): Modelo con el que deben procesarse todos los fragmentos.
+        max_tokens (int): Máximo de tokens por queja del preprocesamiento.
+
+    Returns:
+        dict: El manifiesto escrito.
+    """
+    with open(ruta_archivo, "rb") as f:
+        contenido = f.read()
+    quejas = leer_datos(ruta_archivo, contenido, [columna])[columna]
+    total = len(quejas)
+    cantidad = max(1, min(cantidad, total))
+    os.makedirs(carpeta, exist_ok=True)
+
+    fragmentos = []
+    for numero in range(cantidad):
+        desde, hasta = total * numero // cantidad, total * (numero + 1) // cantidad
+        ruta = os.path.join(carpeta, nombre_fragmento(numero))
+        parte = pd.DataFrame({COLUMNA_FILA: range(desde, hasta), COLUMNA_TEXTO: quejas.iloc[desde:hasta].to_numpy()})
+        _escribir_atomico(ruta, lambda t: parte.to_csv(t, index=False, encoding="utf-8"))
+        fragmentos.append({
+            "numero": numero,
+            "archivo": nombre_fragmento(numero),
+            "desde": desde,
+            "hasta": hasta, # Exclusivo
+            "hash": _hash_archivo(ruta),
+        })
+
+    manifiesto = {
+        "version": VERSION_MANIFIESTO,
+        "archivo_origen": os.path.basename(ruta_archivo),
+        "hash_contenido": hashlib.sha256(contenido).hexdigest(),
+        "columna": columna,
+        "total_filas": total,
+        "creado": datetime.now().isoformat(timespec="seconds"),
+        "configuracion": {"modelo": modelo, "max_tokens_queja": max_tokens},
+        "fragmentos": fragmentos,
+    }
+    ruta_manifiesto = os.path.join(carpeta, NOMBRE_MANIFIESTO)
+    _escribir_atomico(ruta_manifiesto, lambda t: _volcar_json(manifiesto, t))
+    print(f"DEBUG: {total} filas divididas en {cantidad} fragmentos en {carpeta}")
+    return manifiesto
+
+
+def _volcar_json(datos, ruta):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False, indent=2)
+
+
+# --- PROCESAMIENTO SIN INTERFAZ ---
+def _leer_resultado(ruta):
+    resultado = pd.read_csv(ruta, dtype={"categoria": str, "razon": str}, keep_default_na=False)
+    return dict(zip(resultado[COLUMNA_FILA], zip(resultado["categoria"], resultado["razon"])))
+
+
+def _guardar_resultado(ruta, filas, categorias, razones):
+    asignadas = [j for j, c in enumerate(categorias) if c]
+    datos = pd.DataFrame({
+        COLUMNA_FILA: [filas[j] for j in asignadas],
+        "categoria": [categorias[j] for j in asignadas],
+        "razon": [razones[j] for j in asignadas],
+    })
+    _escribir_atomico(ruta, lambda t: datos.to_csv(t, index=False, encoding="utf-8"))
+
+
+def procesar_fragmento(ruta_manifiesto, numero, api_key, carpeta_resultados=None, espera=ESPERA_POR_DEFECTO,
+                       reintentar=True, modelo_respaldo=None):
+    """
+    Clasifica un fragmento sin Streamlit. Guarda el resultado parcial cada GUARDAR_CADA
+    filas; si se vuelve a ejecutar, retoma desde las filas que ya estaban clasificadas.
+
+    Args:
+        ruta_manifiesto (str): Ruta del manifiesto; el fragmento se busca en la misma carpeta.
+        numero (int): Número de fragmento a procesar.
+        api_key (str): API key de Gemini de este trabajador.
+        carpeta_resultados (str | None): Dónde escribir el resultado (por defecto, junto al manifiesto).
+        espera (float): Segundos entre solicitudes.
+        reintentar (bool): Si se drena la cola de reintentos al final.
+        modelo_respaldo (str | None): Modelo para la última pasada de reintentos.
+
+    Returns:
+        str: Ruta del archivo de resultado.
+    """
+    manifiesto = cargar_manifiesto(ruta_manifiesto)
+    carpeta = os.path.dirname(os.path.abspath(ruta_manifiesto))
+    fragmento = next((f for f in manifiesto["fragmentos"] if f["numero"] == numero), None)
+    if fragmento is None:
+        raise ValueError(f"El manifiesto no tiene el fragmento {numero}")
+    ruta_fragmento = os.path.join(carpeta, fragmento["archivo"])
+    if _hash_archivo(ruta_fragmento) != fragmento["hash"]:
+        raise ValueError(f"El archivo {fragmento['archivo']} no coincide con el hash del manifiesto")
+
+    modelo = manifiesto["configuracion"]["modelo"]
+    datos = pd.read_csv(ruta_fragmento, dtype={COLUMNA_TEXTO: object})
+    filas = datos[COLUMNA_FILA].tolist()
+    textos, clasificables, _ = preprocesar(datos[COLUMNA_TEXTO], manifiesto["configuracion"]["max_tokens_queja"])
+
+    ruta_salida = os.path.join(carpeta_resultados or carpeta, nombre_resultado(numero))
+    previos = _leer_resultado(ruta_salida) if os.path.exists(ruta_salida) else {}
+    categorias, razones = [""] * len(filas), [""] * len(filas)
+    for j, fila in enumerate(filas):
+        if not clasificables.iloc[j]:
+            categorias[j], razones[j] = CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO
+        elif fila in previos and not es_fila_fallida(previos[fila][0]):
+            categorias[j], razones[j] = previos[fila]
+    pendientes = [j for j, c in enumerate(categorias) if not c]
+    print(f"DEBUG: Fragmento {numero}: {len(filas)} filas, {len(filas) - len(pendientes)} ya resueltas, {len(pendientes)} por clasificar")
+
+    configurar(api_key)
+    circuito = obtener_circuito("gemini", modelo)
+    pendientes_repregunta = []
+    inicio = time.monotonic()
+    for procesadas, j in enumerate(pendientes, start=1):
+        if not circuito.esperar_turno(al_esperar=lambda s: print(f"DEBUG: Circuito abierto; próxima prueba en {s:.0f}s")):
+            print("DEBUG: Gemini no se recuperó dentro del tiempo máximo de espera. Se corta el fragmento.")
+            break
+        categoria, razon = clasificar_queja_con_razon(textos.iloc[j], modelo=modelo)
+        if categoria == "ERROR":
+            circuito.registrar_fallo()
+        else:
+            circuito.registrar_exito()
+            if not es_categoria_valida(categoria):
+                pendientes_repregunta.append(j)
+        categorias[j], razones[j] = categoria, razon
+        if procesadas % GUARDAR_CADA == 0:
+            _guardar_resultado(ruta_salida, filas, categorias, razones)
+            velocidad = procesadas / (time.monotonic() - inicio)
+            print(f"DEBUG: Fragmento {numero}: {procesadas}/{len(pendientes)} filas ({velocidad:.1f} filas/s)")
+        time.sleep(espera)
+
+    fallidas = filas_fallidas(categorias, pendientes)
+    if reintentar and fallidas:
+        def reintentar_lote(indices, modelo_reintento):
+            resultados = {}
+            for j in indices:
+                if not circuito.esperar_turno():
+                    resultados[j] = (categorias[j], razones[j])
+                    continue
+                categoria, razon = clasificar_queja_con_razon(textos.iloc[j], modelo=modelo_reintento or modelo)
+                if categoria == "ERROR":
+                    circuito.registrar_fallo()
+                else:
+                    circuito.registrar_exito()
+                resultados[j] = (categoria, razon)
+            return resultados
+
+        for j, (categoria, razon) in drenar_cola(fallidas, reintentar_lote, modelo_respaldo=modelo_respaldo).items():
+            categorias[j], razones[j] = categoria, razon
+            if not es_fila_fallida(categoria) and not es_categoria_valida(categoria) and j not in pendientes_repregunta:
+                pendientes_repregunta.append(j)
+
+    for j in pendientes_repregunta:
+        canonica = repreguntar_categoria(textos.iloc[j], categorias[j])
+        if canonica:
+            categorias[j] = canonica
+        else:
+            razones[j] = f"Categoría no reconocida: '{categorias[j]}'. {razones[j]}"
+            categorias[j] = "ERROR_CATEGORIA"
+
+    _guardar_resultado(ruta_salida, filas, categorias, razones)
+    sin_resultado = sum(1 for c in categorias if not c)
+    print(f"DEBUG: Fragmento {numero} terminado: {len(filas) - sin_resultado}/{len(filas)} filas con resultado, "
+          f"{len(filas_fallidas(categorias))} con error. Resultado en {ruta_salida}")
+    return ruta_salida
+
+
+# --- COMBINACIÓN ---
+def verificar_resultados(manifiesto, carpeta_resultados):
+    """
+    Revisa que cada fragmento tenga su resultado y que cubra todas sus filas.
+
+    Returns:
+        tuple: (resultados {fila: (categoria, razon)}, problemas [str]).
+    """
+    resultados, problemas = {}, []
+    for fragmento in manifiesto["fragmentos"]:
+        ruta = os.path.join(carpeta_resultados, nombre_resultado(fragmento["numero"]))
+        if not os.path.exists(ruta):
+            problemas.append(f"Fragmento {fragmento['numero']}: falta {nombre_resultado(fragmento['numero'])}")
+            continue
+        parcial = _leer_resultado(ruta)
+        esperadas = set(range(fragmento["desde"], fragmento["hasta"]))
+        faltantes = esperadas - parcial.keys()
+        ajenas = parcial.keys() - esperadas
+        if faltantes:
+            problemas.append(f"Fragmento {fragmento['numero']}: faltan {len(faltantes)} filas (p. ej. {min(faltantes)})")
+        if ajenas:
+            problemas.append(f"Fragmento {fragmento['numero']}: {len(ajenas)} filas fuera de su rango")
+        resultados.update(parcial)
+    return resultados, problemas
+
+
+def combinar(ruta_manifiesto, ruta_original, ruta_salida, carpeta_resultados=None):
+    """
+    Une los resultados de todos los fragmentos con el archivo original, en el orden original.
+
+    Raises:
+        ValueError: Si el original no coincide con el manifiesto o falta algún fragmento o fila.
+    """
+    manifiesto = cargar_manifiesto(ruta_manifiesto)
+    carpeta_resultados = carpeta_resultados or os.path.dirname(os.path.abspath(ruta_manifiesto))
+    with open(ruta_original, "rb") as f:
+        contenido = f.read()
+    if hashlib.sha256(contenido).hexdigest() != manifiesto["hash_contenido"]:
+        raise ValueError(f"{ruta_original} no es el archivo con el que se armó el manifiesto ({manifiesto['archivo_origen']})")
+
+    resultados, problemas = verificar_resultados(manifiesto, carpeta_resultados)
+    if problemas:
+        raise ValueError("No se puede combinar:\n" + "\n".join(problemas))
+
+    df = leer_datos(ruta_original, contenido)
+    orden = range(manifiesto["total_filas"])
+    df[COLUMNA_CATEGORIA] = [resultados[i][0] for i in orden]
+    df[COLUMNA_RAZON] = [resultados[i][1] for i in orden]
+    if ruta_salida.lower().endswith(".csv"):
+        df.to_csv(ruta_salida, index=False, encoding="utf-8")
+    else:
+        df.to_excel(ruta_salida, index=False)
+    errores = len(filas_fallidas(df[COLUMNA_CATEGORIA].tolist()))
+    print(f"DEBUG: {len(df)} filas combinadas de {len(manifiesto['fragmentos'])} fragmentos ({errores} con error) en {ruta_salida}")
+    return df
+
+
+# --- LÍNEA DE COMANDOS ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clasificación de quejas por fragmentos, sin interfaz.")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_dividir = comandos.add_parser("dividir", help="Divide un archivo en fragmentos y escribe el manifiesto.")
+    p_dividir.add_argument("archivo")
+    p_dividir.add_argument("--columna", required=True)
+    p_dividir.add_argument("--fragmentos", type=int, required=True)
+    p_dividir.add_argument("--carpeta", default="fragmentos")
+    p_dividir.add_argument("--modelo", default=GEMINI_MODEL)
+    p_dividir.add_argument("--max-tokens-queja", type=int, default=MAX_TOKENS_POR_QUEJA)
+
+    p_procesar = comandos.add_parser("procesar", help="Clasifica un fragmento del manifiesto.")
+    p_procesar.add_argument("manifiesto")
+    p_procesar.add_argument("--fragmento", type=int, required=True)
+    p_procesar.add_argument("--api-key-env", default="GEMINI_API_KEY", help="Variable de entorno con la API key de este trabajador.")
+    p_procesar.add_argument("--resultados", default=None, help="Carpeta de salida (por defecto, la del manifiesto).")
+    p_procesar.add_argument("--espera", type=float, default=ESPERA_POR_DEFECTO)
+    p_procesar.add_argument("--sin-reintentos", action="store_true")
+    p_procesar.add_argument("--modelo-respaldo", default=None)
+
+    p_combinar = comandos.add_parser("combinar", help="Une los resultados de todos los fragmentos.")
+    p_combinar.add_argument("manifiesto")
+    p_combinar.add_argument("original")
+    p_combinar.add_argument("--salida", required=True)
+    p_combinar.add_argument("--resultados", default=None)
+
+    args = parser.parse_args(argv)
+    try:
+        if args.comando == "dividir":
+            dividir(args.archivo, args.columna, args.fragmentos, args.carpeta, args.modelo, args.max_tokens_queja)
+        elif args.comando == "procesar":
+            api_key = os.getenv(args.api_key_env)
+            if not api_key:
+                parser.error(f"Definí la API key en la variable de entorno {args.api_key_env}")
+            procesar_fragmento(args.manifiesto, args.fragmento, api_key, args.resultados, args.espera,
+                               not args.sin_reintentos, args.modelo_respaldo)
+        else:
+            combinar(args.manifiesto, args.original, args.salida, args.resultados)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from categorias import es_categoria_valida
+from incremental import huellas, normalizar_ids
+
+# === HISTORIAL LOCAL DE CLASIFICACIONES ===
+# Cada corrida deja un _clasificado.xlsx descartable; para responder preguntas como
+# "cuántas quejas de Infraestructura hubo por mes este año" habría que abrir decenas
+# de archivos. Por eso cada fila clasificada también se guarda en un SQLite local con
+# índices por categoría, fecha, archivo de origen y huella del texto, más un índice
+# de texto completo (FTS5) para buscar quejas. Las consultas corren en milisegundos
+# y las quejas ya clasificadas se pueden reutilizar en corridas nuevas.
+#
+# Una queja se identifica por su texto normalizado (huella), su ID y su fecha, no por
+# el archivo: si vuelve en una exportación acumulada o en una copia editada, se
+# actualiza la fila existente en lugar de contarla dos veces.
+RUTA_HISTORIAL = os.getenv("RUTA_HISTORIAL", "historial_quejas.sqlite")
+TAMANO_CONSULTA = 500 # Parámetros por consulta IN (...) al buscar huellas
+LIMITE_BUSQUEDA = 200
+# Fecha de la queja; las que no tienen fecha conocida (NULL) cuentan por el día en que se clasificaron
+_FECHA = "COALESCE(fecha, substr(clasificado, 1, 10))"
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS clasificaciones (
+    id INTEGER PRIMARY KEY,
+    huella INTEGER NOT NULL,
+    id_queja TEXT NOT NULL DEFAULT '',
+    archivo TEXT NOT NULL,
+    hash_contenido TEXT NOT NULL,
+    hoja TEXT NOT NULL DEFAULT '',
+    fila INTEGER NOT NULL,
+    fecha TEXT,
+    texto TEXT NOT NULL,
+    categoria TEXT NOT NULL,
+    razon TEXT,
+    modelo TEXT,
+    clasificado TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_clasificaciones_queja ON clasificaciones (huella, id_queja, COALESCE(fecha, ''));
+CREATE INDEX IF NOT EXISTS idx_clasificaciones_origen ON clasificaciones (hash_contenido, hoja);
+CREATE INDEX IF NOT EXISTS idx_clasificaciones_categoria_fecha
+    ON clasificaciones (categoria, COALESCE(fecha, substr(clasificado, 1, 10)));
+CREATE INDEX IF NOT EXISTS idx_clasificaciones_fecha ON clasificaciones (COALESCE(fecha, substr(clasificado, 1, 10)));
+CREATE INDEX IF NOT EXISTS idx_clasificaciones_archivo ON clasificaciones (archivo);
+"""
+
+# Índice de texto completo sincronizado con la tabla por triggers
+_ESQUEMA_FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS clasificaciones_fts USING fts5(
+    texto, content='clasificaciones', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS clasificaciones_ai AFTER INSERT ON clasificaciones BEGIN
+    INSERT INTO clasificaciones_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS clasificaciones_ad AFTER DELETE ON clasificaciones BEGIN
+    INSERT INTO clasificaciones_fts(clasificaciones_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+END;
+CREATE TRIGGER IF NOT EXISTS clasificaciones_au AFTER UPDATE ON clasificaciones BEGIN
+    INSERT INTO clasificaciones_fts(clasificaciones_fts, rowid, texto) VALUES ('delete', old.id, old.texto);
+    INSERT INTO clasificaciones_fts(rowid, texto) VALUES (new.id, new.texto);
+END;
+"""
+
+_tiene_fts = None
+
+
+def _conectar(ruta=None):
+    global _tiene_fts
+    conexion = sqlite3.connect(ruta or RUTA_HISTORIAL, timeout=30)
+    conexion.execute("PRAGMA journal_mode=WAL") # Lecturas de la pestaña de análisis sin bloquear escrituras
+    conexion.executescript(_ESQUEMA)
+    if _tiene_fts is None:
+        try:
+            conexion.executescript(_ESQUEMA_FTS)
+            _tiene_fts = True
+        except sqlite3.OperationalError as e: # SQLite compilado sin FTS5: la búsqueda usa LIKE
+            print(f"DEBUG: FTS5 no disponible ({e}). La búsqueda de texto usará LIKE.")
+            _tiene_fts = False
+    return conexion
+
+
+def _fechas(fechas, total):
+    """Fecha de cada queja (YYYY-MM-DD); None si el archivo no tiene columna de fecha o no se puede leer."""
+    if fechas is None:
+        return [None] * total
+    convertidas = pd.to_datetime(fechas, errors="coerce", dayfirst=True).dt.strftime("%Y-%m-%d")
+    return convertidas.astype(object).where(convertidas.notna(), None).tolist()
+
+
+def guardar_corrida(archivo, hash_contenido, textos, categorias, razones, modelo, fechas=None, hoja="", ids=None):
+    """
+    Guarda en el historial las filas clasificadas de un archivo (u hoja). Las filas con
+    error, sin clasificar o sin texto no se guardan. Volver a guardar el mismo archivo
+    reemplaza todas sus filas (también las que ahora fallaron), y una queja que ya
+    estaba guardada desde otro archivo (mismo texto, ID y fecha) se actualiza en
+    lugar de duplicarse.
+
+    Args:
+        archivo (str): Nombre del archivo de origen.
+        hash_contenido (str): Hash del archivo (identifica la corrida junto con hoja y fila).
+        textos (pd.Series): Textos clasificados, en el orden del archivo.
+        categorias, razones (list): Resultado por fila.
+        modelo (str): Modelo que clasificó.
+        fechas (pd.Series | None): Columna de fecha de las quejas, si el archivo la tiene.
+        hoja (str): Nombre de la hoja, en libros con varias hojas.
+        ids (pd.Series | None): Columna de ID de las quejas, si el archivo la tiene.
+
+    Returns:
+        int: Filas guardadas.
+    """
+    validas = [i for i, c in enumerate(categorias) if es_categoria_valida(c)]
+    textos = textos.reset_index(drop=True)
+    huellas_filas = huellas(textos).astype("int64").to_numpy()
+    fechas_filas = _fechas(fechas.reset_index(drop=True) if fechas is not None else None, len(textos))
+    clasificado = datetime.now().isoformat(timespec="seconds")
+    textos_filas = textos.fillna("").astype(str).tolist()
+    ids_filas = normalizar_ids(ids.reset_index(drop=True)).tolist() if ids is not None else [""] * len(textos)
+
+    filas = [
+        (int(huellas_filas[i]), ids_filas[i], archivo, hash_contenido, str(hoja), i, fechas_filas[i],
+         textos_filas[i], categorias[i], razones[i], modelo, clasificado)
+        for i in validas
+    ]
+    with closing(_conectar()) as conexion, conexion:
+        # Lo guardado antes desde este mismo archivo (u hoja) se reemplaza por esta corrida
+        conexion.execute("DELETE FROM clasificaciones WHERE hash_contenido = ? AND hoja = ?", (hash_contenido, str(hoja)))
+        conexion.executemany(
+            # UPSERT (y no INSERT OR REPLACE) para que el trigger de UPDATE mantenga el índice FTS
+            "INSERT INTO clasificaciones "
+            "(huella, id_queja, archivo, hash_contenido, hoja, fila, fecha, texto, categoria, razon, modelo, clasificado) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (huella, id_queja, COALESCE(fecha, '')) DO UPDATE SET "
+            "archivo = excluded.archivo, hash_contenido = excluded.hash_contenido, hoja = excluded.hoja, fila = excluded.fila, "
+            "texto = excluded.texto, categoria = excluded.categoria, razon = excluded.razon, modelo = excluded.modelo, "
+            "clasificado = excluded.clasificado",
+            filas,
+        )
+    print(f"DEBUG: {len(filas)} filas guardadas en el historial ({archivo} {hoja})".rstrip())
+    return len(filas)
+
+
+def reutilizar_del_historial(textos):
+    """
+    Busca en el historial las quejas con el mismo texto normalizado (por huella)
+    y devuelve su clasificación más reciente.
+
+    Returns:
+        tuple: (categorias, razones) como pd.Series alineadas con textos; NaN si no hay coincidencia.
+    """
+    huellas_textos = huellas(textos).astype("int64")
+    distintas = huellas_textos.unique().tolist()
+    encontradas = {}
+    with closing(_conectar()) as conexion:
+        for inicio in range(0, len(distintas), TAMANO_CONSULTA):
+            parte = distintas[inicio:inicio + TAMANO_CONSULTA]
+            marcadores = ",".join("?" * len(parte))
+            # Por el orden ascendente, la última asignación de cada huella es la más reciente
+            for huella, categoria, razon in conexion.execute(
+                f"SELECT huella, categoria, razon FROM clasificaciones WHERE huella IN ({marcadores}) ORDER BY clasificado",
+                parte,
+            ):
+                encontradas[huella] = (categoria, razon)
+    categorias = huellas_textos.map(lambda h: encontradas[h][0] if h in encontradas else None)
+    razones = huellas_textos.map(lambda h: encontradas[h][1] if h in encontradas else None)
+    return categorias, razones
+
+
+# --- CONSULTAS PARA LA PESTAÑA DE ANÁLISIS ---
+def _filtros(desde=None, hasta=None, categorias=None, archivos=None):
+    condiciones, parametros = [], []
+    if desde:
+        condiciones.append(f"{_FECHA} >= ?")
+        parametros.append(str(desde))
+    if hasta:
+        condiciones.append(f"{_FECHA} <= ?")
+        parametros.append(str(hasta))
+    if categorias:
+        condiciones.append(f"categoria IN ({','.join('?' * len(categorias))})")
+        parametros.extend(categorias)
+    if archivos:
+        condiciones.append(f"archivo IN ({','.join('?' * len(archivos))})")
+        parametros.extend(archivos)
+    return (" WHERE " + " AND ".join(condiciones)) if condiciones else "", parametros
+
+
+def resumen_historial():
+    with closing(_conectar()) as conexion:
+        filas, archivos, desde, hasta = conexion.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT archivo), MIN({_FECHA}), MAX({_FECHA}) FROM clasificaciones"
+        ).fetchone()
+    return {"filas": filas, "archivos": archivos, "desde": desde, "hasta": hasta}
+
+
+def archivos_en_historial():
+    with closing(_conectar()) as conexion:
+        return [a for (a,) in conexion.execute("SELECT DISTINCT archivo FROM clasificaciones ORDER BY archivo")]
+
+
+def quejas_por_mes(desde=None, hasta=None, categorias=None, archivos=None):
+    """Cantidad de quejas por mes y categoría, como tabla mes x categoría."""
+    donde, parametros = _filtros(desde, hasta, categorias, archivos)
+    with closing(_conectar()) as conexion:
+        datos = pd.read_sql_query(
+            f"SELECT substr({_FECHA}, 1, 7) AS mes, categoria, COUNT(*) AS quejas FROM clasificaciones{donde} "
+            "GROUP BY mes, categoria ORDER BY mes",
+            conexion, params=parametros,
+        )
+    if datos.empty:
+        return datos
+    return datos.pivot(index="mes", columns="categoria", values="quejas").fillna(0).astype(int)
+
+
+def quejas_por_categoria(desde=None, hasta=None, archivos=None):
+    donde, parametros = _filtros(desde, hasta, archivos=archivos)
+    with closing(_conectar()) as conexion:
+        return pd.read_sql_query(
+            f"SELECT categoria, COUNT(*) AS quejas FROM clasificaciones{donde} GROUP BY categoria ORDER BY quejas DESC",
+            conexion, params=parametros,
+        )
+
+
+def buscar_quejas(consulta, desde=None, hasta=None, categorias=None, limite=LIMITE_BUSQUEDA):
+    """
+    Búsqueda de texto completo (sintaxis FTS5: palabras, "frases", prefijo*, OR, NOT),
+    ordenada por relevancia. Sin FTS5 se busca la frase con LIKE.
+    """
+    donde, parametros = _filtros(desde, hasta, categorias)
+    columnas = f"{_FECHA} AS fecha, c.categoria, c.texto, c.razon, c.archivo, c.hoja, c.fila"
+    with closing(_conectar()) as conexion:
+        if _tiene_fts:
+            donde = donde.replace(" WHERE ", " AND ") if donde else ""
+            return pd.read_sql_query(
+                f"SELECT {columnas} FROM clasificaciones_fts f JOIN clasificaciones c ON c.id = f.rowid "
+                f"WHERE clasificaciones_fts MATCH ?{donde} ORDER BY bm25(clasificaciones_fts) LIMIT ?",
+                conexion, params=[consulta, *parametros, limite],
+            )
+        donde = (donde + " AND" if donde else " WHERE") + " texto LIKE ?"
+        return pd.read_sql_query(
+            f"SELECT {columnas} FROM clasificaciones c{donde} ORDER BY {_FECHA} DESC LIMIT ?",
+            conexion, params=[*parametros, f"%{consulta}%", limite],
+        )
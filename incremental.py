@@ -0,0 +1,80 @@
+import pandas as pd
+
+# Columnas de resultado que escribe clasificador.py en el archivo _clasificado.xlsx
+COLUMNA_CATEGORIA = "Clasificacion-Gemini"
+COLUMNA_RAZON = "Razon-Gemini"
+
+# Estados que no se reutilizan: esas filas se vuelven a clasificar
+ESTADOS_NO_REUTILIZABLES = ("ERROR", "NO_CLASIFICADO")
+
+
+def normalizar_ids(ids):
+    """
+    IDs como texto comparable entre archivos. Si la columna de ID tiene algún blanco,
+    pandas la lee como float y 1 pasa a ser 1.0: los IDs enteros se escriben sin ".0".
+    """
+    texto = ids.astype(object).where(ids.notna(), "").astype(str).str.strip()
+    numeros = pd.to_numeric(texto, errors="coerce")
+    enteros = numeros % 1 == 0 # NaN e infinito dan False
+    texto[enteros] = numeros[enteros].astype("int64").astype(str)
+    return texto
+
+
+def huellas(textos, ids=None):
+    """
+    Calcula una huella (hash uint64) por fila a partir del texto normalizado
+    y, opcionalmente, de una columna de ID. Todo es vectorizado con pandas.
+
+    Args:
+        textos (pd.Series): Textos de las quejas.
+        ids (pd.Series | None): Columna de ID alineada con textos.
+
+    Returns:
+        pd.Series: Huellas uint64 con el mismo índice que textos.
+    """
+    normalizado = (
+        textos.fillna("").astype(str)
+        .str.strip()
+        .str.lower()
+        .str.replace(r"\s+", " ", regex=True)
+    )
+    partes = {"texto": normalizado}
+    if ids is not None:
+        partes["id"] = normalizar_ids(ids)
+    return pd.util.hash_pandas_object(pd.DataFrame(partes, index=textos.index), index=False)
+
+
+def reutilizar_clasificaciones(textos, previo, columna, ids=None, columna_id=None):
+    """
+    Trae las clasificaciones de un archivo _clasificado.xlsx anterior para las filas
+    cuyo texto (y ID, si se indicó) no cambió, mediante un merge por huella.
+
+    Args:
+        textos (pd.Series): Columna de quejas del archivo nuevo.
+        previo (pd.DataFrame): Archivo clasificado anterior.
+        columna (str): Nombre de la columna de quejas (el mismo en ambos archivos).
+        ids (pd.Series | None): Columna de ID del archivo nuevo.
+        columna_id (str | None): Nombre de la columna de ID en el archivo anterior.
+
+    Returns:
+        tuple: (categorias, razones) como pd.Series alineadas con textos.
+               Las filas sin coincidencia quedan en NaN y hay que clasificarlas.
+    """
+    faltantes = [c for c in (columna, columna_id, COLUMNA_CATEGORIA, COLUMNA_RAZON) if c and c not in previo.columns]
+    if faltantes:
+        raise ValueError(f"El archivo anterior no tiene las columnas: {', '.join(map(str, faltantes))}")
+
+    categorias_previas = previo[COLUMNA_CATEGORIA].fillna("").astype(str)
+    validas = ~categorias_previas.str.startswith(ESTADOS_NO_REUTILIZABLES) & categorias_previas.ne("")
+    previo = previo.loc[validas]
+
+    tabla_previa = pd.DataFrame({
+        "_huella": huellas(previo[columna], previo[columna_id] if columna_id else None),
+        COLUMNA_CATEGORIA: previo[COLUMNA_CATEGORIA],
+        COLUMNA_RAZON: previo[COLUMNA_RAZON],
+    }).drop_duplicates("_huella", keep="last")
+
+    nuevas = pd.DataFrame({"_huella": huellas(textos, ids)})
+    unido = nuevas.merge(tabla_previa, on="_huella", how="left")
+    unido.index = textos.index
+    return unido[COLUMNA_CATEGORIA], unido[COLUMNA_RAZON]
@@ -0,0 +1,39 @@
+import threading
+import time
+
+# === LIMITADOR DE TASA POR PROVEEDOR/MODELO ===
+# Cuando varias solicitudes salen en paralelo (varios archivos y hojas a la vez),
+# todas pasan por el mismo limitador para no superar las solicitudes por minuto
+# del proveedor. Los turnos se reparten en intervalos regulares, en orden de llegada.
+SOLICITUDES_POR_MINUTO = 60
+
+
+class LimitadorTasa:
+    def __init__(self, solicitudes_por_minuto=SOLICITUDES_POR_MINUTO):
+        self.solicitudes_por_minuto = solicitudes_por_minuto
+        self._proximo = 0.0
+        self._lock = threading.Lock()
+
+    def esperar(self):
+        """Bloquea hasta el próximo turno libre. Es seguro entre hilos."""
+        intervalo = 60.0 / self.solicitudes_por_minuto
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo)
+            self._proximo = turno + intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+_limitadores = {}
+_lock_registro = threading.Lock()
+
+
+def obtener_limitador(proveedor, modelo, solicitudes_por_minuto=SOLICITUDES_POR_MINUTO):
+    """Devuelve el limitador compartido de proveedor/modelo, actualizando su tasa si cambió."""
+    with _lock_registro:
+        limitador = _limitadores.get((proveedor, modelo))
+        if limitador is None:
+            limitador = _limitadores[(proveedor, modelo)] = LimitadorTasa(solicitudes_por_minuto)
+        limitador.solicitudes_por_minuto = solicitudes_por_minuto
+        return limitador
@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
 import time
 from io import BytesIO
-import os
-import google.generativeai as genai
+from arranque import configurar_gemini, gemini, precalentar
+from carga_archivos import datos_de_subida, leer_columnas, leer_columna, leer_archivo
+from progreso import ReporteProgreso
+from categorias import parsear_respuesta
+from resultados import BufferResultados
 
 # === CONFIGURACIÓN BÁSICA DE LA APP ===
 st.set_page_config(page_title="Clasificador de Quejas", layout="centered")
@@ -18,7 +20,9 @@ if not API_KEY or API_KEY == "TU_API_KEY_DE_GEMINI_AQUI":
     st.error("❌ La API Key de Gemini no está configurada. Por favor, reemplaza 'TU_API_KEY_DE_GEMINI_AQUI' en el código con tu clave real.")
     st.stop()
 
-genai.configure(api_key=API_KEY)
+# El SDK se importa y configura en segundo plano; la página se dibuja sin esperarlo
+configurar_gemini(API_KEY)
+precalentar("gemini")
 
 # === FUNCIÓN DE CLASIFICACIÓN ===
 def clasificar_queja_con_razon(texto):
@@ -46,16 +50,11 @@ Razón: <explicación>
 Texto: {texto}
 """
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
+        model = gemini().GenerativeModel("gemini-2.5-flash")
         response = model.generate_content(prompt)
         respuesta = response.text.strip()
 
-        categoria, razon = "", ""
-        for linea in respuesta.splitlines():
-            if linea.lower().startswith("categoría:") or linea.lower().startswith("categoria:"):
-                categoria = linea.split(":", 1)[1].strip()
-            elif linea.lower().startswith("razón:") or linea.lower().startswith("razon:"):
-                razon = linea.split(":", 1)[1].strip()
+        categoria, razon = parsear_respuesta(respuesta)
         return categoria, razon
 
     except Exception as e:
@@ -89,33 +88,31 @@ else:
     archivo = st.file_uploader("📁 Subí un archivo Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"])
 
     if archivo:
-        if archivo.name.endswith(".csv"):
-            df = pd.read_csv(archivo)
-        else:
-            df = pd.read_excel(archivo)
+        # Solo se leen los encabezados; el archivo completo se carga al clasificar
+        contenido, hash_contenido = datos_de_subida(archivo)
+        columnas = leer_columnas(hash_contenido, archivo.name, contenido)
 
         st.write("✅ Archivo cargado. Columnas:")
-        st.write(df.columns.tolist())
+        st.write(columnas)
 
-        columna = st.selectbox("Seleccioná la columna con las quejas:", df.columns)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
         # Se elimina el slider de espera y se fija el valor a 0.0 para no añadir retrasos artificiales
         espera = 0.0 
 
         if st.button("🚀 Clasificar archivo"):
-            categorias = []
-            razones = []
-            total = len(df)
-            progreso = st.progress(0)
-            estado = st.empty()
+            # Para clasificar solo se carga la columna elegida
+            quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+
+            total = len(quejas)
+            resultados = BufferResultados(total) # Categorías y razones en arrays compactos
+            reporte = ReporteProgreso(total)
             proceso_completado_exitosamente = False # Bandera para saber si el script terminó su ejecución
 
             errores_consecutivos = 0
             limite_errores = 20
             
             try:
-                for i, texto in enumerate(df[columna].astype(str)):
-                    estado.text(f"Clasificando fila {i + 1} de {total}...")
-                    
+                for i, texto in enumerate(quejas.astype(str)):
                     try:
                         categoria, razon = clasificar_queja_con_razon(texto)
                         if categoria == "ERROR":
@@ -130,9 +127,9 @@ else:
                         errores_consecutivos += 1
                         print(f"DEBUG: Excepción inesperada en fila {i+1}: {razon}") # Debugging
                     
-                    categorias.append(categoria)
-                    razones.append(razon)
-                    progreso.progress((i + 1) / total)
+                    resultados.categorias[i] = categoria
+                    resultados.razones[i] = razon
+                    reporte.avanzar(errores=int(categoria.startswith("ERROR")))
                     
                     if errores_consecutivos >= limite_errores:
                         st.error(f"❌ Se detectaron {errores_consecutivos} errores consecutivos. Se detiene la clasificación.")
@@ -142,17 +139,16 @@ else:
                     time.sleep(espera) # Se mantiene para permitir un respiro si es necesario, pero ahora el default es 0.0
                 
                 # Lógica de relleno si el bucle se detuvo prematuramente
-                if len(categorias) < total:
-                    st.warning(f"La clasificación se detuvo prematuramente en la fila {len(categorias)}. Rellenando el resto con 'NO_CLASIFICADO' y 'No procesado debido a errores consecutivos'.")
-                    print(f"DEBUG: Rellenando filas restantes. Procesadas: {len(categorias)}, Total: {total}") # Debugging
+                pendientes = resultados.pendientes()
+                if len(pendientes):
+                    procesadas = total - len(pendientes)
+                    st.warning(f"La clasificación se detuvo prematuramente en la fila {procesadas}. Rellenando el resto con 'NO_CLASIFICADO' y 'No procesado debido a errores consecutivos'.")
+                    print(f"DEBUG: Rellenando filas restantes. Procesadas: {procesadas}, Total: {total}") # Debugging
                     # Rellenar con los valores predeterminados hasta el final del DataFrame
-                    while len(categorias) < total:
-                        categorias.append("NO_CLASIFICADO")
-                        razones.append("No procesado debido a errores consecutivos")
+                    resultados.asignar(pendientes, "NO_CLASIFICADO", "No procesado debido a errores consecutivos")
                 
                 # Asegura que la barra de progreso llegue al 100% al finalizar o detenerse
-                progreso.progress(1.0)
-                estado.text("Clasificación finalizada.")
+                reporte.finalizar("Clasificación finalizada.")
                 print("DEBUG: Proceso de clasificación completado (o detenido por errores).") # Debugging
                 proceso_completado_exitosamente = True # El script llegó a su fin
 
@@ -160,11 +156,12 @@ else:
                 st.error(f"❌ ¡Ocurrió un error inesperado durante el procesamiento del archivo! Por favor, revisa la consola de tu terminal. Error: {e}")
                 print(f"DEBUG: Excepción crítica en el bucle principal: {e}") # Debugging
                 # Asegura que la barra de progreso se detenga y muestre el estado final
-                progreso.progress(1.0)
-                estado.text("Clasificación detenida por error crítico.")
+                reporte.finalizar("Clasificación detenida por error crítico.")
 
-            df["Clasificacion-Gemini"] = categorias
-            df["Razon-Gemini"] = razones
+            # El archivo completo se lee recién para armar la salida
+            df = leer_archivo(hash_contenido, archivo.name, contenido)
+            df["Clasificacion-Gemini"] = resultados.columna_categorias()
+            df["Razon-Gemini"] = resultados.columna_razones()
 
             # Descargar resultado
             salida = BytesIO()
@@ -3,8 +3,17 @@ import pandas as pd
 import time
 from io import BytesIO
 import os
-import google.generativeai as genai
+from arranque import configurar_gemini, gemini, precalentar
 import json # Necesario para parsear la respuesta JSON de Gemini
+from carga_archivos import datos_de_subida, leer_columnas, leer_columna, leer_archivo
+from progreso import ReporteProgreso
+from planificador import planificar, describir_plan, registrar_uso, Presupuesto
+from reintentos import es_fila_fallida, drenar_cola
+from lotes import costos_por_fila, ordenar_por_longitud, generar_lotes, ControladorLote
+from categorias import parsear_respuesta, normalizar_categoria, prompt_repregunta
+from casete import generar_contenido
+from preprocesamiento import preprocesar, describir_preprocesamiento, CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO
+from resultados import BufferResultados
 
 # === CONFIGURACIÓN BÁSICA DE LA APP ===
 st.set_page_config(page_title="Clasificador de Quejas", layout="centered")
@@ -19,12 +28,16 @@ if not API_KEY or API_KEY == "TU_API_KEY_DE_GEMINI_AQUI":
     st.error("❌ La API Key de Gemini no está configurada. Por favor, reemplaza 'TU_API_KEY_DE_GEMINI_AQUI' en el código con tu clave real.")
     st.stop()
 
-genai.configure(api_key=API_KEY)
+# El SDK se importa y configura en segundo plano; la página se dibuja sin esperarlo
+configurar_gemini(API_KEY)
+precalentar("gemini")
 
 # --- Define el modelo de Gemini a usar ---
 # Puedes ajustar esto según tus necesidades. gemini-1.5-flash es más rápido y económico
 # que gemini-1.5-pro, y es ideal para tareas de clasificación masiva.
 GEMINI_MODEL = "gemini-1.5-flash-latest"
+# Modelo opcional para la última pasada de reintentos de filas con error (None = usar GEMINI_MODEL)
+GEMINI_MODEL_RESPALDO = None
 
 # === FUNCIÓN DE CLASIFICACIÓN INDIVIDUAL (PARA MODO MANUAL) ===
 # Se mantiene la función original, ya que el modo manual clasifica una por una.
@@ -53,16 +66,11 @@ Razón: <explicación>
 Texto: {texto}
 """
     try:
-        model = genai.GenerativeModel(GEMINI_MODEL)
+        model = gemini().GenerativeModel(GEMINI_MODEL)
         response = model.generate_content(prompt)
         respuesta = response.text.strip()
 
-        categoria, razon = "", ""
-        for linea in respuesta.splitlines():
-            if linea.lower().startswith("categoría:") or linea.lower().startswith("categoria:"):
-                categoria = linea.split(":", 1)[1].strip()
-            elif linea.lower().startswith("razón:") or linea.lower().startswith("razon:"):
-                razon = linea.split(":", 1)[1].strip()
+        categoria, razon = parsear_respuesta(respuesta)
         return categoria, razon
 
     except Exception as e:
@@ -70,13 +78,14 @@ Texto: {texto}
         return "ERROR", str(e)
 
 # --- NUEVA FUNCIÓN DE CLASIFICACIÓN POR LOTES ---
-def clasificar_lote_con_gemini(textos_lote, model_name=GEMINI_MODEL):
+def clasificar_lote_con_gemini(textos_lote, model_name=GEMINI_MODEL, presupuesto=None):
     """
     Clasifica un lote de textos usando la API de Gemini, solicitando una respuesta JSON.
 
     Args:
         textos_lote (list): Una lista de cadenas de texto a clasificar.
         model_name (str): Nombre del modelo de Gemini a usar.
+        presupuesto (Presupuesto | None): Presupuesto de la corrida al que se descuenta el uso real.
 
     Returns:
         list: Una lista de diccionarios, donde cada diccionario contiene
@@ -117,8 +126,8 @@ def clasificar_lote_con_gemini(textos_lote, model_name=GEMINI_MODEL):
     prompt_final = prompt_base + comentarios_en_prompt
 
     try:
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt_final)
+        response = generar_contenido(model_name, prompt_final)
+        registrar_uso(prompt_final, getattr(response, "usage_metadata", None), filas=len(textos_lote), presupuesto=presupuesto)
         respuesta_json_str = response.text.strip()
 
         # Asegúrate de que la respuesta es un JSON válido.
@@ -153,6 +162,27 @@ def clasificar_lote_con_gemini(textos_lote, model_name=GEMINI_MODEL):
         print(f"DEBUG: Error inesperado en clasificar_lote_con_gemini: {e}")
         return [{"id": i, "categoria": "ERROR_API", "razon": str(e)} for i in range(len(textos_lote))]
 
+def es_limite_de_tasa(mensaje):
+    """True si el mensaje de error corresponde a un 429 / cuota agotada de la API."""
+    mensaje = mensaje.lower()
+    return "429" in mensaje or "resource exhausted" in mensaje or "resourceexhausted" in mensaje or "quota" in mensaje
+
+# --- REPREGUNTA DE CATEGORÍAS NO RECONOCIDAS ---
+def repreguntar_categoria(texto, categoria_recibida, model_name=GEMINI_MODEL, presupuesto=None):
+    """
+    Vuelve a pedir únicamente la categoría de una queja cuya respuesta no coincidió
+    con ninguna categoría canónica. Devuelve la categoría normalizada o None.
+    El uso de tokens se descuenta del presupuesto de la corrida, si se pasa.
+    """
+    try:
+        prompt = prompt_repregunta(texto, categoria_recibida)
+        response = generar_contenido(model_name, prompt, generation_config={"temperature": 0})
+        registrar_uso(prompt, getattr(response, "usage_metadata", None), presupuesto=presupuesto, calibrar_salida=False)
+        return normalizar_categoria(response.text.strip())
+    except Exception as e:
+        print(f"DEBUG: Error al repreguntar la categoría para texto '{texto[:50]}...': {e}")
+        return None
+
 # --- Calcula el tamaño del prompt para estimar tokens ---
 def estimar_tokens_prompt(prompt_base_template, ejemplo_texto, num_ejemplos):
     """
@@ -195,15 +225,14 @@ else:
     archivo = st.file_uploader("📁 Subí un archivo Excel (.xlsx) o CSV (.csv)", type=["xlsx", "csv"])
 
     if archivo:
-        if archivo.name.endswith(".csv"):
-            df = pd.read_csv(archivo)
-        else:
-            df = pd.read_excel(archivo)
+        # Solo se leen los encabezados; el archivo completo se carga al clasificar
+        contenido, hash_contenido = datos_de_subida(archivo)
+        columnas = leer_columnas(hash_contenido, archivo.name, contenido)
 
         st.write("✅ Archivo cargado. Columnas:")
-        st.write(df.columns.tolist())
+        st.write(columnas)
 
-        columna = st.selectbox("Seleccioná la columna con las quejas:", df.columns)
+        columna = st.selectbox("Seleccioná la columna con las quejas:", columnas)
         
         # --- Nuevo control para tokens_por_request ---
         st.info("Configurá el número máximo de tokens por solicitud a Gemini. Más tokens pueden procesar más quejas a la vez, pero tienen un costo y un límite del modelo.")
@@ -212,10 +241,21 @@ else:
             min_value=1000, max_value=32000, value=8000, step=500
         )
         
+        # El tamaño de lote se ajusta solo durante la corrida según latencia, errores de formato y 429
+        ajuste_automatico = st.checkbox("🎛 Ajustar automáticamente la cantidad de quejas por lote", value=True)
+
         # Se elimina el slider de espera y se fija el valor a 0.0 para no añadir retrasos artificiales
         espera = 0.0
 
+        presupuesto_max = st.number_input("💰 Presupuesto máximo de la corrida (USD, 0 = sin límite)", min_value=0.0, value=0.0, step=1.0)
+
         if st.button("🚀 Clasificar archivo"):
+            # Para clasificar solo se carga la columna elegida
+            quejas = leer_columna(hash_contenido, archivo.name, columna, contenido)
+            # Limpieza vectorizada: las filas vacías o triviales no se envían al modelo
+            textos, clasificables, resumen_pre = preprocesar(quejas)
+            st.info(describir_preprocesamiento(resumen_pre))
+
             # Lógica para determinar el tamaño del lote dinámicamente
             # Necesitamos estimar cuántas quejas caben en 'tokens_por_request'
             # Esta es una heurística; la implementación real de tokens puede variar.
@@ -250,7 +290,7 @@ else:
             # Usaremos el `count_tokens` del SDK de Gemini para una estimación más precisa si el modelo lo soporta,
             # o una heurística basada en la longitud del texto.
             try:
-                model_token_counter = genai.GenerativeModel(GEMINI_MODEL)
+                model_token_counter = gemini().GenerativeModel(GEMINI_MODEL)
                 prompt_base_tokens_obj = model_token_counter.count_tokens(prompt_base_estimacion)
                 prompt_base_tokens = prompt_base_tokens_obj.total_tokens
                 # st.write(f"DEBUG: Tokens del prompt base estimado: {prompt_base_tokens}")
@@ -279,34 +319,70 @@ else:
             # Un límite máximo para el lote para evitar problemas de memoria o respuestas gigantes
             num_quejas_por_lote = min(num_quejas_por_lote, 100) # Límite práctico, ajustar si es necesario
 
-            st.info(f"Se procesarán aproximadamente **{num_quejas_por_lote} quejas por cada solicitud** a Gemini, basándose en los {tokens_por_request} tokens configurados.")
+            if ajuste_automatico:
+                st.info(f"Se empieza con **{num_quejas_por_lote} quejas por solicitud** y el tamaño se ajusta durante la corrida (hasta {tokens_por_request} tokens por solicitud).")
+            else:
+                st.info(f"Se procesarán aproximadamente **{num_quejas_por_lote} quejas por cada solicitud** a Gemini, basándose en los {tokens_por_request} tokens configurados.")
+
+            # --- Plan previo: tokens, solicitudes, tiempo y costo estimados ---
+            st.info(describir_plan(
+                planificar(textos[clasificables], GEMINI_MODEL, modo="lotes", filas_por_lote=num_quejas_por_lote, tokens_base=prompt_base_tokens),
+                presupuesto_max,
+            ))
+            presupuesto = Presupuesto(GEMINI_MODEL, max_costo_usd=presupuesto_max)
 
             # --- Preparación para la clasificación por lotes ---
-            total = len(df)
-            todas_las_categorias = [""] * total # Inicializa con el tamaño total
-            todas_las_razones = [""] * total   # Inicializa con el tamaño total
+            total = len(quejas)
+            # Categorías y razones en arrays compactos; las vistas se indexan como listas
+            resultados = BufferResultados(total)
+            todas_las_categorias, todas_las_razones = resultados.categorias, resultados.razones
             
-            # Convertir la columna de quejas a tipo string para evitar errores con tipos mixtos
-            quejas_a_procesar = df[columna].astype(str).tolist()
+            # Textos ya limpios y truncados por el preprocesamiento
+            quejas_a_procesar = textos.tolist()
+            sin_texto = (~clasificables).to_numpy()
+            resultados.asignar(sin_texto, CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO)
 
-            progreso = st.progress(0)
-            estado = st.empty()
+            reporte = ReporteProgreso(total)
+            reporte.avanzar(filas=int(sin_texto.sum()))
             proceso_completado_exitosamente = False
 
             errores_consecutivos = 0
             limite_errores = 5 # Reducido para ser más sensible a problemas de API
+            pendientes_repregunta = [] # Índices absolutos con categoría no reconocida
+
+            # Los lotes se arman ordenando las filas por longitud estimada (las cortas primero)
+            # y empacándolas hasta el límite de filas y de tokens por solicitud
+            costos = costos_por_fila(textos)
+            orden = ordenar_por_longitud(costos)
+            orden = orden[~sin_texto[orden]]
+            controlador = ControladorLote(num_quejas_por_lote) if ajuste_automatico else None
+            lotes = generar_lotes(
+                orden, costos,
+                controlador.tamano if controlador else num_quejas_por_lote,
+                tokens_disponibles_para_contenido,
+            )
+
+            def marcar_no_procesadas(motivo):
+                """Marca como NO_CLASIFICADO las filas a las que todavía no se asignó resultado."""
+                for j_restante in range(total):
+                    if not todas_las_categorias[j_restante]:
+                        todas_las_categorias[j_restante] = "NO_CLASIFICADO"
+                        todas_las_razones[j_restante] = motivo
 
             try:
                 # Iterar sobre los lotes
-                for i_lote_inicio in range(0, total, num_quejas_por_lote):
-                    i_lote_fin = min(i_lote_inicio + num_quejas_por_lote, total)
-                    lote_actual_textos = quejas_a_procesar[i_lote_inicio:i_lote_fin]
-                    
-                    estado.text(f"Clasificando lote de quejas: {i_lote_inicio + 1} a {i_lote_fin} de {total}...")
+                for indices_lote in lotes:
+                    if presupuesto.agotado():
+                        st.warning(f"💰 Se alcanzó el presupuesto máximo ({presupuesto.resumen()}). Se detiene el envío de lotes.")
+                        marcar_no_procesadas("No procesado: se alcanzó el presupuesto máximo de la corrida")
+                        break
+                    lote_actual_textos = [quejas_a_procesar[j] for j in indices_lote]
                     
+                    inicio_lote = time.monotonic()
                     try:
                         # Llamada a la nueva función de clasificación por lotes
-                        resultados_lote = clasificar_lote_con_gemini(lote_actual_textos, GEMINI_MODEL)
+                        resultados_lote = clasificar_lote_con_gemini(lote_actual_textos, GEMINI_MODEL, presupuesto)
+                        duracion_lote = time.monotonic() - inicio_lote
                         errores_lote_actual = 0
 
                         # Procesar los resultados del lote
@@ -315,18 +391,23 @@ else:
                             categoria = resultado.get('categoria', "NO_CLASIFICADO")
                             razon = resultado.get('razon', "No se pudo extraer la razón")
 
-                            # Calcular el índice absoluto en el DataFrame original
-                            idx_absoluto = i_lote_inicio + idx_relativo
-                            
-                            # Asignar los resultados a las listas globales
-                            if 0 <= idx_absoluto < total:
+                            # El id del lote se traduce a la posición absoluta en el DataFrame original
+                            if isinstance(idx_relativo, int) and 0 <= idx_relativo < len(indices_lote):
+                                idx_absoluto = indices_lote[idx_relativo]
                                 todas_las_categorias[idx_absoluto] = categoria
                                 todas_las_razones[idx_absoluto] = razon
                                 if categoria.startswith("ERROR"):
                                     errores_lote_actual += 1
                                     print(f"DEBUG: Error en resultado de lote (índice absoluto {idx_absoluto}): Categoría={categoria}, Razón={razon}")
+                                else:
+                                    # Se lleva la categoría a su forma canónica; si no coincide, se repregunta al final
+                                    canonica = normalizar_categoria(categoria)
+                                    if canonica:
+                                        todas_las_categorias[idx_absoluto] = canonica
+                                    else:
+                                        pendientes_repregunta.append(idx_absoluto)
                             else:
-                                print(f"DEBUG: Índice absoluto fuera de rango: {idx_absoluto}")
+                                print(f"DEBUG: Índice de lote fuera de rango: {idx_relativo}")
                                 errores_lote_actual += 1 # Considerar como error si el ID es inválido
 
                         if errores_lote_actual > 0:
@@ -336,41 +417,106 @@ else:
 
                     except Exception as e:
                         # Captura errores en la llamada al lote, por ejemplo, problemas de conexión o API.
-                        print(f"DEBUG: Excepción en el procesamiento del lote {i_lote_inicio}-{i_lote_fin}: {e}")
+                        print(f"DEBUG: Excepción en el procesamiento del lote de {len(indices_lote)} filas: {e}")
                         errores_consecutivos += 1
+                        duracion_lote = time.monotonic() - inicio_lote
                         # Rellenar las entradas de este lote con un estado de error
-                        for j in range(i_lote_inicio, i_lote_fin):
-                            if j < total: # Asegurarse de no exceder los límites
-                                todas_las_categorias[j] = "ERROR_LOTE"
-                                todas_las_razones[j] = f"Error en lote: {str(e)}"
+                        for j in indices_lote:
+                            todas_las_categorias[j] = "ERROR_LOTE"
+                            todas_las_razones[j] = f"Error en lote: {str(e)}"
+
+                    # Filas del lote que el modelo omitió en su respuesta
+                    for j in indices_lote:
+                        if not todas_las_categorias[j]:
+                            todas_las_categorias[j] = "ERROR_FORMATO"
+                            todas_las_razones[j] = "El modelo no devolvió resultado para esta fila"
                     
-                    progreso.progress(min(1.0, (i_lote_fin) / total)) # Asegurar que no exceda 1.0
+                    reporte.avanzar(
+                        filas=len(indices_lote),
+                        errores=sum(todas_las_categorias[j].startswith("ERROR") for j in indices_lote),
+                    )
+
+                    if controlador:
+                        # JSON inválido, formato incorrecto u omisiones suelen indicar respuestas truncadas
+                        fallas_formato = sum(todas_las_categorias[j] in ("ERROR_JSON", "ERROR_FORMATO") for j in indices_lote)
+                        limitado = any(
+                            todas_las_categorias[j] in ("ERROR_API", "ERROR_LOTE") and es_limite_de_tasa(todas_las_razones[j])
+                            for j in indices_lote
+                        )
+                        tamano_anterior = controlador.tamano()
+                        controlador.registrar(len(indices_lote), float(costos[indices_lote].sum()), duracion_lote, fallas_formato, limitado)
+                        if controlador.tamano() != tamano_anterior:
+                            print(f"DEBUG: Tamaño de lote {tamano_anterior} -> {controlador.tamano()} (lote de {len(indices_lote)} filas en {duracion_lote:.1f}s, {fallas_formato} fallas de formato, 429: {limitado})")
                     
                     if errores_consecutivos >= limite_errores:
                         st.error(f"❌ Se detectaron {errores_consecutivos} errores consecutivos. Se detiene la clasificación.")
-                        print(f"DEBUG: Límite de errores consecutivos alcanzado en el lote {i_lote_inicio}.")
+                        print(f"DEBUG: Límite de errores consecutivos alcanzado tras un lote de {len(indices_lote)} filas.")
                         # Marcar las filas restantes como no procesadas
-                        for j_restante in range(i_lote_fin, total):
-                            todas_las_categorias[j_restante] = "NO_CLASIFICADO"
-                            todas_las_razones[j_restante] = "Proceso detenido por errores consecutivos"
+                        marcar_no_procesadas("Proceso detenido por errores consecutivos")
                         break # Sale del bucle de lotes
                     
                     time.sleep(espera) # Retraso si `espera` es > 0
 
+                # --- Cola de reintentos: filas con ERROR* o NO_CLASIFICADO, en lotes más chicos ---
+                fallidas = resultados.fallidas()
+                if fallidas and not presupuesto.agotado():
+                    def reintentar_lote(indices, modelo):
+                        salida = {}
+                        lote_textos = [quejas_a_procesar[j] for j in indices]
+                        for resultado in clasificar_lote_con_gemini(lote_textos, modelo or GEMINI_MODEL, presupuesto):
+                            idx_relativo = resultado.get('id')
+                            if isinstance(idx_relativo, int) and 0 <= idx_relativo < len(indices):
+                                categoria = resultado.get('categoria', "NO_CLASIFICADO")
+                                if not categoria.startswith("ERROR"):
+                                    categoria = normalizar_categoria(categoria) or categoria
+                                salida[indices[idx_relativo]] = (categoria, resultado.get('razon', "No se pudo extraer la razón"))
+                        return salida
+
+                    reintentadas = drenar_cola(
+                        fallidas, reintentar_lote,
+                        tamano_lote=max(1, (controlador.tamano() if controlador else num_quejas_por_lote) // 4),
+                        modelo_respaldo=GEMINI_MODEL_RESPALDO,
+                        al_iniciar_pasada=lambda n, cantidad: reporte.reiniciar(cantidad, f"🔁 Pasada de reintentos {n}: {cantidad} filas con error..."),
+                        al_avanzar=lambda filas, errores: reporte.avanzar(filas, errores),
+                        detener=presupuesto.agotado,
+                    )
+                    for idx, (categoria, razon) in reintentadas.items():
+                        todas_las_categorias[idx] = categoria
+                        todas_las_razones[idx] = razon
+                        if not es_fila_fallida(categoria) and normalizar_categoria(categoria) is None and idx not in pendientes_repregunta:
+                            pendientes_repregunta.append(idx)
+                    recuperadas = len(fallidas) - len(resultados.fallidas(fallidas))
+                    st.info(f"🔁 Reintentos: se recuperaron {recuperadas} de {len(fallidas)} filas con error.")
+
+                # --- Repregunta solo para las filas con categoría no reconocida ---
+                if pendientes_repregunta:
+                    reporte.nota(f"Repreguntando la categoría de {len(pendientes_repregunta)} filas no reconocidas...")
+                    for idx in pendientes_repregunta:
+                        # Con el presupuesto agotado no se repregunta: la fila queda para reintentar
+                        canonica = None if presupuesto.agotado() else repreguntar_categoria(quejas_a_procesar[idx], todas_las_categorias[idx], presupuesto=presupuesto)
+                        if canonica:
+                            todas_las_categorias[idx] = canonica
+                        else:
+                            todas_las_razones[idx] = f"Categoría no reconocida: '{todas_las_categorias[idx]}'. {todas_las_razones[idx]}"
+                            todas_las_categorias[idx] = "ERROR_CATEGORIA"
+                    print(f"DEBUG: Repreguntadas {len(pendientes_repregunta)} filas con categoría no reconocida.")
+
                 # Asegura que la barra de progreso llegue al 100% al finalizar o detenerse
-                progreso.progress(1.0)
-                estado.text("Clasificación finalizada.")
+                reporte.finalizar(f"Clasificación finalizada. Consumo: {presupuesto.resumen()}")
+                if controlador:
+                    st.info(f"🎛 Ajuste automático de lotes: {controlador.resumen()}.")
                 print("DEBUG: Proceso de clasificación completado (o detenido por errores).")
                 proceso_completado_exitosamente = True
 
             except Exception as e: # Captura cualquier error que ocurra durante el bucle principal de lotes
                 st.error(f"❌ ¡Ocurrió un error inesperado durante el procesamiento del archivo! Por favor, revisa la consola de tu terminal. Error: {e}")
                 print(f"DEBUG: Excepción crítica en el bucle principal de lotes: {e}")
-                progreso.progress(1.0)
-                estado.text("Clasificación detenida por error crítico.")
+                reporte.finalizar("Clasificación detenida por error crítico.")
 
-            df["Clasificacion-Gemini"] = todas_las_categorias
-            df["Razon-Gemini"] = todas_las_razones
+            # El archivo completo se lee recién para armar la salida
+            df = leer_archivo(hash_contenido, archivo.name, contenido)
+            df["Clasificacion-Gemini"] = resultados.columna_categorias()
+            df["Razon-Gemini"] = resultados.columna_razones()
 
             # Descargar resultado
             salida = BytesIO()
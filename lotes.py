@@ -0,0 +1,141 @@
+import numpy as np
+
+from planificador import CARACTERES_POR_TOKEN, TOKENS_SALIDA_POR_FILA
+
+# === PLANIFICACIÓN DE LOTES POR LONGITUD ===
+# Armar lotes con filas consecutivas mezcla quejas de una línea con textos de
+# miles de palabras: ese lote tarda mucho más y corre riesgo de truncarse.
+# Ordenando por longitud estimada, cada lote agrupa textos parecidos, se empaca
+# por presupuesto de tokens y los lotes cortos salen primero (avance temprano).
+# Los resultados se siguen asignando por índice absoluto, así que el archivo
+# de salida conserva el orden original.
+
+
+def costos_por_fila(textos):
+    """
+    Tokens estimados que ocupa cada fila en un lote (texto + respuesta JSON), vectorizado.
+
+    Returns:
+        np.ndarray: Costo estimado de cada fila, en el orden de textos.
+    """
+    return (textos.fillna("").astype(str).str.len() / CARACTERES_POR_TOKEN + TOKENS_SALIDA_POR_FILA).to_numpy()
+
+
+def ordenar_por_longitud(costos):
+    """Posiciones de las filas ordenadas de la más corta a la más larga (orden estable)."""
+    return np.argsort(costos, kind="stable")
+
+
+def generar_lotes(orden, costos, max_filas, max_tokens):
+    """
+    Recorre las filas en el orden indicado y las agrupa en lotes que no superen
+    max_filas filas ni max_tokens tokens estimados. Una fila que sola ya supera
+    max_tokens va en un lote propio.
+
+    Args:
+        orden (np.ndarray): Posiciones de las filas en el orden de envío.
+        costos (np.ndarray): Tokens estimados por fila (indexado por posición).
+        max_filas (int | callable): Máximo de filas por lote. Si es una función, se consulta
+            al empezar cada lote (ver ControladorLote).
+        max_tokens (float): Máximo de tokens de contenido por lote.
+
+    Yields:
+        list: Posiciones absolutas de las filas de cada lote.
+    """
+    limite = max_filas() if callable(max_filas) else max_filas
+    lote, tokens_lote = [], 0.0
+    for posicion in orden:
+        costo = costos[posicion]
+        if lote and (len(lote) >= limite or tokens_lote + costo > max_tokens):
+            yield lote
+            lote, tokens_lote = [], 0.0
+            limite = max_filas() if callable(max_filas) else max_filas
+        lote.append(int(posicion))
+        tokens_lote += costo
+    if lote:
+        yield lote
+
+
+# === AJUSTE AUTOMÁTICO DEL TAMAÑO DE LOTE ===
+# El tamaño óptimo depende del modelo, de la longitud de las quejas y del estado
+# de la API, así que se ajusta durante la corrida: mientras el rendimiento
+# (tokens estimados procesados por segundo) mejore, se sigue moviendo el tamaño
+# en la misma dirección; si empeora, se invierte la dirección con pasos cada vez
+# más chicos hasta asentarse. Si suben los errores de formato, los truncamientos
+# o los 429, el lote se achica enseguida.
+MIN_FILAS_LOTE = 1
+MAX_FILAS_LOTE = 200
+FACTOR_PASO_INICIAL = 1.5
+FACTOR_PASO_MINIMO = 1.1
+UMBRAL_FALLAS_FORMATO = 0.1 # Proporción de filas con error de formato que fuerza a achicar
+MEJORA_MINIMA = 0.05 # Mejora relativa de rendimiento que se considera real
+LOTES_POR_MEDICION = 2 # Lotes que se promedian antes de decidir el próximo tamaño
+
+
+class ControladorLote:
+    """
+    Ajusta en línea la cantidad de filas por lote. Se pasa controlador.tamano como
+    max_filas de generar_lotes y se llama a registrar() después de cada lote.
+    """
+
+    def __init__(self, inicial, minimo=MIN_FILAS_LOTE, maximo=MAX_FILAS_LOTE):
+        self.minimo = minimo
+        self.maximo = maximo
+        self._tamano = float(min(max(inicial, minimo), maximo))
+        self._factor = FACTOR_PASO_INICIAL
+        self._direccion = 1 # 1 = agrandar, -1 = achicar
+        self._rendimiento_anterior = None
+        self._medicion = [0, 0.0, 0.0] # lotes, tokens y segundos al tamaño actual
+        self.historial = [] # (filas, segundos, fallas_formato, limitado)
+
+    def tamano(self):
+        return int(round(self._tamano))
+
+    def registrar(self, filas, tokens, segundos, fallas_formato=0, limitado=False):
+        """
+        Informa el resultado de un lote y calcula el tamaño del siguiente.
+
+        Args:
+            filas (int): Filas enviadas en el lote.
+            tokens (float): Tokens estimados del lote (para comparar lotes de distinta longitud).
+            segundos (float): Duración de la llamada.
+            fallas_formato (int): Filas con JSON inválido, formato incorrecto u omitidas (truncado).
+            limitado (bool): Si la API respondió 429 / cuota agotada.
+        """
+        self.historial.append((filas, segundos, fallas_formato, limitado))
+        if limitado or (filas and fallas_formato / filas > UMBRAL_FALLAS_FORMATO):
+            # Ante errores se achica sin esperar a comparar rendimientos
+            self._mover(-1, factor=2.0)
+            self._direccion = -1
+            self._rendimiento_anterior = None
+            self._medicion = [0, 0.0, 0.0]
+            return self.tamano()
+        if filas < self.tamano() or segundos <= 0:
+            return self.tamano() # Lote recortado por tokens o al final: no es comparable
+
+        self._medicion[0] += 1
+        self._medicion[1] += tokens
+        self._medicion[2] += segundos
+        if self._medicion[0] < LOTES_POR_MEDICION:
+            return self.tamano()
+
+        rendimiento = self._medicion[1] / self._medicion[2]
+        self._medicion = [0, 0.0, 0.0]
+        if self._rendimiento_anterior is not None and rendimiento < self._rendimiento_anterior * (1 + MEJORA_MINIMA):
+            # Empeoró o no mejoró lo suficiente: se invierte la dirección con un paso menor
+            self._direccion *= -1
+            self._factor = max(FACTOR_PASO_MINIMO, self._factor ** 0.5)
+        self._rendimiento_anterior = rendimiento
+        self._mover(self._direccion)
+        return self.tamano()
+
+    def _mover(self, direccion, factor=None):
+        factor = factor or self._factor
+        nuevo = self._tamano * factor if direccion > 0 else self._tamano / factor
+        # Al menos una fila de diferencia, para no quedar trabado en lotes chicos
+        if round(nuevo) == self.tamano():
+            nuevo = self._tamano + direccion
+        self._tamano = float(min(max(nuevo, self.minimo), self.maximo))
+
+    def resumen(self):
+        return f"tamaño de lote actual {self.tamano()} filas tras {len(self.historial)} lotes"
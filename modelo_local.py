@@ -0,0 +1,130 @@
+import importlib.util
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from arranque import importar
+from categorias import CATEGORIAS
+from lotes import ordenar_por_longitud, generar_lotes
+
+# === BACKEND LOCAL EN CPU (ONNX) ===
+# Para datos sensibles o cargas muy grandes se puede clasificar sin ninguna API
+# externa con un clasificador multilingüe chico, ajustado sobre el historial ya
+# etiquetado por Gemini (ver entrenar_modelo_local.py) y exportado a ONNX.
+# Los textos se tokenizan juntos, se ordenan por longitud y se agrupan en lotes
+# con relleno dinámico; los lotes se reparten en un pool de hilos, uno por núcleo.
+#
+# Dependencias opcionales: pip install onnxruntime tokenizers
+# Se importan recién al crear el clasificador: onnxruntime tarda en cargar y la
+# mayoría de las sesiones no usan el backend local.
+DEPENDENCIAS_LOCALES = ("onnxruntime", "tokenizers")
+
+MODELO_LOCAL = "local-onnx" # Nombre con el que se elige este backend
+DIRECTORIO_MODELO_LOCAL = os.getenv("MODELO_LOCAL_DIR", "modelo_local")
+ARCHIVO_ONNX = "modelo.onnx"
+ARCHIVO_TOKENIZADOR = "tokenizer.json"
+ARCHIVO_ETIQUETAS = "etiquetas.json"
+
+MAX_LONGITUD = 256 # Tokens por queja
+FILAS_POR_LOTE = 64
+TOKENS_POR_LOTE = 8192 # Tokens sumados por lote; como van ordenados por longitud, acota el relleno
+HILOS = os.cpu_count() or 1
+
+
+def _dependencias_instaladas():
+    # find_spec solo busca el paquete, sin importarlo
+    return all(importlib.util.find_spec(modulo) is not None for modulo in DEPENDENCIAS_LOCALES)
+
+
+def backend_local_disponible(directorio=DIRECTORIO_MODELO_LOCAL):
+    """True si están instaladas las dependencias y existe el modelo exportado."""
+    return _dependencias_instaladas() and all(
+        os.path.exists(os.path.join(directorio, nombre))
+        for nombre in (ARCHIVO_ONNX, ARCHIVO_TOKENIZADOR, ARCHIVO_ETIQUETAS)
+    )
+
+
+class ClasificadorLocal:
+    """
+    Clasificador ONNX en CPU. Devuelve las mismas categorías que el camino de Gemini;
+    la razón indica que la clasificó el modelo local y con qué confianza.
+    """
+
+    def __init__(self, directorio=DIRECTORIO_MODELO_LOCAL, hilos=HILOS):
+        if not _dependencias_instaladas():
+            raise RuntimeError("Faltan dependencias del backend local: pip install onnxruntime tokenizers")
+        with open(os.path.join(directorio, ARCHIVO_ETIQUETAS), encoding="utf-8") as f:
+            self.etiquetas = json.load(f)
+        desconocidas = set(self.etiquetas) - set(CATEGORIAS)
+        if desconocidas:
+            raise ValueError(f"El modelo local tiene etiquetas fuera de las categorías permitidas: {sorted(desconocidas)}")
+
+        ort = importar("onnxruntime")
+        self.tokenizador = importar("tokenizers").Tokenizer.from_file(os.path.join(directorio, ARCHIVO_TOKENIZADOR))
+        self.tokenizador.enable_truncation(max_length=MAX_LONGITUD)
+        self.tokenizador.no_padding() # El relleno se hace por lote, a la longitud del más largo
+
+        # Cada sesión usa un hilo interno; el paralelismo lo da el pool (un lote por núcleo)
+        opciones = ort.SessionOptions()
+        opciones.intra_op_num_threads = 1
+        opciones.inter_op_num_threads = 1
+        self.sesion = ort.InferenceSession(
+            os.path.join(directorio, ARCHIVO_ONNX), opciones, providers=["CPUExecutionProvider"]
+        )
+        self.entradas = {e.name for e in self.sesion.get_inputs()}
+        self.hilos = max(1, hilos)
+        self._pool = ThreadPoolExecutor(max_workers=self.hilos, thread_name_prefix="onnx")
+
+    def _inferir_lote(self, codificaciones):
+        longitud = max(len(c.ids) for c in codificaciones)
+        ids = np.zeros((len(codificaciones), longitud), dtype=np.int64)
+        mascara = np.zeros_like(ids)
+        for fila, c in enumerate(codificaciones):
+            ids[fila, :len(c.ids)] = c.ids
+            mascara[fila, :len(c.ids)] = 1
+        entradas = {"input_ids": ids, "attention_mask": mascara}
+        if "token_type_ids" in self.entradas:
+            entradas["token_type_ids"] = np.zeros_like(ids)
+        logits = self.sesion.run(None, entradas)[0]
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probabilidades = np.exp(logits)
+        probabilidades /= probabilidades.sum(axis=1, keepdims=True)
+        return probabilidades.argmax(axis=1), probabilidades.max(axis=1)
+
+    def clasificar(self, textos, al_avanzar=None):
+        """
+        Clasifica una lista de textos.
+
+        Args:
+            textos (list[str]): Quejas a clasificar.
+            al_avanzar (callable | None): al_avanzar(filas) al terminar cada lote (desde el hilo que llama).
+
+        Returns:
+            list: [(categoria, razon)] en el mismo orden que textos.
+        """
+        if not textos:
+            return []
+        codificaciones = self.tokenizador.encode_batch(list(textos))
+        costos = np.array([len(c.ids) for c in codificaciones], dtype=float)
+        lotes = list(generar_lotes(ordenar_por_longitud(costos), costos, FILAS_POR_LOTE, TOKENS_POR_LOTE))
+
+        resultados = [None] * len(textos)
+        futuros = [(lote, self._pool.submit(self._inferir_lote, [codificaciones[i] for i in lote])) for lote in lotes]
+        for lote, futuro in futuros:
+            clases, confianzas = futuro.result()
+            for i, clase, confianza in zip(lote, clases, confianzas):
+                resultados[i] = (self.etiquetas[clase], f"Clasificada por el modelo local (confianza {confianza:.0%})")
+            if al_avanzar:
+                al_avanzar(len(lote))
+        return resultados
+
+
+@lru_cache(maxsize=1)
+def obtener_clasificador_local(directorio=DIRECTORIO_MODELO_LOCAL):
+    """Carga el modelo una sola vez por proceso."""
+    clasificador = ClasificadorLocal(directorio)
+    print(f"DEBUG: Modelo local cargado desde {directorio} ({clasificador.hilos} hilos, {len(clasificador.etiquetas)} categorías)")
+    return clasificador
@@ -0,0 +1,335 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+
+from categorias import armar_prompt, parsear_respuesta
+from resultados import BufferResultados
+
+# === MODO MASIVO CON LAS APIS BATCH DE LOS PROVEEDORES ===
+# Para cargas de 100k+ filas no hace falta latencia interactiva: se arma un JSONL
+# con una solicitud por fila, se envía como trabajo batch (precio con descuento),
+# se consulta el estado en segundo plano y al terminar se combinan los resultados
+# con el DataFrame por número de fila.
+#
+# Las URLs base se pueden cambiar por variables de entorno para probar contra un
+# servidor local que imite a los proveedores.
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com")
+
+# Archivo donde se guardan los trabajos enviados, para retomarlos tras un reinicio
+RUTA_TRABAJOS = os.getenv("RUTA_TRABAJOS_BATCH", "trabajos_batch.json")
+
+INTERVALO_SONDEO = 60 # segundos entre consultas de estado
+TIMEOUT_HTTP = 120
+
+ESTADOS_FINALES = {"completado", "fallido", "expirado", "cancelado"}
+
+_ESTADOS_OPENAI = {
+    "validating": "en_cola",
+    "in_progress": "en_proceso",
+    "finalizing": "en_proceso",
+    "completed": "completado",
+    "failed": "fallido",
+    "expired": "expirado",
+    "cancelling": "en_proceso",
+    "cancelled": "cancelado",
+}
+_ESTADOS_GEMINI = {
+    "BATCH_STATE_PENDING": "en_cola",
+    "BATCH_STATE_RUNNING": "en_proceso",
+    "BATCH_STATE_SUCCEEDED": "completado",
+    "BATCH_STATE_FAILED": "fallido",
+    "BATCH_STATE_EXPIRED": "expirado",
+    "BATCH_STATE_CANCELLED": "cancelado",
+}
+
+_lock_trabajos = threading.Lock()
+_hilos_sondeo = {} # id_trabajo -> Thread, compartido entre reruns de Streamlit
+
+
+# --- HTTP ---
+def _solicitud(metodo, url, datos=None, encabezados=None):
+    """Hace una solicitud HTTP y devuelve (cuerpo en bytes, encabezados de respuesta)."""
+    req = urllib.request.Request(url, data=datos, method=metodo, headers=encabezados or {})
+    try:
+        with urllib.request.urlopen(req, timeout=TIMEOUT_HTTP) as respuesta:
+            return respuesta.read(), respuesta.headers
+    except urllib.error.HTTPError as e:
+        detalle = e.read().decode("utf-8", errors="replace")
+        raise RuntimeError(f"HTTP {e.code} en {metodo} {url}: {detalle[:500]}") from e
+
+
+def _solicitud_json(metodo, url, cuerpo=None, encabezados=None):
+    encabezados = dict(encabezados or {})
+    datos = None
+    if cuerpo is not None:
+        datos = json.dumps(cuerpo).encode("utf-8")
+        encabezados["Content-Type"] = "application/json"
+    contenido, _ = _solicitud(metodo, url, datos, encabezados)
+    return json.loads(contenido) if contenido else {}
+
+
+# --- ARMADO DEL JSONL ---
+def armar_jsonl(textos, proveedor, modelo, posiciones=None):
+    """
+    Arma el contenido JSONL del trabajo batch, una solicitud por fila.
+    El identificador de cada solicitud es "fila-<posición>" para poder combinar luego.
+
+    Args:
+        textos (pd.Series | list): Quejas a clasificar, en el orden del archivo.
+        proveedor (str): "gemini" u "openai".
+        modelo (str): Nombre del modelo.
+        posiciones (list | None): Posición en el archivo de cada texto; por defecto 0..n-1.
+
+    Returns:
+        bytes: Contenido JSONL codificado en UTF-8.
+    """
+    lineas = []
+    posiciones = range(len(textos)) if posiciones is None else posiciones
+    for i, texto in zip(posiciones, textos):
+        prompt = armar_prompt(texto)
+        if proveedor == "openai":
+            linea = {
+                "custom_id": f"fila-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": modelo,
+                    "messages": [
+                        {"role": "system", "content": "Sos un asistente experto en analizar y categorizar quejas de pasajeros."},
+                        {"role": "user", "content": prompt},
+                    ],
+                    "temperature": 0.2,
+                    "max_tokens": 256,
+                },
+            }
+        else:
+            linea = {"key": f"fila-{i}", "request": {"contents": [{"parts": [{"text": prompt}]}]}}
+        lineas.append(json.dumps(linea, ensure_ascii=False))
+    return ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+# --- ENVÍO ---
+def _enviar_openai(jsonl, api_key, nombre):
+    limite = uuid.uuid4().hex
+    cuerpo = (
+        f"--{limite}\r\nContent-Disposition: form-data; name=\"purpose\"\r\n\r\nbatch\r\n"
+        f"--{limite}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{nombre}.jsonl\"\r\n"
+        f"Content-Type: application/jsonl\r\n\r\n"
+    ).encode("utf-8") + jsonl + f"\r\n--{limite}--\r\n".encode("utf-8")
+    encabezados = {"Authorization": f"Bearer {api_key}"}
+    contenido, _ = _solicitud(
+        "POST", f"{OPENAI_BASE_URL}/files", cuerpo,
+        {**encabezados, "Content-Type": f"multipart/form-data; boundary={limite}"},
+    )
+    id_archivo = json.loads(contenido)["id"]
+    lote = _solicitud_json(
+        "POST", f"{OPENAI_BASE_URL}/batches",
+        {"input_file_id": id_archivo, "endpoint": "/v1/chat/completions", "completion_window": "24h"},
+        encabezados,
+    )
+    return lote["id"]
+
+
+def _enviar_gemini(jsonl, api_key, nombre, modelo):
+    encabezados = {"x-goog-api-key": api_key}
+    # Subida reanudable en dos pasos: se pide la URL de subida y luego se envía el archivo
+    _, cabeceras = _solicitud(
+        "POST", f"{GEMINI_BASE_URL}/upload/v1beta/files",
+        json.dumps({"file": {"display_name": nombre}}).encode("utf-8"),
+        {
+            **encabezados,
+            "Content-Type": "application/json",
+            "X-Goog-Upload-Protocol": "resumable",
+            "X-Goog-Upload-Command": "start",
+            "X-Goog-Upload-Header-Content-Length": str(len(jsonl)),
+            "X-Goog-Upload-Header-Content-Type": "application/jsonl",
+        },
+    )
+    url_subida = cabeceras["x-goog-upload-url"]
+    contenido, _ = _solicitud(
+        "POST", url_subida, jsonl,
+        {"X-Goog-Upload-Offset": "0", "X-Goog-Upload-Command": "upload, finalize"},
+    )
+    nombre_archivo = json.loads(contenido)["file"]["name"]
+    operacion = _solicitud_json(
+        "POST", f"{GEMINI_BASE_URL}/v1beta/models/{modelo}:batchGenerateContent",
+        {"batch": {"display_name": nombre, "input_config": {"file_name": nombre_archivo}}},
+        encabezados,
+    )
+    return operacion["name"]
+
+
+def enviar_trabajo(textos, proveedor, modelo, api_key, archivo_origen, hash_contenido, columna, total=None, posiciones=None):
+    """
+    Envía el trabajo batch y lo guarda en RUTA_TRABAJOS.
+
+    Si solo se envía una parte de las filas, posiciones indica la fila del archivo de
+    cada texto y total la cantidad de filas del archivo.
+
+    Returns:
+        dict: El registro del trabajo (incluye "id" y "estado").
+    """
+    nombre = f"quejas-{hash_contenido[:12]}-{int(time.time())}"
+    jsonl = armar_jsonl(textos, proveedor, modelo, posiciones)
+    if proveedor == "openai":
+        id_trabajo = _enviar_openai(jsonl, api_key, nombre)
+    else:
+        id_trabajo = _enviar_gemini(jsonl, api_key, nombre, modelo)
+
+    trabajo = {
+        "id": id_trabajo,
+        "proveedor": proveedor,
+        "modelo": modelo,
+        "archivo_origen": archivo_origen,
+        "hash_contenido": hash_contenido,
+        "columna": columna,
+        "total": len(textos) if total is None else total,
+        "estado": "en_cola",
+        "id_resultados": None,
+        "error": None,
+        "creado": time.time(),
+        "actualizado": time.time(),
+    }
+    guardar_trabajo(trabajo)
+    print(f"DEBUG: Trabajo batch enviado: {id_trabajo} ({len(textos)} solicitudes, {proveedor}/{modelo})")
+    return trabajo
+
+
+# --- PERSISTENCIA DE TRABAJOS ---
+def cargar_trabajos():
+    """Devuelve los trabajos guardados, del más reciente al más antiguo."""
+    with _lock_trabajos:
+        if not os.path.exists(RUTA_TRABAJOS):
+            return []
+        with open(RUTA_TRABAJOS, encoding="utf-8") as f:
+            trabajos = json.load(f)
+    return sorted(trabajos.values(), key=lambda t: t["creado"], reverse=True)
+
+
+def guardar_trabajo(trabajo):
+    with _lock_trabajos:
+        trabajos = {}
+        if os.path.exists(RUTA_TRABAJOS):
+            with open(RUTA_TRABAJOS, encoding="utf-8") as f:
+                trabajos = json.load(f)
+        trabajos[trabajo["id"]] = trabajo
+        temporal = f"{RUTA_TRABAJOS}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump(trabajos, f, ensure_ascii=False, indent=2)
+        os.replace(temporal, RUTA_TRABAJOS) # Escritura atómica
+
+
+# --- CONSULTA DE ESTADO ---
+def actualizar_estado(trabajo, api_key):
+    """Consulta el estado del trabajo en el proveedor y guarda el resultado."""
+    if trabajo["proveedor"] == "openai":
+        lote = _solicitud_json(
+            "GET", f"{OPENAI_BASE_URL}/batches/{trabajo['id']}",
+            encabezados={"Authorization": f"Bearer {api_key}"},
+        )
+        trabajo["estado"] = _ESTADOS_OPENAI.get(lote.get("status"), "en_proceso")
+        trabajo["id_resultados"] = lote.get("output_file_id")
+        if lote.get("errors"):
+            trabajo["error"] = json.dumps(lote["errors"], ensure_ascii=False)[:500]
+    else:
+        operacion = _solicitud_json(
+            "GET", f"{GEMINI_BASE_URL}/v1beta/{trabajo['id']}",
+            encabezados={"x-goog-api-key": api_key},
+        )
+        estado = operacion.get("metadata", {}).get("state")
+        trabajo["estado"] = _ESTADOS_GEMINI.get(estado, "en_proceso")
+        trabajo["id_resultados"] = operacion.get("response", {}).get("responsesFile")
+        if operacion.get("error"):
+            trabajo["error"] = json.dumps(operacion["error"], ensure_ascii=False)[:500]
+    trabajo["actualizado"] = time.time()
+    guardar_trabajo(trabajo)
+    return trabajo
+
+
+def _sondear(trabajo, api_key, intervalo):
+    while trabajo["estado"] not in ESTADOS_FINALES:
+        time.sleep(intervalo)
+        try:
+            actualizar_estado(trabajo, api_key)
+        except Exception as e:
+            print(f"DEBUG: Error consultando el trabajo batch {trabajo['id']}: {e}")
+    print(f"DEBUG: Trabajo batch {trabajo['id']} terminó con estado {trabajo['estado']}")
+
+
+def iniciar_sondeo(trabajo, api_key, intervalo=INTERVALO_SONDEO):
+    """
+    Lanza (una sola vez por trabajo y por proceso) un hilo que consulta el estado
+    hasta que el trabajo llega a un estado final.
+    """
+    hilo = _hilos_sondeo.get(trabajo["id"])
+    if hilo and hilo.is_alive():
+        return
+    hilo = threading.Thread(target=_sondear, args=(dict(trabajo), api_key, intervalo), daemon=True)
+    _hilos_sondeo[trabajo["id"]] = hilo
+    hilo.start()
+
+
+# --- DESCARGA Y COMBINACIÓN ---
+def descargar_resultados(trabajo, api_key):
+    """
+    Descarga el JSONL de resultados y lo convierte en {número de fila: (categoria, razon)}.
+    """
+    if trabajo["proveedor"] == "openai":
+        contenido, _ = _solicitud(
+            "GET", f"{OPENAI_BASE_URL}/files/{trabajo['id_resultados']}/content",
+            encabezados={"Authorization": f"Bearer {api_key}"},
+        )
+    else:
+        contenido, _ = _solicitud(
+            "GET", f"{GEMINI_BASE_URL}/download/v1beta/{trabajo['id_resultados']}:download?alt=media",
+            encabezados={"x-goog-api-key": api_key},
+        )
+
+    resultados = {}
+    for linea in contenido.decode("utf-8").splitlines():
+        if not linea.strip():
+            continue
+        registro = json.loads(linea)
+        clave = registro.get("custom_id") or registro.get("key") or ""
+        try:
+            fila = int(clave.rsplit("-", 1)[1])
+        except (IndexError, ValueError):
+            print(f"DEBUG: Identificador de fila inválido en resultados batch: {clave}")
+            continue
+        try:
+            if trabajo["proveedor"] == "openai":
+                if registro.get("error"):
+                    raise ValueError(registro["error"])
+                texto = registro["response"]["body"]["choices"][0]["message"]["content"]
+            else:
+                if registro.get("error"):
+                    raise ValueError(registro["error"])
+                partes = registro["response"]["candidates"][0]["content"]["parts"]
+                texto = "".join(p.get("text", "") for p in partes)
+            resultados[fila] = parsear_respuesta(texto.strip())
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            resultados[fila] = ("ERROR_API", f"Error en el resultado batch: {e}")
+    return resultados
+
+
+def combinar_resultados(total, resultados):
+    """
+    Arma las categorías y razones en el orden original del archivo.
+    Las filas sin resultado quedan como NO_CLASIFICADO.
+
+    Returns:
+        BufferResultados: Resultado por fila del archivo.
+    """
+    combinados = BufferResultados(total)
+    combinados.asignar(slice(None), "NO_CLASIFICADO", "Sin resultado en el trabajo batch")
+    for fila, (categoria, razon) in resultados.items():
+        if 0 <= fila < total:
+            combinados.categorias[fila] = categoria
+            combinados.razones[fila] = razon
+    return combinados
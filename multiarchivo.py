@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from io import BytesIO
+
+import pandas as pd
+
+from incremental import COLUMNA_CATEGORIA, COLUMNA_RAZON
+from preprocesamiento import preprocesar, CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO, MAX_TOKENS_POR_QUEJA
+
+# === VARIOS ARCHIVOS Y HOJAS EN UNA SOLA CORRIDA ===
+# Las oficinas regionales mandan un libro por línea con una hoja por mes. Todas
+# las filas de todas las hojas van a una única cola global: se limpian juntas,
+# se eliminan las quejas repetidas entre hojas, se clasifican en paralelo y los
+# resultados se vuelven a escribir hoja por hoja en un solo libro de salida.
+HILOS_POR_DEFECTO = 4
+MAX_LARGO_NOMBRE_HOJA = 31 # Límite de Excel
+
+
+def armar_cola(libros, columna, max_tokens=MAX_TOKENS_POR_QUEJA):
+    """
+    Junta la columna de quejas de todas las hojas en una cola global sin repetidos.
+
+    Args:
+        libros (dict): {nombre_archivo: {nombre_hoja: DataFrame}}.
+        columna (str): Columna con las quejas; las hojas que no la tienen se omiten.
+        max_tokens (int): Máximo de tokens por queja del preprocesamiento.
+
+    Returns:
+        tuple: (cola, unicos, omitidas)
+            cola (pd.DataFrame): Una fila por queja con archivo, hoja, fila, texto,
+                clasificable y unico (posición en unicos, -1 si no se envía al modelo).
+            unicos (list[str]): Textos distintos a clasificar.
+            omitidas (list[str]): "archivo / hoja" sin la columna elegida.
+    """
+    partes, omitidas = [], []
+    for archivo, hojas in libros.items():
+        for hoja, df in hojas.items():
+            if columna not in df.columns:
+                omitidas.append(f"{archivo} / {hoja}")
+                continue
+            partes.append(pd.DataFrame({
+                "archivo": archivo,
+                "hoja": hoja,
+                "fila": range(len(df)),
+                "original": df[columna].to_numpy(),
+            }))
+    if not partes:
+        return pd.DataFrame(columns=["archivo", "hoja", "fila", "texto", "clasificable", "unico"]), [], omitidas
+
+    cola = pd.concat(partes, ignore_index=True)
+    textos, clasificables, _ = preprocesar(cola.pop("original"), max_tokens)
+    cola["texto"] = textos
+    cola["clasificable"] = clasificables
+    # Las quejas iguales (tras la limpieza) se clasifican una sola vez
+    codigos, unicos = pd.factorize(textos.where(clasificables))
+    cola["unico"] = codigos
+    return cola, unicos.tolist(), omitidas
+
+
+def clasificar_en_paralelo(textos, clasificar, hilos=HILOS_POR_DEFECTO):
+    """
+    Clasifica los textos con un pool de hilos. Los resultados se entregan en el hilo
+    que llama, a medida que terminan, para poder actualizar la interfaz desde ahí.
+
+    Args:
+        textos (list[str]): Textos a clasificar.
+        clasificar (callable): clasificar(texto) -> (categoria, razon, origen). Se ejecuta
+            en los hilos del pool: no debe usar Streamlit.
+        hilos (int): Solicitudes simultáneas.
+
+    Yields:
+        tuple: (posicion, categoria, razon, origen)
+    """
+    with ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="multiarchivo") as pool:
+        futuros = {pool.submit(clasificar, texto): i for i, texto in enumerate(textos)}
+        try:
+            for futuro in as_completed(futuros):
+                i = futuros[futuro]
+                try:
+                    categoria, razon, origen = futuro.result()
+                except Exception as e:
+                    categoria, razon, origen = "ERROR_INESPERADO", str(e), "api"
+                yield i, categoria, razon, origen
+        finally:
+            for futuro in futuros:
+                futuro.cancel() # Si se corta la corrida, no se envían las pendientes
+
+
+def clasificador_compartido(clasificar, consultar_cache, circuito, limitador, presupuesto):
+    """
+    Arma la función que corre en cada hilo del pool: primero la caché, después el
+    presupuesto, el cortacircuitos y el limitador de tasa, y recién ahí la llamada.
+
+    Args:
+        clasificar (callable): clasificar(texto) -> (categoria, razon, origen).
+        consultar_cache (callable): consultar_cache(texto) -> (categoria, razon) o None.
+        circuito (Circuito), limitador (LimitadorTasa), presupuesto (Presupuesto): Compartidos.
+
+    Returns:
+        callable: clasificar_compartida(texto) -> (categoria, razon, origen). No usa Streamlit.
+    """
+    def clasificar_compartida(texto):
+        # Un acierto de caché no consume turnos del circuito ni del limitador
+        en_cache = consultar_cache(texto)
+        if en_cache is not None:
+            return (*en_cache, "cache")
+        if presupuesto.agotado():
+            return "NO_CLASIFICADO", "No procesado: se alcanzó el presupuesto máximo de la corrida", "api"
+        if not circuito.esperar_turno():
+            return "NO_CLASIFICADO", "No procesado: Gemini no se recuperó dentro del tiempo máximo de espera", "api"
+        limitador.esperar()
+        # Cada turno concedido registra exactamente un resultado, aunque la respuesta
+        # venga de la caché o de una llamada compartida: si el turno era la prueba del
+        # circuito semiabierto, así se libera y los demás hilos no quedan bloqueados.
+        categoria = "ERROR"
+        try:
+            categoria, razon, origen = clasificar(texto)
+        finally:
+            if categoria == "ERROR":
+                circuito.registrar_fallo()
+            else:
+                circuito.registrar_exito()
+        return categoria, razon, origen
+
+    return clasificar_compartida
+
+
+def _nombre_hoja(archivo, hoja, usados):
+    hoja = str(hoja)
+    # Se recorta el nombre del archivo, no el de la hoja, para que el mes siga visible
+    base = f"{archivo.rsplit('.', 1)[0][:max(0, MAX_LARGO_NOMBRE_HOJA - len(hoja) - 1)]}-{hoja}" if archivo else hoja
+    nombre = "".join("_" if c in "[]:*?/\\" else c for c in base)[:MAX_LARGO_NOMBRE_HOJA]
+    sufijo = 2
+    while nombre.lower() in usados:
+        marca = f"~{sufijo}"
+        nombre = nombre[:MAX_LARGO_NOMBRE_HOJA - len(marca)] + marca
+        sufijo += 1
+    usados.add(nombre.lower())
+    return nombre
+
+
+def armar_libro_salida(libros, cola, categorias, razones):
+    """
+    Escribe un libro con una hoja por cada hoja de entrada ("archivo-hoja"),
+    agregando las columnas de categoría y razón a las hojas que se clasificaron.
+
+    Args:
+        categorias, razones (array): Resultado por fila de la cola (mismo orden que cola).
+
+    Returns:
+        BytesIO: El .xlsx listo para descargar.
+    """
+    resultados = cola[["archivo", "hoja", "fila"]].assign(categoria=categorias, razon=razones)
+    por_hoja = {clave: grupo for clave, grupo in resultados.groupby(["archivo", "hoja"], sort=False)}
+    un_solo_archivo = len(libros) == 1
+
+    salida = BytesIO()
+    usados = set()
+    with pd.ExcelWriter(salida, engine="openpyxl") as libro:
+        for archivo, hojas in libros.items():
+            for hoja, df in hojas.items():
+                df = df.copy()
+                grupo = por_hoja.get((archivo, hoja))
+                if grupo is not None:
+                    grupo = grupo.sort_values("fila")
+                    df[COLUMNA_CATEGORIA] = grupo["categoria"].to_numpy()
+                    df[COLUMNA_RAZON] = grupo["razon"].to_numpy()
+                nombre = _nombre_hoja(None if un_solo_archivo else archivo, hoja, usados)
+                df.to_excel(libro, sheet_name=nombre, index=False)
+    salida.seek(0)
+    return salida
+
+
+def resultados_por_fila(cola, resultados_unicos):
+    """
+    Expande los resultados de los textos únicos a todas las filas de la cola.
+
+    Args:
+        resultados_unicos (BufferResultados): Resultado de cada texto de unicos.
+
+    Returns:
+        BufferResultados: Una fila por fila de la cola; las no clasificables quedan como SIN_TEXTO.
+    """
+    return resultados_unicos.expandir(cola["unico"].to_numpy(), CATEGORIA_SIN_TEXTO, RAZON_SIN_TEXTO)
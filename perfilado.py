@@ -0,0 +1,98 @@
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+# === PERFILADO POR ETAPAS ===
+# Cuando una corrida es lenta hay que saber si el tiempo se va en leer el Excel,
+# armar prompts, la red, parsear respuestas, refrescar la UI o escribir la salida.
+# El Perfilador acumula tiempo y cantidad de llamadas por etapa y, opcionalmente,
+# corre cProfile sobre todo el flujo para descargar el perfil (.prof, se abre con
+# snakeviz o pstats).
+
+
+class Perfilador:
+    def __init__(self, cprofile=False):
+        self._tiempos = {} # etapa -> [segundos acumulados, llamadas]
+        self._lock = threading.Lock()
+        self._perfil = cProfile.Profile() if cprofile else None
+        self._inicio = None
+        self._total = 0.0
+
+    def iniciar(self):
+        self._inicio = time.perf_counter()
+        if self._perfil:
+            self._perfil.enable()
+
+    def detener(self):
+        if self._perfil:
+            self._perfil.disable()
+        if self._inicio is not None:
+            self._total += time.perf_counter() - self._inicio
+            self._inicio = None
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Suma el tiempo del bloque a la etapa indicada."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            transcurrido = time.perf_counter() - inicio
+            with self._lock:
+                acumulado = self._tiempos.setdefault(nombre, [0.0, 0])
+                acumulado[0] += transcurrido
+                acumulado[1] += 1
+
+    def tabla(self):
+        """DataFrame con el tiempo por etapa, de la más costosa a la menos costosa."""
+        total = self._total or sum(t for t, _ in self._tiempos.values()) or 1.0
+        filas = [
+            {
+                "Etapa": nombre,
+                "Llamadas": llamadas,
+                "Total (s)": round(segundos, 3),
+                "Promedio (ms)": round(segundos / llamadas * 1000, 2),
+                "% del total": round(segundos / total * 100, 1),
+            }
+            for nombre, (segundos, llamadas) in self._tiempos.items()
+        ]
+        if self._total:
+            medido = sum(t for t, _ in self._tiempos.values())
+            filas.append({
+                "Etapa": "(sin medir)", "Llamadas": 0, "Total (s)": round(max(0.0, self._total - medido), 3),
+                "Promedio (ms)": 0.0, "% del total": round(max(0.0, self._total - medido) / total * 100, 1),
+            })
+        return pd.DataFrame(filas).sort_values("Total (s)", ascending=False, ignore_index=True)
+
+    def archivo_perfil(self):
+        """Contenido del perfil de cProfile en formato pstats (.prof), o None si no se activó."""
+        if not self._perfil:
+            return None
+        with tempfile.NamedTemporaryFile(suffix=".prof", delete=False) as f:
+            ruta = f.name
+        try:
+            self._perfil.dump_stats(ruta)
+            with open(ruta, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(ruta)
+
+    def resumen_perfil(self, lineas=25):
+        """Las funciones con más tiempo acumulado, en texto, para mostrar en la UI."""
+        if not self._perfil:
+            return ""
+        salida = io.StringIO()
+        pstats.Stats(self._perfil, stream=salida).sort_stats("cumulative").print_stats(lineas)
+        return salida.getvalue()
+
+
+def medir(perfilador, nombre):
+    """Contexto de medición de una etapa; no hace nada si no hay perfilador."""
+    return perfilador.etapa(nombre) if perfilador else nullcontext()
@@ -0,0 +1,167 @@
+import math
+import threading
+
+from categorias import armar_prompt
+
+# === PLANIFICACIÓN PREVIA DE TOKENS, TIEMPO Y COSTO ===
+# Precios en USD por millón de tokens (entrada, salida). Actualizar según la
+# lista de precios vigente de cada proveedor.
+PRECIOS = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-flash-latest": (0.075, 0.30),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "local-onnx": (0.0, 0.0), # Modelo local en CPU (modelo_local.py)
+}
+DESCUENTO_BATCH = 0.5 # Las APIs batch cobran la mitad
+
+# Heurísticas iniciales; se corrigen con el uso real informado por la API (usage_metadata)
+CARACTERES_POR_TOKEN = 4.0
+TOKENS_SALIDA_POR_FILA = 60
+LATENCIA_MEDIA = 1.5 # segundos por solicitud
+PESO_CALIBRACION = 0.05 # Peso de cada observación en el promedio móvil exponencial
+
+_lock = threading.Lock()
+_calibracion = {"entrada": 1.0, "salida": 1.0}
+TOKENS_PROMPT_BASE = len(armar_prompt("")) / CARACTERES_POR_TOKEN
+
+
+def planificar(textos, modelo, modo="individual", filas_por_lote=1, espera=0.0,
+               solicitudes_por_minuto=None, tokens_base=TOKENS_PROMPT_BASE):
+    """
+    Estima tokens, solicitudes, tiempo y costo de clasificar una columna.
+    Las longitudes se calculan de forma vectorizada sobre toda la columna.
+
+    Args:
+        textos (pd.Series): Columna de quejas.
+        modelo (str): Nombre del modelo (clave de PRECIOS).
+        modo (str): "individual", "lotes" o "batch".
+        filas_por_lote (int): Quejas por solicitud en modo "lotes".
+        espera (float): Pausa configurada entre solicitudes, en segundos.
+        solicitudes_por_minuto (int | None): Límite de tasa del proveedor.
+        tokens_base (float): Tokens fijos del prompt por solicitud.
+
+    Returns:
+        dict: filas, solicitudes, tokens_entrada, tokens_salida, segundos, costo_usd
+              y estadísticas de tokens por fila (p50, p95, max).
+    """
+    filas = len(textos)
+    tokens_fila = textos.fillna("").astype(str).str.len() / CARACTERES_POR_TOKEN * _calibracion["entrada"]
+
+    if modo == "lotes":
+        solicitudes = math.ceil(filas / max(1, filas_por_lote))
+    else:
+        solicitudes = filas
+    tokens_entrada = float(tokens_fila.sum()) + tokens_base * _calibracion["entrada"] * solicitudes
+    tokens_salida = filas * TOKENS_SALIDA_POR_FILA * _calibracion["salida"]
+
+    if modo == "batch":
+        segundos = None # Depende de la cola del proveedor (hasta 24 h)
+    else:
+        segundos = solicitudes * (espera + LATENCIA_MEDIA)
+        if solicitudes_por_minuto:
+            segundos = max(segundos, solicitudes / solicitudes_por_minuto * 60)
+
+    return {
+        "filas": filas,
+        "solicitudes": solicitudes,
+        "tokens_entrada": int(tokens_entrada),
+        "tokens_salida": int(tokens_salida),
+        "segundos": segundos,
+        "costo_usd": costo(modelo, tokens_entrada, tokens_salida, batch=(modo == "batch")),
+        "tokens_fila_p50": float(tokens_fila.median()) if filas else 0.0,
+        "tokens_fila_p95": float(tokens_fila.quantile(0.95)) if filas else 0.0,
+        "tokens_fila_max": float(tokens_fila.max()) if filas else 0.0,
+    }
+
+
+def costo(modelo, tokens_entrada, tokens_salida, batch=False):
+    """Costo en USD; None si el modelo no está en la tabla de precios."""
+    if modelo not in PRECIOS:
+        return None
+    precio_entrada, precio_salida = PRECIOS[modelo]
+    total = tokens_entrada / 1e6 * precio_entrada + tokens_salida / 1e6 * precio_salida
+    return total * DESCUENTO_BATCH if batch else total
+
+
+def describir_plan(plan, max_costo_usd=None):
+    """Texto en markdown con el resumen del plan, para mostrar en la UI."""
+    costo_txt = f"US$ {plan['costo_usd']:.2f}" if plan["costo_usd"] is not None else "sin precio cargado para el modelo"
+    if plan["segundos"] is None:
+        tiempo_txt = "según la cola del proveedor (hasta 24 h)"
+    else:
+        tiempo_txt = f"~{plan['segundos'] / 60:.0f} min"
+    texto = (
+        f"**Plan estimado:** {plan['filas']:,} filas en {plan['solicitudes']:,} solicitudes · "
+        f"{plan['tokens_entrada']:,} tokens de entrada y {plan['tokens_salida']:,} de salida · "
+        f"tiempo {tiempo_txt} · costo {costo_txt}.  \n"
+        f"Tokens por fila: mediana {plan['tokens_fila_p50']:.0f}, p95 {plan['tokens_fila_p95']:.0f}, máximo {plan['tokens_fila_max']:.0f}."
+    )
+    if max_costo_usd and plan["costo_usd"] and plan["costo_usd"] > max_costo_usd:
+        texto += f"  \n⚠️ El costo estimado supera el presupuesto de US$ {max_costo_usd:.2f}: la corrida se detendrá al alcanzarlo."
+    return texto
+
+
+def registrar_uso(prompt, usage_metadata, filas=1, presupuesto=None, calibrar_salida=True):
+    """
+    Registra el uso real de una respuesta: corrige la calibración de la estimación
+    y descuenta los tokens del presupuesto de la corrida, si hay uno.
+
+    Args:
+        prompt (str): Prompt enviado (para comparar con la estimación).
+        usage_metadata: Atributo usage_metadata de la respuesta de Gemini.
+        filas (int): Quejas incluidas en la solicitud.
+        presupuesto (Presupuesto | None): Presupuesto de la corrida.
+        calibrar_salida (bool): False para respuestas que no traen categoría y razón
+            (p. ej. la repregunta de categoría), que no sirven para calibrar la salida.
+    """
+    if usage_metadata is None:
+        return
+    entrada = getattr(usage_metadata, "prompt_token_count", 0) or 0
+    # Los tokens de razonamiento de los modelos 2.5 se facturan como salida
+    salida = (getattr(usage_metadata, "candidates_token_count", 0) or 0) + (getattr(usage_metadata, "thoughts_token_count", 0) or 0)
+
+    with _lock:
+        estimado_entrada = len(prompt) / CARACTERES_POR_TOKEN
+        if entrada and estimado_entrada:
+            _calibracion["entrada"] += PESO_CALIBRACION * (entrada / estimado_entrada - _calibracion["entrada"])
+        if salida and calibrar_salida:
+            _calibracion["salida"] += PESO_CALIBRACION * (salida / (TOKENS_SALIDA_POR_FILA * filas) - _calibracion["salida"])
+
+    if presupuesto is not None:
+        presupuesto.registrar(entrada, salida)
+
+
+class Presupuesto:
+    """
+    Tope de gasto de una corrida. El bucle de clasificación consulta agotado()
+    antes de cada envío y se detiene limpiamente al alcanzarlo.
+    """
+
+    def __init__(self, modelo, max_costo_usd=None, max_tokens=None):
+        self.modelo = modelo
+        self.max_costo_usd = max_costo_usd or None
+        self.max_tokens = max_tokens or None
+        self.tokens_entrada = 0
+        self.tokens_salida = 0
+        self._lock = threading.Lock()
+
+    def registrar(self, tokens_entrada, tokens_salida):
+        with self._lock:
+            self.tokens_entrada += tokens_entrada
+            self.tokens_salida += tokens_salida
+
+    def costo(self):
+        return costo(self.modelo, self.tokens_entrada, self.tokens_salida) or 0.0
+
+    def agotado(self):
+        if self.max_tokens and self.tokens_entrada + self.tokens_salida >= self.max_tokens:
+            return True
+        return bool(self.max_costo_usd) and self.costo() >= self.max_costo_usd
+
+    def resumen(self):
+        return f"{self.tokens_entrada + self.tokens_salida:,} tokens · US$ {self.costo():.4f}"
@@ -0,0 +1,84 @@
+from planificador import CARACTERES_POR_TOKEN
+
+# === PREPROCESAMIENTO VECTORIZADO DE LOS TEXTOS ===
+# Antes de enviar nada a la API se limpia la columna completa con operaciones
+# .str de pandas: las celdas vacías o triviales se etiquetan sin llamar al modelo,
+# se quitan firmas e hilos citados, se colapsan espacios y se trunca a un máximo
+# de tokens por queja.
+CATEGORIA_SIN_TEXTO = "SIN_TEXTO"
+RAZON_SIN_TEXTO = "Fila vacía o sin contenido clasificable; no se envió al modelo"
+
+MIN_CARACTERES_UTILES = 3 # Letras o dígitos mínimos para considerar que hay una queja
+MAX_TOKENS_POR_QUEJA = 1000
+
+# Desde estas marcas en adelante el texto es un mensaje anterior citado. Solo cuentan
+# al comienzo de una línea y con forma de encabezado real (fecha/hora o correo en
+# "El ... escribió:", o una línea "De:" seguida de "Enviado:"), para no cortar quejas
+# que simplemente cuentan que alguien "escribió" algo.
+_PATRON_HILO_CITADO = (
+    r"(?im)(?:"
+    r"^[ \t]*El\b(?=[^\n]*(?:@|\d{1,2}:\d{2}))[^\n]{0,200}escribi[óo]:[ \t]*$"
+    r"|^[ \t]*On\b(?=[^\n]*(?:@|\d{1,2}:\d{2}))[^\n]{0,200}wrote:[ \t]*$"
+    r"|^[ \t]*-{2,}[ \t]*Mensaje original[ \t]*-{2,}"
+    r"|^[ \t]*-{2,}[ \t]*Original Message[ \t]*-{2,}"
+    r"|^[ \t]*De:[ \t]+[^\n]+\n[ \t]*Enviado(?: el)?:"
+    r"|^[ \t]*From:[ \t]+[^\n]+\n[ \t]*Sent:"
+    r")[\s\S]*"
+)
+_PATRON_LINEAS_CITADAS = r"(?m)^\s*>.*$"
+_PATRON_FIRMAS = (
+    r"(?im)^\s*(?:"
+    r"Enviado desde mi .*"
+    r"|Sent from my .*"
+    r"|Obtener Outlook para .*"
+    r"|Get Outlook for .*"
+    r"|Este (?:correo|mensaje) (?:electrónico )?(?:y sus adjuntos )?(?:es|son) confidencial.*"
+    r")$"
+)
+
+
+def preprocesar(quejas, max_tokens=MAX_TOKENS_POR_QUEJA):
+    """
+    Limpia la columna de quejas y marca las filas que no vale la pena enviar al modelo.
+
+    Args:
+        quejas (pd.Series): Columna original tal como se leyó del archivo.
+        max_tokens (int): Máximo de tokens estimados por queja; el resto se trunca.
+
+    Returns:
+        tuple: (textos, clasificables, resumen)
+            textos (pd.Series[str]): Textos limpios, mismo índice que quejas.
+            clasificables (pd.Series[bool]): False para filas vacías, NaN o triviales.
+            resumen (dict): filas_omitidas, filas_truncadas y tokens_ahorrados.
+    """
+    # Se usa el dtype "string" para que las celdas vacías no se conviertan en el texto "nan"
+    originales = quejas.astype("string").fillna("")
+    textos = (
+        originales
+        .str.replace(_PATRON_HILO_CITADO, "", regex=True)
+        .str.replace(_PATRON_LINEAS_CITADAS, "", regex=True)
+        .str.replace(_PATRON_FIRMAS, "", regex=True)
+        .str.replace(r"\s+", " ", regex=True)
+        .str.strip()
+    )
+
+    clasificables = textos.str.count(r"[^\W_]") >= MIN_CARACTERES_UTILES
+    max_caracteres = int(max_tokens * CARACTERES_POR_TOKEN)
+    truncadas = clasificables & (textos.str.len() > max_caracteres)
+    textos = textos.str.slice(0, max_caracteres)
+
+    longitud_final = textos.str.len().where(clasificables, 0)
+    resumen = {
+        "filas_omitidas": int((~clasificables).sum()),
+        "filas_truncadas": int(truncadas.sum()),
+        "tokens_ahorrados": int((originales.str.len() - longitud_final).sum() / CARACTERES_POR_TOKEN),
+    }
+    return textos.astype(object), clasificables.astype(bool), resumen
+
+
+def describir_preprocesamiento(resumen):
+    return (
+        f"🧹 Preprocesamiento: {resumen['filas_omitidas']} filas vacías o triviales no se envían al modelo "
+        f"(quedan como {CATEGORIA_SIN_TEXTO}), {resumen['filas_truncadas']} filas truncadas, "
+        f"~{resumen['tokens_ahorrados']:,} tokens de entrada ahorrados."
+    )
@@ -0,0 +1,87 @@
+import time
+
+import streamlit as st
+
+# Cada actualización de st.progress / st.empty envía un mensaje por websocket al
+# navegador. Con cientos de filas por segundo eso frena la clasificación, así que
+# la UI se refresca como máximo una vez cada INTERVALO_REFRESCO segundos.
+INTERVALO_REFRESCO = 0.5
+
+
+def formatear_duracion(segundos):
+    """Convierte segundos a un texto corto: '12s', '3m 05s', '1h 02m'."""
+    segundos = int(max(0, segundos))
+    if segundos < 60:
+        return f"{segundos}s"
+    if segundos < 3600:
+        return f"{segundos // 60}m {segundos % 60:02d}s"
+    return f"{segundos // 3600}h {(segundos % 3600) // 60:02d}m"
+
+
+class ReporteProgreso:
+    """
+    Reporte de progreso compartido por todos los modos de clasificación por archivo.
+
+    Acumula contadores en cada fila o lote y solo redibuja la barra y el texto de
+    estado a una frecuencia fija, mostrando filas/s, ETA, tasa de aciertos de caché
+    y cantidad de errores. Debe usarse desde el hilo principal de Streamlit.
+    """
+
+    def __init__(self, total, intervalo=INTERVALO_REFRESCO):
+        self.total = max(0, total)
+        self.intervalo = intervalo
+        self.procesadas = 0
+        self.errores = 0
+        self.aciertos_cache = 0
+        self.inicio = time.monotonic()
+        self._ultimo_refresco = 0.0
+        self._barra = st.progress(0.0)
+        self._estado = st.empty()
+
+    def avanzar(self, filas=1, errores=0, aciertos_cache=0):
+        """Registra filas terminadas y refresca la UI solo si pasó el intervalo."""
+        self.procesadas += filas
+        self.errores += errores
+        self.aciertos_cache += aciertos_cache
+        ahora = time.monotonic()
+        if ahora - self._ultimo_refresco >= self.intervalo or self.procesadas >= self.total:
+            self._ultimo_refresco = ahora
+            self._dibujar()
+
+    def reiniciar(self, total, texto=None):
+        """Reinicia contadores y barra para una nueva fase (p. ej. una pasada de reintentos)."""
+        self.total = max(0, total)
+        self.procesadas = 0
+        self.errores = 0
+        self.aciertos_cache = 0
+        self.inicio = time.monotonic()
+        self._barra.progress(0.0)
+        if texto:
+            self.nota(texto)
+
+    def nota(self, texto):
+        """Muestra un mensaje puntual (p. ej. una fase nueva) sin esperar al intervalo."""
+        self._estado.text(f"{texto}\n{self.resumen()}")
+
+    def finalizar(self, texto="Clasificación finalizada."):
+        self._barra.progress(1.0)
+        self._estado.text(f"{texto}\n{self.resumen()}")
+
+    def velocidad(self):
+        transcurrido = time.monotonic() - self.inicio
+        return self.procesadas / transcurrido if transcurrido > 0 else 0.0
+
+    def resumen(self):
+        velocidad = self.velocidad()
+        restantes = max(0, self.total - self.procesadas)
+        eta = formatear_duracion(restantes / velocidad) if velocidad > 0 else "--"
+        tasa_cache = (self.aciertos_cache / self.procesadas * 100) if self.procesadas else 0.0
+        return (
+            f"{self.procesadas}/{self.total} filas · {velocidad:.1f} filas/s · ETA {eta} · "
+            f"caché {tasa_cache:.0f}% · errores {self.errores}"
+        )
+
+    def _dibujar(self):
+        fraccion = min(1.0, self.procesadas / self.total) if self.total else 1.0
+        self._barra.progress(fraccion)
+        self._estado.text(self.resumen())
@@ -0,0 +1,80 @@
+import time
+
+# === COLA DE REINTENTOS PARA FILAS FALLIDAS ===
+# Al terminar la pasada principal, las filas que quedaron con ERROR* o
+# NO_CLASIFICADO se juntan en una cola y se reintentan en pasadas sucesivas,
+# con esperas cada vez más largas, lotes más chicos y, en la última pasada,
+# opcionalmente con un modelo de respaldo.
+PASADAS_REINTENTO = 3
+ESPERA_INICIAL = 10 # segundos antes de la segunda pasada; se duplica en cada pasada
+ESPERA_MAXIMA = 120
+PAUSA_ENTRE_LLAMADAS = 1.0 # Solo antes de una llamada si la anterior dejó filas fallidas
+
+
+def es_fila_fallida(categoria):
+    """ERROR, ERROR_API, ERROR_FORMATO, ERROR_LOTE, ERROR_JSON, NO_CLASIFICADO, etc."""
+    return not categoria or categoria.startswith("ERROR") or categoria == "NO_CLASIFICADO"
+
+
+def filas_fallidas(categorias, indices=None):
+    """Devuelve las posiciones (dentro de indices, si se indica) con categoría fallida."""
+    indices = range(len(categorias)) if indices is None else indices
+    return [i for i in indices if es_fila_fallida(categorias[i])]
+
+
+def drenar_cola(pendientes, clasificar_lote, tamano_lote=1, pasadas=PASADAS_REINTENTO,
+                espera_inicial=ESPERA_INICIAL, espera_maxima=ESPERA_MAXIMA,
+                pausa_entre_llamadas=PAUSA_ENTRE_LLAMADAS, modelo_respaldo=None,
+                al_iniciar_pasada=None, al_avanzar=None, detener=None):
+    """
+    Reintenta las filas pendientes hasta que se clasifiquen o se agoten las pasadas.
+
+    Args:
+        pendientes (list): Posiciones de las filas a reintentar.
+        clasificar_lote (callable): clasificar_lote(indices, modelo) -> {indice: (categoria, razon)}.
+            modelo es None para usar el modelo principal.
+        tamano_lote (int): Filas por llamada (1 para el modo individual).
+        pasadas (int): Cantidad máxima de pasadas sobre la cola.
+        modelo_respaldo (str | None): Modelo a usar en la última pasada.
+        al_iniciar_pasada (callable | None): al_iniciar_pasada(numero, cantidad).
+        al_avanzar (callable | None): al_avanzar(filas, errores) tras cada llamada.
+        detener (callable | None): Si devuelve True se corta el drenado (p. ej. presupuesto agotado).
+
+    Returns:
+        dict: {indice: (categoria, razon)} con el último resultado de cada fila reintentada.
+    """
+    resultados = {}
+    cola = list(pendientes)
+    espera = espera_inicial
+    for pasada in range(pasadas):
+        if not cola:
+            break
+        if pasada > 0:
+            time.sleep(espera)
+            espera = min(espera * 2, espera_maxima)
+        modelo = modelo_respaldo if modelo_respaldo and pasada == pasadas - 1 else None
+        if al_iniciar_pasada:
+            al_iniciar_pasada(pasada + 1, len(cola))
+        print(f"DEBUG: Pasada de reintento {pasada + 1}: {len(cola)} filas (modelo: {modelo or 'principal'})")
+
+        siguiente = []
+        pausar = False
+        for inicio in range(0, len(cola), tamano_lote):
+            if detener and detener():
+                return resultados
+            if pausar: # La llamada anterior volvió a fallar: se deja respirar a la API
+                time.sleep(pausa_entre_llamadas)
+            lote = cola[inicio:inicio + tamano_lote]
+            salida = clasificar_lote(lote, modelo)
+            errores = 0
+            for i in lote:
+                categoria, razon = salida.get(i, ("ERROR_LOTE", "Sin resultado en el reintento"))
+                resultados[i] = (categoria, razon)
+                if es_fila_fallida(categoria):
+                    siguiente.append(i)
+                    errores += 1
+            if al_avanzar:
+                al_avanzar(len(lote), errores)
+            pausar = errores > 0
+        cola = siguiente
+    return resultados
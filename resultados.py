@@ -0,0 +1,175 @@
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+from categorias import CATEGORIAS
+from reintentos import es_fila_fallida
+
+# === BUFFER COMPACTO DE RESULTADOS ===
+# En archivos grandes, las listas de categorías y razones eran millones de objetos
+# str chicos. El buffer guarda la categoría de cada fila como un código de un byte
+# sobre un vocabulario fijo (las 11 categorías más los estados de error) y la razón
+# como un índice a un almacén de textos internados: cada razón distinta se guarda
+# una sola vez (los mensajes de error, SIN_TEXTO o NO_CLASIFICADO se repiten mucho).
+# Ambas columnas se convierten en pd.Categorical; la de categorías reutiliza el
+# array de códigos sin copiarlo.
+PENDIENTE = -1 # Código de las filas todavía sin resultado
+
+
+class Estado(IntEnum):
+    """
+    Etiquetas que no son una categoría (los nombres coinciden con los textos que
+    escriben los clasificadores); el valor es su código en el vocabulario.
+    """
+    SIN_TEXTO = len(CATEGORIAS)
+    NO_CLASIFICADO = len(CATEGORIAS) + 1
+    ERROR = len(CATEGORIAS) + 2
+    ERROR_API = len(CATEGORIAS) + 3
+    ERROR_INESPERADO = len(CATEGORIAS) + 4
+    ERROR_CATEGORIA = len(CATEGORIAS) + 5
+    ERROR_JSON = len(CATEGORIAS) + 6
+    ERROR_FORMATO = len(CATEGORIAS) + 7
+    ERROR_LOTE = len(CATEGORIAS) + 8
+    ERROR_GENERAL = len(CATEGORIAS) + 9
+
+
+VOCABULARIO = [*CATEGORIAS, *(estado.name for estado in Estado)]
+MAX_CODIGOS_INT8 = 127 # Los códigos de un Categorical con hasta 127 categorías son int8
+
+
+class BufferResultados:
+    """
+    Categoría y razón por fila, en arrays compactos. Las categorías fuera del
+    vocabulario (respuestas del modelo a repreguntar) se agregan al vocabulario
+    de este buffer.
+
+    Se usa a través de sus vistas, que se indexan como las listas de antes:
+        buffer.categorias[i] = "Otros"; buffer.razones[i] = "..."
+    Las filas pendientes devuelven "".
+    """
+
+    def __init__(self, total):
+        self.codigos = np.full(total, PENDIENTE, dtype=np.int8)
+        self.ids_razon = np.full(total, PENDIENTE, dtype=np.int32)
+        self._vocabulario = list(VOCABULARIO)
+        self._codigo = {etiqueta: codigo for codigo, etiqueta in enumerate(VOCABULARIO)}
+        self._razones = [] # Almacén de razones internadas: id -> texto
+        self._id_razon = {}
+        self.categorias = _VistaCategorias(self)
+        self.razones = _VistaRazones(self)
+
+    def __len__(self):
+        return len(self.codigos)
+
+    def _codigo_categoria(self, categoria):
+        codigo = self._codigo.get(categoria)
+        if codigo is None:
+            codigo = self._codigo[categoria] = len(self._vocabulario)
+            self._vocabulario.append(categoria)
+            if codigo > MAX_CODIGOS_INT8 and self.codigos.dtype == np.int8:
+                self.codigos = self.codigos.astype(np.int16) # Demasiadas categorías no reconocidas
+        return codigo
+
+    def _internar(self, razon):
+        razon = "" if razon is None or pd.isna(razon) else str(razon)
+        id_razon = self._id_razon.get(razon)
+        if id_razon is None:
+            id_razon = self._id_razon[razon] = len(self._razones)
+            self._razones.append(razon)
+        return id_razon
+
+    def asignar(self, indices, categoria, razon):
+        """Asigna la misma categoría y razón a varias filas (indices: posición, lista o máscara)."""
+        self.codigos[indices] = self._codigo_categoria(categoria) if categoria else PENDIENTE
+        self.ids_razon[indices] = self._internar(razon)
+
+    def expandir(self, posiciones, categoria, razon):
+        """
+        Nuevo buffer con una fila por cada posición de este buffer (p. ej. de los textos
+        únicos a todas las filas), sin pasar por objetos str.
+
+        Args:
+            posiciones (array): Posición en este buffer de cada fila nueva; -1 para las filas
+                que llevan categoria y razon (p. ej. SIN_TEXTO).
+        """
+        posiciones = np.asarray(posiciones, dtype=np.intp)
+        validas = posiciones >= 0
+        nuevo = BufferResultados(0)
+        nuevo._vocabulario, nuevo._codigo = list(self._vocabulario), dict(self._codigo)
+        nuevo._razones, nuevo._id_razon = list(self._razones), dict(self._id_razon)
+        nuevo.codigos = np.full(len(posiciones), PENDIENTE, dtype=self.codigos.dtype)
+        nuevo.ids_razon = np.full(len(posiciones), PENDIENTE, dtype=np.int32)
+        nuevo.asignar(~validas, categoria, razon)
+        nuevo.codigos[validas] = self.codigos[posiciones[validas]]
+        nuevo.ids_razon[validas] = self.ids_razon[posiciones[validas]]
+        return nuevo
+
+    def pendientes(self):
+        """Posiciones de las filas todavía sin resultado."""
+        return np.flatnonzero(self.codigos == PENDIENTE)
+
+    def fallidas(self, indices=None):
+        """
+        Como reintentos.filas_fallidas, pero sobre los códigos: la regla de es_fila_fallida
+        se evalúa una vez por etiqueta del vocabulario (incluidas las ERROR* que no son de
+        Estado) y las filas pendientes también cuentan como fallidas.
+        """
+        indices = np.arange(len(self)) if indices is None else np.asarray(indices, dtype=np.intp)
+        etiqueta_fallida = np.array([es_fila_fallida(etiqueta) for etiqueta in self._vocabulario], dtype=bool)
+        codigos = self.codigos[indices]
+        pendiente = codigos == PENDIENTE
+        fallida = pendiente | etiqueta_fallida[np.where(pendiente, 0, codigos)]
+        return indices[fallida].tolist()
+
+    def columna_categorias(self):
+        """pd.Categorical de categorías; reutiliza el array de códigos (las pendientes quedan vacías)."""
+        return pd.Categorical.from_codes(self.codigos, categories=self._vocabulario)
+
+    def columna_razones(self):
+        """
+        pd.Categorical de razones. pandas guarda los códigos en el entero más chico que
+        alcanza para la cantidad de razones distintas, así que los ids (int32) se copian
+        salvo que haya más de 32.767 razones distintas.
+        """
+        return pd.Categorical.from_codes(self.ids_razon, categories=self._razones)
+
+    def memoria(self):
+        """Bytes aproximados que ocupa el buffer (arrays más textos internados)."""
+        return self.codigos.nbytes + self.ids_razon.nbytes + sum(len(r.encode("utf-8")) for r in self._razones)
+
+
+class _VistaCategorias:
+    def __init__(self, buffer):
+        self._buffer = buffer
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __getitem__(self, i):
+        codigo = self._buffer.codigos[i]
+        return "" if codigo == PENDIENTE else self._buffer._vocabulario[codigo]
+
+    def __setitem__(self, i, categoria):
+        self._buffer.codigos[i] = self._buffer._codigo_categoria(categoria) if categoria else PENDIENTE
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class _VistaRazones:
+    def __init__(self, buffer):
+        self._buffer = buffer
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __getitem__(self, i):
+        id_razon = self._buffer.ids_razon[i]
+        return "" if id_razon == PENDIENTE else self._buffer._razones[id_razon]
+
+    def __setitem__(self, i, razon):
+        self._buffer.ids_razon[i] = self._buffer._internar(razon)
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
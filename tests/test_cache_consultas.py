@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+import cache_consultas
+from cache_consultas import CacheVueloUnico
+
+
+def test_segunda_consulta_sale_de_la_cache():
+    cache = CacheVueloUnico()
+    assert cache.obtener("q", lambda: 1) == (1, "api")
+    assert cache.obtener("q", lambda: 2) == (1, "cache")
+    assert cache.consultar("q") == 1
+    assert cache.consultar("otra") is None
+    assert (cache.llamadas, cache.aciertos) == (1, 2)
+
+
+def test_consultas_simultaneas_comparten_una_llamada():
+    cache = CacheVueloUnico()
+    empezo, seguir = threading.Event(), threading.Event()
+    llamadas = []
+
+    def calcular():
+        llamadas.append(1)
+        empezo.set()
+        seguir.wait(5)
+        return "resultado"
+
+    primera = []
+    hilo = threading.Thread(target=lambda: primera.append(cache.obtener("q", calcular)))
+    hilo.start()
+    empezo.wait(5)
+    otras = []
+    hilos = [threading.Thread(target=lambda: otras.append(cache.obtener("q", calcular))) for _ in range(3)]
+    for h in hilos:
+        h.start()
+    limite = time.monotonic() + 5
+    while cache.compartidas < 3 and time.monotonic() < limite:
+        time.sleep(0.01)
+    seguir.set()
+    for h in (hilo, *hilos):
+        h.join(5)
+    assert primera == [("resultado", "api")]
+    assert otras == [("resultado", "compartida")] * 3
+    assert len(llamadas) == 1
+
+
+def test_errores_no_se_cachean():
+    cache = CacheVueloUnico()
+    with pytest.raises(RuntimeError):
+        cache.obtener("q", lambda: (_ for _ in ()).throw(RuntimeError("429")))
+    assert cache.obtener("q", lambda: ("ERROR", "x"), cachear=lambda v: v[0] != "ERROR") == (("ERROR", "x"), "api")
+    assert cache.obtener("q", lambda: ("Otros", "ok")) == (("Otros", "ok"), "api")
+    assert cache.llamadas == 3
+
+
+def test_lru_y_vencimiento(monkeypatch):
+    ahora = [0.0]
+    monkeypatch.setattr(cache_consultas.time, "monotonic", lambda: ahora[0])
+    cache = CacheVueloUnico(max_entradas=2, ttl=10)
+    for clave in ("a", "b"):
+        cache.obtener(clave, lambda: clave)
+    cache.obtener("a", lambda: "nuevo") # "a" pasa a ser la más reciente
+    cache.obtener("c", lambda: "c") # Se descarta "b"
+    assert cache.consultar("b") is None
+    assert cache.consultar("a") == "a"
+    ahora[0] = 10
+    assert cache.consultar("a") is None
+    assert cache.obtener("a", lambda: "nuevo") == ("nuevo", "api")
+
+
+class _Interrupcion(BaseException):
+    """Como el RerunException de Streamlit: no hereda de Exception."""
+
+
+def test_llamada_interrumpida_no_deja_colgados_a_los_que_esperan():
+    cache = CacheVueloUnico(espera_maxima=5)
+    empezo, seguir = threading.Event(), threading.Event()
+
+    def interrumpida():
+        empezo.set()
+        seguir.wait(5)
+        raise _Interrupcion()
+
+    errores = []
+
+    def lider():
+        try:
+            cache.obtener("q", interrumpida, cachear=lambda v: v[0] != "ERROR")
+        except BaseException as e:
+            errores.append(e)
+
+    hilo_lider = threading.Thread(target=lider)
+    hilo_lider.start()
+    empezo.wait(5)
+    otra = []
+    hilo = threading.Thread(target=lambda: otra.append(cache.obtener("q", lambda: ("Otros", "ok"))))
+    hilo.start()
+    limite = time.monotonic() + 5
+    while cache.compartidas < 1 and time.monotonic() < limite:
+        time.sleep(0.01)
+    seguir.set()
+    hilo_lider.join(5)
+    hilo.join(5)
+    assert not hilo.is_alive()
+    assert [type(e) for e in errores] == [_Interrupcion] # Sin TypeError de cachear(None)
+    assert otra == [(("Otros", "ok"), "api")] # Quien esperaba hizo su propia llamada
+    assert cache.consultar("q") == ("Otros", "ok")
+
+
+def test_espera_de_la_llamada_en_curso_tiene_limite():
+    cache = CacheVueloUnico(espera_maxima=0.05)
+    empezo, seguir = threading.Event(), threading.Event()
+    hilo = threading.Thread(target=lambda: cache.obtener("q", lambda: empezo.set() or seguir.wait(5)))
+    hilo.start()
+    empezo.wait(5)
+    with pytest.raises(TimeoutError):
+        cache.obtener("q", lambda: "nunca")
+    seguir.set()
+    hilo.join(5)
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+
+genai = pytest.importorskip("google.generativeai")
+
+import casete
+from casete import GRABAR, REPRODUCIR, REPRODUCIR_O_GRABAR, GrabacionNoEncontrada, configurar_casete, generar_contenido
+
+USO = SimpleNamespace(prompt_token_count=10, candidates_token_count=5, thoughts_token_count=2)
+
+
+class _ModeloFalso:
+    """Reemplaza a genai.GenerativeModel: responde sin red y registra cada llamada real."""
+    llamadas = []
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.llamadas.append((self.modelo, prompt, generation_config))
+        if stream:
+            return _Stream(["Categoría: Otros\n", "Razón: sin ", "datos"])
+        return SimpleNamespace(text=f"respuesta a {prompt}", usage_metadata=USO)
+
+
+class _Stream:
+    """Como la respuesta en streaming de Gemini: se itera por fragmentos y tiene usage_metadata."""
+
+    def __init__(self, textos):
+        self._textos, self.usage_metadata = textos, USO
+
+    def __iter__(self):
+        return (SimpleNamespace(text=t) for t in self._textos)
+
+
+@pytest.fixture
+def llamadas(tmp_path, monkeypatch):
+    anterior = dict(casete._config)
+    _ModeloFalso.llamadas = []
+    monkeypatch.setattr(genai, "GenerativeModel", _ModeloFalso)
+    configurar_casete(ruta=str(tmp_path / "casete.sqlite"), latencia=0)
+    yield _ModeloFalso.llamadas
+    configurar_casete(modo=anterior["modo"], ruta=anterior["ruta"], latencia=anterior["latencia"])
+
+
+def test_grabar_y_reproducir(llamadas):
+    configurar_casete(modo=GRABAR)
+    grabada = generar_contenido("modelo", "queja")
+    configurar_casete(modo=REPRODUCIR)
+    reproducida = generar_contenido("modelo", "queja")
+    assert reproducida.text == grabada.text == "respuesta a queja"
+    assert reproducida.usage_metadata.prompt_token_count == 10
+    assert reproducida.usage_metadata.thoughts_token_count == 2
+    assert len(llamadas) == 1
+
+
+def test_reproducir_sin_grabacion(llamadas):
+    configurar_casete(modo=REPRODUCIR)
+    with pytest.raises(GrabacionNoEncontrada):
+        generar_contenido("modelo", "nunca grabada")
+    assert llamadas == []
+
+
+def test_la_clave_incluye_modelo_y_configuracion(llamadas):
+    configurar_casete(modo=REPRODUCIR_O_GRABAR)
+    generar_contenido("modelo", "queja")
+    generar_contenido("modelo", "queja")
+    generar_contenido("otro", "queja")
+    generar_contenido("modelo", "queja", generation_config={"temperature": 0})
+    assert len(llamadas) == 3
+
+
+def test_stream_se_graba_al_terminar_y_se_reproduce_por_lineas(llamadas):
+    configurar_casete(modo=GRABAR)
+    en_vivo = generar_contenido("modelo", "queja", stream=True)
+    assert "".join(f.text for f in en_vivo) == "Categoría: Otros\nRazón: sin datos"
+    assert en_vivo.usage_metadata.candidates_token_count == 5
+
+    configurar_casete(modo=REPRODUCIR)
+    reproducida = generar_contenido("modelo", "queja", stream=True)
+    assert [f.text for f in reproducida] == ["Categoría: Otros\n", "Razón: sin datos"]
+    assert reproducida.usage_metadata.prompt_token_count == 10
+    assert len(llamadas) == 1
+
+
+def test_modo_desconocido():
+    with pytest.raises(ValueError):
+        configurar_casete(modo="rebobinar")
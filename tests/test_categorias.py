@@ -0,0 +1,38 @@
+import pytest
+
+from categorias import CATEGORIAS, armar_prompt, es_categoria_valida, normalizar_categoria, parsear_respuesta
+
+
+@pytest.mark.parametrize("recibida, esperada", [
+    ("Otros", "Otros"),
+    ("servicio operativo y frecuencia.", "Servicio Operativo y Frecuencia"),
+    ("ATENCION AL USUARIO", "Atención al Usuario"),
+    ("Categoría: Tarifas y Boletos", "Tarifas y Boletos"),
+    ("Infraestructura y Mantenimeinto", "Infraestructura y Mantenimiento"),
+    ("Deportes", None),
+    ("", None),
+    (None, None),
+])
+def test_normalizar_categoria(recibida, esperada):
+    assert normalizar_categoria(recibida) == esperada
+
+
+def test_todas_las_canonicas_son_validas():
+    assert all(es_categoria_valida(c) and normalizar_categoria(c) == c for c in CATEGORIAS)
+    assert not es_categoria_valida("ERROR_API")
+
+
+def test_parsear_respuesta_con_markdown():
+    respuesta = "**Categoría:** seguridad y control\n- **Razón:** Robo en el andén."
+    assert parsear_respuesta(respuesta) == ("Seguridad y Control", "Robo en el andén.")
+
+
+def test_parsear_respuesta_no_reconocida_se_devuelve_tal_cual():
+    assert parsear_respuesta("Categoría: Deportes\nRazón: x") == ("Deportes", "x")
+    assert parsear_respuesta("sin formato") == ("", "")
+
+
+def test_el_prompt_lista_las_categorias():
+    prompt = armar_prompt("El tren llegó tarde")
+    assert "El tren llegó tarde" in prompt
+    assert all(c in prompt for c in CATEGORIAS)
@@ -0,0 +1,64 @@
+import pytest
+
+import circuito
+from circuito import ABIERTO, CERRADO, SEMIABIERTO, Circuito
+
+
+def _abrir(c, fallos=5):
+    for _ in range(fallos):
+        assert c.permitir()
+        c.registrar_fallo()
+
+
+def test_se_abre_al_superar_la_tasa_de_errores():
+    c = Circuito("prueba", minimo_llamadas=5, umbral=0.5, pausa_inicial=60)
+    for _ in range(3):
+        c.registrar_exito()
+    for _ in range(2):
+        c.registrar_fallo()
+    assert c.estado == CERRADO # 2 de 5: por debajo del umbral
+    c.registrar_fallo()
+    assert c.estado == ABIERTO and c.aperturas == 1
+    assert not c.permitir()
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba():
+    c = Circuito("prueba", pausa_inicial=0)
+    _abrir(c)
+    assert c.permitir()
+    assert c.estado == SEMIABIERTO
+    assert not c.permitir() # La prueba sigue en curso
+    c.registrar_exito()
+    assert c.estado == CERRADO
+    assert c.tasa_errores() == 0
+
+
+def test_prueba_fallida_duplica_la_pausa(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(circuito.time, "monotonic", lambda: ahora[0])
+    c = Circuito("prueba", pausa_inicial=10, pausa_maxima=15)
+    _abrir(c)
+    ahora[0] += 10
+    assert c.permitir()
+    c.registrar_fallo()
+    assert c.estado == ABIERTO and c.aperturas == 2
+    ahora[0] += 14
+    assert not c.permitir()
+    ahora[0] += 1
+    assert c.permitir() # La pausa quedó en el máximo (15 s)
+
+
+def test_esperar_turno_se_rinde_tras_el_tiempo_maximo(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(circuito.time, "monotonic", lambda: ahora[0])
+    monkeypatch.setattr(circuito.time, "sleep", lambda s: ahora.__setitem__(0, ahora[0] + s))
+    avisos = []
+    c = Circuito("prueba", pausa_inicial=60, tiempo_maximo_abierto=30)
+    _abrir(c)
+    assert c.esperar_turno(al_esperar=avisos.append) is False
+    assert avisos and avisos[0] == pytest.approx(60)
+
+
+def test_obtener_circuito_es_compartido():
+    assert circuito.obtener_circuito("gemini", "m") is circuito.obtener_circuito("gemini", "m")
+    assert circuito.obtener_circuito("gemini", "m") is not circuito.obtener_circuito("openai", "m")
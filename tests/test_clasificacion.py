@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import pytest
+
+import clasificacion
+from cache_consultas import CacheVueloUnico
+from categorias import CATEGORIAS
+
+
+class _Stream:
+    """Respuesta en streaming: se itera por fragmentos; uno puede fallar a mitad de camino."""
+
+    def __init__(self, textos, error=None):
+        self._textos, self._error, self.usage_metadata = textos, error, None
+
+    def __iter__(self):
+        for texto in self._textos:
+            yield SimpleNamespace(text=texto)
+        if self._error:
+            raise self._error
+
+
+def _en_vivo(monkeypatch, respuesta):
+    monkeypatch.setattr(clasificacion, "generar_contenido", lambda modelo, prompt, stream=False: respuesta)
+    recibido = []
+    resultado = clasificacion.clasificar_queja_en_vivo("queja", lambda campo, valor: recibido.append((campo, valor)))
+    return resultado, recibido
+
+
+def test_en_vivo_muestra_la_categoria_al_completar_su_linea(monkeypatch):
+    resultado, recibido = _en_vivo(monkeypatch, _Stream(["Categoría: Otr", "os\nRazón: El tren", " llegó tarde"]))
+    assert resultado == ("Otros", "El tren llegó tarde")
+    # Nunca se muestra una categoría cortada ("Otr"); la razón llega completa al final
+    assert recibido == [("categoria", "Otros"), ("razon", "El tren llegó tarde")]
+
+
+def test_en_vivo_corte_del_stream(monkeypatch):
+    resultado, recibido = _en_vivo(monkeypatch, _Stream(["Categoría: Otros\n"], error=RuntimeError("conexión cortada")))
+    assert resultado == ("ERROR", "conexión cortada")
+    assert recibido == [("categoria", "Otros")]
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia(monkeypatch):
+    monkeypatch.setattr(clasificacion, "_cache_consultas", CacheVueloUnico())
+
+
+def _respuesta(monkeypatch, categoria, repregunta):
+    monkeypatch.setattr(clasificacion, "clasificar_queja_con_razon", lambda texto, presupuesto, modelo: (categoria, "razón"))
+    monkeypatch.setattr(clasificacion, "repreguntar_categoria", lambda texto, categoria, presupuesto: repregunta)
+
+
+def test_categoria_no_reconocida_queda_como_error_categoria(monkeypatch):
+    _respuesta(monkeypatch, "Deportes", None)
+    categoria, razon, origen = clasificacion.clasificar_queja_cacheada("queja")
+    assert categoria == "ERROR_CATEGORIA"
+    assert razon == "Categoría no reconocida: 'Deportes'. razón"
+    assert clasificacion.consultar_cache("queja") is None # Los errores no se guardan en caché
+
+
+def test_la_repregunta_corrige_la_categoria(monkeypatch):
+    _respuesta(monkeypatch, "Deportes", CATEGORIAS[4])
+    assert clasificacion.clasificar_queja_cacheada("queja") == (CATEGORIAS[4], "razón", "api")
+    assert clasificacion.clasificar_queja_cacheada("  queja ") == (CATEGORIAS[4], "razón", "cache")
@@ -0,0 +1,93 @@
+import json
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+
+import fragmentos
+from fragmentos import NOMBRE_MANIFIESTO, combinar, dividir, nombre_fragmento, nombre_resultado, procesar_fragmento
+
+
+@pytest.fixture
+def manifiesto(tmp_path):
+    original = tmp_path / "quejas.csv"
+    pd.DataFrame({"Queja": [f"queja {i}" for i in range(10)], "Otra": range(10)}).to_csv(original, index=False)
+    carpeta = tmp_path / "frag"
+    datos = dividir(str(original), "Queja", 3, str(carpeta))
+    return original, carpeta, datos
+
+
+def _resolver(carpeta, datos, omitir=None):
+    """Escribe el resultado de cada fragmento como lo haría procesar_fragmento."""
+    for fragmento in datos["fragmentos"]:
+        filas = list(range(fragmento["desde"], fragmento["hasta"]))
+        if omitir is not None:
+            filas = [f for f in filas if f != omitir]
+        fragmentos._guardar_resultado(
+            str(carpeta / nombre_resultado(fragmento["numero"])), filas,
+            [f"Cat {f}" for f in filas], [f"razón {f}" for f in filas],
+        )
+
+
+def test_dividir_cubre_todas_las_filas(manifiesto):
+    _, carpeta, datos = manifiesto
+    rangos = [(f["desde"], f["hasta"]) for f in datos["fragmentos"]]
+    assert rangos == [(0, 3), (3, 6), (6, 10)]
+    assert json.loads((carpeta / NOMBRE_MANIFIESTO).read_text(encoding="utf-8"))["total_filas"] == 10
+    assert pd.read_csv(carpeta / nombre_fragmento(2))["fila"].tolist() == [6, 7, 8, 9]
+
+
+def test_combinar_en_el_orden_original(manifiesto, tmp_path):
+    original, carpeta, datos = manifiesto
+    _resolver(carpeta, datos)
+    salida = tmp_path / "salida.csv"
+    df = combinar(str(carpeta / NOMBRE_MANIFIESTO), str(original), str(salida))
+    assert df["Otra"].tolist() == list(range(10))
+    assert df[fragmentos.COLUMNA_CATEGORIA].tolist() == [f"Cat {i}" for i in range(10)]
+    assert salida.exists()
+
+
+def test_combinar_rechaza_fragmentos_o_filas_faltantes(manifiesto, tmp_path):
+    original, carpeta, datos = manifiesto
+    _resolver(carpeta, datos, omitir=4)
+    (carpeta / nombre_resultado(2)).unlink()
+    with pytest.raises(ValueError) as error:
+        combinar(str(carpeta / NOMBRE_MANIFIESTO), str(original), str(tmp_path / "salida.csv"))
+    assert "Fragmento 1: faltan 1 filas (p. ej. 4)" in str(error.value)
+    assert f"Fragmento 2: falta {nombre_resultado(2)}" in str(error.value)
+
+
+def test_combinar_rechaza_filas_fuera_de_rango(manifiesto, tmp_path):
+    original, carpeta, datos = manifiesto
+    _resolver(carpeta, datos)
+    fragmentos._guardar_resultado(str(carpeta / nombre_resultado(0)), [0, 1, 2, 7], ["Cat"] * 4, ["r"] * 4)
+    with pytest.raises(ValueError, match="Fragmento 0: 1 filas fuera de su rango"):
+        combinar(str(carpeta / NOMBRE_MANIFIESTO), str(original), str(tmp_path / "salida.csv"))
+
+
+def test_combinar_rechaza_otro_archivo_original(manifiesto, tmp_path):
+    _, carpeta, datos = manifiesto
+    _resolver(carpeta, datos)
+    otro = tmp_path / "otro.csv"
+    pd.DataFrame({"Queja": ["distinta"] * 10}).to_csv(otro, index=False)
+    with pytest.raises(ValueError, match="no es el archivo con el que se armó el manifiesto"):
+        combinar(str(carpeta / NOMBRE_MANIFIESTO), str(otro), str(tmp_path / "salida.csv"))
+
+
+def test_procesar_rechaza_un_fragmento_modificado(manifiesto):
+    _, carpeta, _ = manifiesto
+    with open(carpeta / nombre_fragmento(1), "a", encoding="utf-8") as f:
+        f.write("99,agregada a mano\n")
+    with pytest.raises(ValueError, match="no coincide con el hash del manifiesto"):
+        procesar_fragmento(str(carpeta / NOMBRE_MANIFIESTO), 1, "clave")
+
+
+def test_version_de_manifiesto_desconocida(manifiesto):
+    _, carpeta, _ = manifiesto
+    ruta = carpeta / NOMBRE_MANIFIESTO
+    datos = json.loads(ruta.read_text(encoding="utf-8"))
+    datos["version"] = 99
+    ruta.write_text(json.dumps(datos), encoding="utf-8")
+    with pytest.raises(ValueError, match="Versión de manifiesto no soportada"):
+        procesar_fragmento(str(ruta), 0, "clave")
@@ -0,0 +1,87 @@
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+import historial
+from categorias import CATEGORIAS
+
+
+@pytest.fixture(autouse=True)
+def historial_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(historial, "RUTA_HISTORIAL", str(tmp_path / "historial.sqlite"))
+    monkeypatch.setattr(historial, "_tiene_fts", None)
+
+
+def _fecha_guardada(fila=0):
+    with closing(sqlite3.connect(historial.RUTA_HISTORIAL)) as conexion:
+        return conexion.execute("SELECT fecha FROM clasificaciones WHERE fila = ?", (fila,)).fetchone()[0]
+
+
+def test_solo_se_guardan_categorias_validas():
+    textos = pd.Series(["Se cortó la luz", "No anda el ascensor", ""])
+    guardadas = historial.guardar_corrida("a.xlsx", "h1", textos, [CATEGORIAS[0], "ERROR_API", "SIN_TEXTO"], ["r1", "r2", "r3"], "modelo")
+    assert guardadas == 1
+    assert historial.resumen_historial()["filas"] == 1
+
+
+def test_volver_a_guardar_el_archivo_reemplaza_sus_filas():
+    textos = pd.Series(["Se cortó la luz", "No anda el ascensor"])
+    fechas = pd.Series(["15/03/2024", "16/03/2024"])
+    historial.guardar_corrida("a.xlsx", "h1", textos, [CATEGORIAS[0]] * 2, ["r", "r"], "modelo", fechas=fechas)
+    assert _fecha_guardada() == "2024-03-15"
+
+    # En la corrida nueva la primera fila cambia de categoría y la segunda falla
+    historial.guardar_corrida("a.xlsx", "h1", textos, [CATEGORIAS[1], "ERROR_API"], ["r2", "429"], "modelo", fechas=fechas)
+    assert historial.resumen_historial()["filas"] == 1
+    assert historial.quejas_por_categoria()["categoria"].tolist() == [CATEGORIAS[1]]
+
+
+def test_archivos_superpuestos_no_cuentan_dos_veces():
+    # Exportación de enero y exportación acumulada de enero y febrero
+    enero = pd.DataFrame({"texto": ["Se cortó la luz", "Tren sucio"], "fecha": ["10/01/2024", "20/01/2024"]})
+    acumulado = pd.concat([enero, pd.DataFrame({"texto": ["Tren sucio"], "fecha": ["05/02/2024"]})], ignore_index=True)
+    historial.guardar_corrida("enero.xlsx", "h1", enero["texto"], [CATEGORIAS[0], CATEGORIAS[9]], ["r", "r"], "modelo", fechas=enero["fecha"])
+    historial.guardar_corrida("acumulado.xlsx", "h2", acumulado["texto"], [CATEGORIAS[0], CATEGORIAS[9], CATEGORIAS[9]], ["r"] * 3, "modelo", fechas=acumulado["fecha"])
+
+    assert historial.resumen_historial()["filas"] == 3
+    por_mes = historial.quejas_por_mes()
+    assert por_mes.loc["2024-01"].sum() == 2 and por_mes.loc["2024-02"].sum() == 1
+    por_categoria = dict(historial.quejas_por_categoria().itertuples(index=False))
+    assert por_categoria == {CATEGORIAS[9]: 2, CATEGORIAS[0]: 1}
+
+
+def test_el_id_distingue_quejas_con_el_mismo_texto():
+    textos = pd.Series(["Tren sucio", "Tren sucio"])
+    historial.guardar_corrida("a.xlsx", "h1", textos, [CATEGORIAS[9]] * 2, ["r", "r"], "modelo", ids=pd.Series([1, 2]))
+    historial.guardar_corrida("b.xlsx", "h2", textos, [CATEGORIAS[9]] * 2, ["r", "r"], "modelo", ids=pd.Series([2.0, 3.0]))
+    assert historial.resumen_historial()["filas"] == 3
+
+
+def test_fecha_desconocida_queda_nula_y_cuenta_por_dia_de_clasificacion():
+    textos = pd.Series(["Se cortó la luz", "No anda el ascensor"])
+    historial.guardar_corrida("a.xlsx", "h1", textos, [CATEGORIAS[0]] * 2, ["r", "r"], "modelo", fechas=pd.Series(["01/02/2024", "no es fecha"]))
+    assert _fecha_guardada(1) is None
+
+    hoy = pd.Timestamp.now().strftime("%Y-%m-%d")
+    resumen = historial.resumen_historial()
+    assert (resumen["desde"], resumen["hasta"]) == ("2024-02-01", hoy)
+    por_mes = historial.quejas_por_mes()
+    assert por_mes.index.tolist() == ["2024-02", hoy[:7]]
+    assert len(historial.quejas_por_mes(desde="2024-01-01", hasta="2024-12-31")) == 1
+
+
+def test_reutilizar_por_texto_normalizado():
+    historial.guardar_corrida("a.xlsx", "h1", pd.Series(["Se cortó la luz"]), [CATEGORIAS[0]], ["r"], "modelo")
+    categorias, razones = historial.reutilizar_del_historial(pd.Series(["Se cortó la luz", "Otra queja"]))
+    assert categorias[0] == CATEGORIAS[0] and razones[0] == "r"
+    assert categorias.isna()[1] and razones.isna()[1]
+
+
+def test_buscar_quejas():
+    textos = pd.Series(["Se cortó la luz en el pasillo", "No anda el ascensor"])
+    historial.guardar_corrida("a.xlsx", "h1", textos, [CATEGORIAS[0]] * 2, ["r", "r"], "modelo", fechas=pd.Series(["01/02/2024"] * 2))
+    encontradas = historial.buscar_quejas("ascensor")
+    assert encontradas["texto"].tolist() == ["No anda el ascensor"]
+    assert encontradas["fecha"].tolist() == ["2024-02-01"]
@@ -0,0 +1,55 @@
+import pandas as pd
+import pytest
+
+from incremental import COLUMNA_CATEGORIA, COLUMNA_RAZON, huellas, normalizar_ids, reutilizar_clasificaciones
+
+
+def test_huellas_ignoran_mayusculas_y_espacios():
+    h = huellas(pd.Series(["  El tren  llegó TARDE ", "el tren llegó tarde", "otra queja", None]))
+    assert h[0] == h[1]
+    assert h[1] != h[2]
+    assert h.dtype == "uint64"
+
+
+def test_huellas_con_id_distinguen_textos_repetidos():
+    textos = pd.Series(["mismo texto", "mismo texto"])
+    assert huellas(textos)[0] == huellas(textos)[1]
+    h = huellas(textos, pd.Series([1, 2]))
+    assert h[0] != h[1]
+
+
+def test_reutiliza_solo_clasificaciones_validas():
+    previo = pd.DataFrame({
+        "Queja": ["Se cortó la luz", "No anda el ascensor", "Tren sucio"],
+        COLUMNA_CATEGORIA: ["Infraestructura y Mantenimiento", "ERROR_API", "Ambiente y Confort"],
+        COLUMNA_RAZON: ["r1", "r2", "r3"],
+    })
+    textos = pd.Series(["tren sucio", "Queja nueva", "No anda el ascensor", "se cortó la luz"], index=[10, 11, 12, 13])
+    categorias, razones = reutilizar_clasificaciones(textos, previo, "Queja")
+    assert categorias.index.tolist() == [10, 11, 12, 13]
+    assert categorias[10] == "Ambiente y Confort" and razones[10] == "r3"
+    assert categorias[13] == "Infraestructura y Mantenimiento"
+    assert categorias[[11, 12]].isna().all()
+
+
+def test_columnas_faltantes_en_el_archivo_anterior():
+    with pytest.raises(ValueError, match="Razon-Gemini"):
+        reutilizar_clasificaciones(pd.Series(["a"]), pd.DataFrame({"Queja": ["a"], COLUMNA_CATEGORIA: ["Otros"]}), "Queja")
+
+
+def test_ids_numericos_leidos_como_float_siguen_coincidiendo():
+    # En el archivo anterior la columna de ID tiene un blanco, así que pandas la lee como float
+    previo = pd.DataFrame({
+        "ID": [1.0, None, 3.0],
+        "Queja": ["Tren sucio", "Sin ID", "Tren sucio"],
+        COLUMNA_CATEGORIA: ["Ambiente y Confort", "Otros", "Otros"],
+        COLUMNA_RAZON: ["r1", "r2", "r3"],
+    })
+    textos = pd.Series(["Tren sucio", "Tren sucio", "Sin ID"])
+    categorias, _ = reutilizar_clasificaciones(textos, previo, "Queja", pd.Series([3, 1, None]), "ID")
+    assert categorias.tolist() == ["Otros", "Ambiente y Confort", "Otros"]
+
+
+def test_normalizar_ids():
+    ids = pd.Series([1.0, "007", " A-12 ", None, 2.5, "1e3"])
+    assert normalizar_ids(ids).tolist() == ["1", "7", "A-12", "", "2.5", "1000"]
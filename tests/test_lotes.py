@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from lotes import LOTES_POR_MEDICION, MAX_FILAS_LOTE, ControladorLote, costos_por_fila, generar_lotes, ordenar_por_longitud
+
+
+def test_orden_por_longitud_es_estable():
+    costos = costos_por_fila(pd.Series(["largo " * 50, "corto", None, "corto"]))
+    assert ordenar_por_longitud(costos).tolist() == [2, 1, 3, 0]
+
+
+def test_lotes_respetan_filas_y_tokens():
+    costos = np.array([10.0, 10.0, 10.0, 55.0, 100.0])
+    lotes = list(generar_lotes(np.arange(5), costos, max_filas=2, max_tokens=60))
+    assert lotes == [[0, 1], [2], [3], [4]] # La fila 4 supera max_tokens y va sola
+    assert sorted(sum(lotes, [])) == list(range(5))
+
+
+def test_max_filas_se_consulta_en_cada_lote():
+    tamanos = iter([1, 3, 2])
+    lotes = list(generar_lotes(np.arange(6), np.ones(6), max_filas=lambda: next(tamanos), max_tokens=100))
+    assert lotes == [[0], [1, 2, 3], [4, 5]]
+
+
+def _medir(controlador, rendimiento):
+    """Registra LOTES_POR_MEDICION lotes completos con el rendimiento indicado (tokens/s)."""
+    for _ in range(LOTES_POR_MEDICION):
+        tamano = controlador.registrar(controlador.tamano(), rendimiento, 1.0)
+    return tamano
+
+
+def test_controlador_respeta_los_limites():
+    assert ControladorLote(500).tamano() == MAX_FILAS_LOTE
+    assert ControladorLote(0).tamano() == 1
+
+
+def test_controlador_achica_ante_429_o_errores_de_formato():
+    controlador = ControladorLote(40)
+    assert controlador.registrar(40, 1000, 1.0, limitado=True) == 20
+    assert controlador.registrar(20, 1000, 1.0, fallas_formato=3) == 10
+    assert controlador.registrar(10, 1000, 1.0, fallas_formato=1) == 10 # 10 %: no supera el umbral
+
+
+def test_controlador_crece_mientras_mejora_y_se_asienta_si_empeora():
+    controlador = ControladorLote(10)
+    assert _medir(controlador, 1000) == 15
+    assert _medir(controlador, 2000) > 15
+    grande = controlador.tamano()
+    assert _medir(controlador, 1000) < grande # Empeoró: invierte la dirección
+
+
+def test_controlador_ignora_lotes_recortados():
+    controlador = ControladorLote(10)
+    for _ in range(5):
+        assert controlador.registrar(3, 1000, 1.0) == 10
+    assert len(controlador.historial) == 5
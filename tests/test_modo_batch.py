@@ -0,0 +1,122 @@
+import importlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import modo_batch
+from categorias import CATEGORIAS
+
+
+class _ProveedorFalso(BaseHTTPRequestHandler):
+    """Imita lo justo de las APIs batch de OpenAI y Gemini: subida, envío, estado y descarga."""
+    solicitudes = [] # Líneas del JSONL subido
+    consultas_estado = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self, cuerpo, encabezados=None):
+        datos = cuerpo if isinstance(cuerpo, bytes) else json.dumps(cuerpo).encode("utf-8")
+        self.send_response(200)
+        for nombre, valor in (encabezados or {}).items():
+            self.send_header(nombre, valor)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def _guardar_jsonl(self, cuerpo):
+        lineas = (linea.strip() for linea in cuerpo.decode("utf-8").split("\n"))
+        type(self).solicitudes = [json.loads(linea) for linea in lineas if linea.startswith("{")]
+
+    def _resultados(self, proveedor):
+        # Respuestas en orden inverso, con una fila fallida, para probar la combinación por fila
+        lineas = []
+        for solicitud in reversed(self.solicitudes):
+            clave = solicitud.get("custom_id") or solicitud.get("key")
+            fila = int(clave.rsplit("-", 1)[1])
+            texto = f"Categoría: {CATEGORIAS[fila]}\nRazón: fila {fila}"
+            if fila == 1:
+                registro = {"error": {"message": "rechazada"}}
+            elif proveedor == "openai":
+                registro = {"response": {"body": {"choices": [{"message": {"content": texto}}]}}}
+            else:
+                registro = {"response": {"candidates": [{"content": {"parts": [{"text": texto}]}}]}}
+            lineas.append(json.dumps({("custom_id" if proveedor == "openai" else "key"): clave, **registro}))
+        return "\n".join(lineas).encode("utf-8")
+
+    def _estado(self, en_proceso, completado):
+        type(self).consultas_estado += 1
+        return completado if self.consultas_estado > 1 else en_proceso
+
+    def do_POST(self):
+        cuerpo = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path == "/v1/files":
+            self._guardar_jsonl(cuerpo)
+            self._responder({"id": "archivo-entrada"})
+        elif self.path == "/v1/batches":
+            self._responder({"id": "lote-1", "status": "validating"})
+        elif self.path == "/upload/v1beta/files":
+            self._responder(b"", {"X-Goog-Upload-URL": f"http://127.0.0.1:{self.server.server_port}/subida"})
+        elif self.path == "/subida":
+            self._guardar_jsonl(cuerpo)
+            self._responder({"file": {"name": "files/entrada"}})
+        elif self.path.endswith(":batchGenerateContent"):
+            self._responder({"name": "batches/lote-1"})
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        if self.path == "/v1/batches/lote-1":
+            self._responder({**self._estado({"status": "in_progress"}, {"status": "completed"}), "output_file_id": "archivo-salida"})
+        elif self.path == "/v1/files/archivo-salida/content":
+            self._responder(self._resultados("openai"))
+        elif self.path == "/v1beta/batches/lote-1":
+            self._responder(self._estado(
+                {"metadata": {"state": "BATCH_STATE_RUNNING"}},
+                {"metadata": {"state": "BATCH_STATE_SUCCEEDED"}, "response": {"responsesFile": "files/salida"}},
+            ))
+        elif self.path == "/download/v1beta/files/salida:download?alt=media":
+            self._responder(self._resultados("gemini"))
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def batch(tmp_path, monkeypatch):
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _ProveedorFalso)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    _ProveedorFalso.solicitudes, _ProveedorFalso.consultas_estado = [], 0
+    base = f"http://127.0.0.1:{servidor.server_port}"
+    monkeypatch.setenv("OPENAI_BASE_URL", f"{base}/v1")
+    monkeypatch.setenv("GEMINI_BASE_URL", base)
+    monkeypatch.setenv("RUTA_TRABAJOS_BATCH", str(tmp_path / "trabajos.json"))
+    yield importlib.reload(modo_batch)
+    servidor.shutdown()
+    servidor.server_close()
+    monkeypatch.undo()
+    importlib.reload(modo_batch)
+
+
+@pytest.mark.parametrize("proveedor", ["openai", "gemini"])
+def test_envio_sondeo_y_combinacion_por_fila(batch, proveedor):
+    textos = pd.Series(["queja cero", "queja uno", "queja dos", "queja tres"])
+    trabajo = batch.enviar_trabajo(textos, proveedor, "modelo", "clave", "quejas.xlsx", "a" * 40, "Queja", total=6, posiciones=[0, 1, 2, 4])
+    assert trabajo["id"] in ("lote-1", "batches/lote-1")
+    assert len(_ProveedorFalso.solicitudes) == 4
+
+    assert batch.actualizar_estado(trabajo, "clave")["estado"] == "en_proceso"
+    batch.iniciar_sondeo(trabajo, "clave", intervalo=0.01)
+    limite = time.monotonic() + 5
+    while batch.cargar_trabajos()[0]["estado"] != "completado" and time.monotonic() < limite:
+        time.sleep(0.01)
+    trabajo = batch.cargar_trabajos()[0]
+    assert trabajo["estado"] == "completado"
+
+    resultados = batch.descargar_resultados(trabajo, "clave")
+    combinados = batch.combinar_resultados(trabajo["total"], resultados)
+    assert list(combinados.categorias) == [CATEGORIAS[0], "ERROR_API", CATEGORIAS[2], "NO_CLASIFICADO", CATEGORIAS[4], "NO_CLASIFICADO"]
+    assert combinados.razones[4] == "fila 4"
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from circuito import Circuito, ABIERTO, CERRADO
+from multiarchivo import armar_cola, clasificador_compartido, _nombre_hoja
+
+
+class _SinLimite:
+    def esperar(self):
+        pass
+
+
+class _Presupuesto:
+    def agotado(self):
+        return False
+
+
+def _circuito_semiabierto():
+    circuito = Circuito("prueba", minimo_llamadas=1, pausa_inicial=0.1, tiempo_maximo_abierto=3)
+    circuito.registrar_fallo() # Se abre
+    time.sleep(0.15) # Pasa la pausa: la próxima llamada es la prueba
+    return circuito
+
+
+@pytest.mark.parametrize("origen", ["cache", "compartida"])
+def test_la_prueba_del_circuito_se_libera_si_la_respuesta_no_viene_de_la_api(origen):
+    circuito = _circuito_semiabierto()
+    clasificar = clasificador_compartido(
+        lambda texto: ("Otros", "ok", origen), lambda texto: None, circuito, _SinLimite(), _Presupuesto()
+    )
+    assert clasificar("tren tarde") == ("Otros", "ok", origen)
+    assert circuito.estado == CERRADO
+
+    inicio = time.monotonic()
+    assert circuito.esperar_turno()
+    assert time.monotonic() - inicio < 0.5
+
+
+def test_la_prueba_se_libera_si_la_llamada_lanza_una_excepcion():
+    circuito = _circuito_semiabierto()
+
+    def falla(texto):
+        raise RuntimeError("sin red")
+
+    clasificar = clasificador_compartido(falla, lambda texto: None, circuito, _SinLimite(), _Presupuesto())
+    with pytest.raises(RuntimeError):
+        clasificar("tren tarde")
+    assert circuito.estado == ABIERTO and not circuito._prueba_en_curso
+
+
+def test_un_acierto_de_cache_no_pide_turno_al_circuito():
+    circuito = _circuito_semiabierto()
+    circuito.permitir() # Otro hilo tiene la prueba en curso
+    llamadas = []
+    clasificar = clasificador_compartido(
+        lambda texto: llamadas.append(texto), lambda texto: ("Otros", "en caché"), circuito, _SinLimite(), _Presupuesto()
+    )
+    resultado = []
+    hilo = threading.Thread(target=lambda: resultado.append(clasificar("tren tarde")))
+    hilo.start()
+    hilo.join(timeout=1)
+    assert resultado == [("Otros", "en caché", "cache")]
+    assert llamadas == []
+
+
+def test_armar_cola_elimina_repetidos_entre_hojas():
+    libros = {
+        "a.xlsx": {"enero": pd.DataFrame({"q": ["Tren tarde", "", "tren  tarde"]})},
+        "b.xlsx": {"febrero": pd.DataFrame({"q": ["Tren tarde"]}), "otra": pd.DataFrame({"x": [1]})},
+    }
+    cola, unicos, omitidas = armar_cola(libros, "q")
+    assert len(cola) == 4
+    assert omitidas == ["b.xlsx / otra"]
+    assert unicos == ["Tren tarde", "tren tarde"]
+    assert cola["unico"].tolist() == [0, -1, 1, 0]
+
+
+def test_nombre_hoja_respeta_el_limite_de_excel_y_no_repite():
+    usados = set()
+    largo = "reclamos_linea_sarmiento_regional_oeste.xlsx"
+    primero = _nombre_hoja(largo, "2025-03", usados)
+    segundo = _nombre_hoja(largo, "2025-03", usados)
+    assert len(primero) <= 31 and primero.endswith("-2025-03")
+    assert segundo != primero and len(segundo) <= 31
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+import planificador
+from planificador import Presupuesto, registrar_uso
+
+
+@pytest.fixture(autouse=True)
+def calibracion_limpia(monkeypatch):
+    monkeypatch.setattr(planificador, "_calibracion", dict(planificador._calibracion))
+
+
+def _uso(entrada, salida):
+    return SimpleNamespace(prompt_token_count=entrada, candidates_token_count=salida, thoughts_token_count=0)
+
+
+def test_presupuesto_por_tokens():
+    presupuesto = Presupuesto("gemini-2.5-flash", max_tokens=1000)
+    presupuesto.registrar(600, 300)
+    assert not presupuesto.agotado()
+    presupuesto.registrar(100, 0)
+    assert presupuesto.agotado()
+
+
+def test_presupuesto_por_costo():
+    presupuesto = Presupuesto("gemini-2.5-flash", max_costo_usd=0.01)
+    assert not presupuesto.agotado()
+    presupuesto.registrar(0, 10_000_000)
+    assert presupuesto.costo() >= 0.01
+    assert presupuesto.agotado()
+
+
+def test_sin_tope_nunca_se_agota():
+    presupuesto = Presupuesto("gemini-2.5-flash", max_costo_usd=0)
+    presupuesto.registrar(10**9, 10**9)
+    assert not presupuesto.agotado()
+
+
+def test_registrar_uso_descuenta_del_presupuesto():
+    presupuesto = Presupuesto("gemini-2.5-flash")
+    registrar_uso("x" * 400, _uso(120, 40), presupuesto=presupuesto)
+    registrar_uso("x" * 400, None, presupuesto=presupuesto) # Respuesta sin metadatos de uso
+    assert (presupuesto.tokens_entrada, presupuesto.tokens_salida) == (120, 40)
+
+
+def test_repregunta_no_calibra_la_salida():
+    antes = dict(planificador._calibracion)
+    registrar_uso("x" * 400, _uso(200, 3), calibrar_salida=False)
+    assert planificador._calibracion["salida"] == antes["salida"]
+    assert planificador._calibracion["entrada"] != antes["entrada"]
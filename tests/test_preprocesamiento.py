@@ -0,0 +1,67 @@
+import pandas as pd
+
+from preprocesamiento import preprocesar, CATEGORIA_SIN_TEXTO, MIN_CARACTERES_UTILES
+
+
+def _limpiar(texto):
+    textos, clasificables, _ = preprocesar(pd.Series([texto]))
+    return textos.iloc[0], bool(clasificables.iloc[0])
+
+
+def test_queja_que_menciona_escribio_conserva_el_texto():
+    texto = "El inspector me escribió: pague la multa. Además el tren llegó 40 minutos tarde"
+    assert _limpiar(texto) == (texto, True)
+
+
+def test_escribio_al_comienzo_de_linea_sin_forma_de_encabezado_no_corta():
+    texto = "Me multaron injustamente.\nEl guarda me escribió:\nque no tenía boleto, pero sí lo tenía."
+    limpio, clasificable = _limpiar(texto)
+    assert "que no tenía boleto" in limpio
+    assert clasificable
+
+
+def test_on_wrote_dentro_de_una_frase_no_corta():
+    texto = "On the platform someone wrote: no trains today. The 8:15 never arrived."
+    assert _limpiar(texto)[0] == texto
+
+
+def test_se_quita_el_hilo_citado_de_gmail():
+    texto = (
+        "El tren de las 7 no paró en Morón.\n"
+        "El lun, 3 mar 2025 a las 10:00, Atención <atencion@ferro.com> escribió:\n"
+        "> Gracias por comunicarse"
+    )
+    assert _limpiar(texto)[0] == "El tren de las 7 no paró en Morón."
+
+
+def test_se_quita_el_hilo_citado_de_outlook():
+    texto = (
+        "Los baños de Retiro siguen cerrados.\n"
+        "De: Atención al Usuario\n"
+        "Enviado: lunes, 3 de marzo de 2025 10:00\n"
+        "Asunto: Reclamo 123"
+    )
+    assert _limpiar(texto)[0] == "Los baños de Retiro siguen cerrados."
+
+
+def test_de_sin_linea_enviado_no_corta():
+    texto = "Viajo todos los días.\nDe: Castelar a Once tardé dos horas."
+    assert _limpiar(texto)[0] == "Viajo todos los días. De: Castelar a Once tardé dos horas."
+
+
+def test_se_quitan_firmas_y_lineas_citadas():
+    texto = "Ventanilla cerrada en Haedo.\n> mensaje anterior\nEnviado desde mi iPhone"
+    assert _limpiar(texto)[0] == "Ventanilla cerrada en Haedo."
+
+
+def test_filas_vacias_o_triviales_no_son_clasificables():
+    textos, clasificables, resumen = preprocesar(pd.Series(["", None, "ok", "x" * MIN_CARACTERES_UTILES]))
+    assert clasificables.tolist() == [False, False, False, True]
+    assert resumen["filas_omitidas"] == 3
+    assert CATEGORIA_SIN_TEXTO == "SIN_TEXTO"
+
+
+def test_trunca_al_maximo_de_tokens():
+    textos, _, resumen = preprocesar(pd.Series(["palabra " * 2000]), max_tokens=10)
+    assert len(textos.iloc[0]) < 100
+    assert resumen["filas_truncadas"] == 1
@@ -0,0 +1,74 @@
+import pytest
+
+pytest.importorskip("streamlit")
+
+import progreso
+from progreso import ReporteProgreso, formatear_duracion
+
+
+class _Elemento:
+    """Registra lo que se dibuja en una barra de progreso o un st.empty()."""
+
+    def __init__(self):
+        self.valores = []
+
+    def progress(self, valor):
+        self.valores.append(valor)
+
+    def text(self, texto):
+        self.valores.append(texto)
+
+
+@pytest.fixture
+def ui(monkeypatch):
+    barra, estado, ahora = _Elemento(), _Elemento(), [1000.0]
+    monkeypatch.setattr(progreso.st, "progress", lambda valor: barra.valores.append(valor) or barra, raising=False)
+    monkeypatch.setattr(progreso.st, "empty", lambda: estado, raising=False)
+    monkeypatch.setattr(progreso.time, "monotonic", lambda: ahora[0])
+    return barra, estado, ahora
+
+
+def test_formatear_duracion():
+    assert [formatear_duracion(s) for s in (-1, 12, 185, 3720)] == ["0s", "12s", "3m 05s", "1h 02m"]
+
+
+def test_redibuja_como_maximo_una_vez_por_intervalo(ui):
+    barra, estado, ahora = ui
+    reporte = ReporteProgreso(100, intervalo=0.5)
+    reporte.avanzar()
+    dibujos = len(estado.valores)
+    assert dibujos == 1
+    for _ in range(20):
+        reporte.avanzar()
+    assert len(estado.valores) == dibujos # Sin pasar el intervalo no se redibuja
+    ahora[0] += 0.5
+    reporte.avanzar()
+    assert len(estado.valores) == dibujos + 1
+    assert barra.valores[-1] == pytest.approx(0.22)
+
+
+def test_la_ultima_fila_siempre_se_dibuja(ui):
+    barra, estado, ahora = ui
+    reporte = ReporteProgreso(3, intervalo=60)
+    reporte.avanzar(2)
+    reporte.avanzar()
+    assert barra.valores[-1] == 1.0
+    assert estado.valores[-1].startswith("3/3 filas")
+
+
+def test_resumen_con_velocidad_eta_cache_y_errores(ui):
+    _, _, ahora = ui
+    reporte = ReporteProgreso(100)
+    ahora[0] += 10
+    reporte.avanzar(20, errores=2, aciertos_cache=5)
+    assert reporte.resumen() == "20/100 filas · 2.0 filas/s · ETA 40s · caché 25% · errores 2"
+
+
+def test_reiniciar_para_una_pasada_nueva(ui):
+    barra, estado, _ = ui
+    reporte = ReporteProgreso(10)
+    reporte.avanzar(10, errores=3)
+    reporte.reiniciar(3, "Pasada de reintentos")
+    assert (reporte.total, reporte.procesadas, reporte.errores) == (3, 0, 0)
+    assert barra.valores[-1] == 0.0
+    assert estado.valores[-1].startswith("Pasada de reintentos\n0/3 filas")
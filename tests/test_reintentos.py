@@ -0,0 +1,57 @@
+import pytest
+
+import reintentos
+from reintentos import drenar_cola, es_fila_fallida, filas_fallidas
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    registradas = []
+    monkeypatch.setattr(reintentos.time, "sleep", registradas.append)
+    return registradas
+
+
+def test_filas_fallidas():
+    categorias = ["Otros", "ERROR_API", "", "NO_CLASIFICADO", "ERROR_RARO", "SIN_TEXTO"]
+    assert [es_fila_fallida(c) for c in categorias] == [False, True, True, True, True, False]
+    assert filas_fallidas(categorias) == [1, 2, 3, 4]
+    assert filas_fallidas(categorias, [0, 4]) == [4]
+
+
+def test_sin_pausas_cuando_los_reintentos_salen_bien(esperas):
+    resultados = drenar_cola([3, 5, 7], lambda lote, modelo: {i: ("Otros", "ok") for i in lote}, pausa_entre_llamadas=1.0)
+    assert resultados == {i: ("Otros", "ok") for i in (3, 5, 7)}
+    assert esperas == []
+
+
+def test_pausa_solo_tras_llamadas_fallidas_y_espera_entre_pasadas(esperas):
+    intentos = {}
+
+    def clasificar(lote, modelo):
+        (i,) = lote
+        intentos[i] = intentos.get(i, 0) + 1
+        return {i: ("ERROR_API", "429") if i == 1 and intentos[i] == 1 else ("Otros", "ok")}
+
+    resultados = drenar_cola([0, 1, 2], clasificar, pausa_entre_llamadas=1.0, espera_inicial=10)
+    assert resultados[1] == ("Otros", "ok")
+    # Pausa antes de la fila 2 (la 1 falló) y espera antes de la segunda pasada
+    assert esperas == [1.0, 10]
+
+
+def test_modelo_de_respaldo_en_la_ultima_pasada(esperas):
+    modelos = []
+
+    def clasificar(lote, modelo):
+        modelos.append(modelo)
+        return {}
+
+    resultados = drenar_cola([0], clasificar, pasadas=3, modelo_respaldo="respaldo", espera_inicial=10, espera_maxima=15)
+    assert modelos == [None, None, "respaldo"]
+    assert resultados[0][0] == "ERROR_LOTE"
+    assert esperas == [10, 15]
+
+
+def test_detener_corta_el_drenado(esperas):
+    llamadas = []
+    drenar_cola([0, 1, 2], lambda lote, modelo: llamadas.append(lote) or {}, detener=lambda: len(llamadas) == 2)
+    assert llamadas == [[0], [1]]
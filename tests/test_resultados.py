@@ -0,0 +1,66 @@
+import numpy as np
+
+from categorias import CATEGORIAS
+from reintentos import filas_fallidas
+from resultados import BufferResultados, Estado, VOCABULARIO
+
+
+def test_vistas_se_indexan_como_listas():
+    buffer = BufferResultados(3)
+    buffer.categorias[0], buffer.razones[0] = "Otros", "motivo"
+    assert buffer.categorias[0] == "Otros"
+    assert buffer.razones[0] == "motivo"
+    assert list(buffer.categorias) == ["Otros", "", ""]
+
+
+def test_error_fuera_del_vocabulario_cuenta_como_fallida():
+    buffer = BufferResultados(5)
+    buffer.categorias[0] = CATEGORIAS[0]
+    buffer.categorias[1] = "ERROR_RARO" # Etiqueta ERROR* que no está en Estado
+    buffer.categorias[2] = "NO_CLASIFICADO"
+    buffer.categorias[3] = "Categoría inventada"
+    # La fila 4 queda pendiente
+    assert buffer.fallidas() == [1, 2, 4]
+    assert buffer.fallidas() == filas_fallidas(buffer.categorias)
+    assert buffer.fallidas([0, 1]) == [1]
+
+
+def test_estados_coinciden_con_el_vocabulario():
+    for estado in Estado:
+        assert VOCABULARIO[estado] == estado.name
+
+
+def test_columna_de_categorias_no_copia_los_codigos():
+    buffer = BufferResultados(4)
+    buffer.asignar(slice(None), "Otros", "r")
+    buffer.categorias[3] = ""
+    columna = buffer.columna_categorias()
+    assert np.shares_memory(columna.codes, buffer.codigos)
+    assert list(columna[:3]) == ["Otros"] * 3
+    assert columna.isna()[3]
+
+
+def test_razones_se_internan():
+    buffer = BufferResultados(1000)
+    buffer.asignar(slice(None), "SIN_TEXTO", "Fila vacía")
+    buffer.razones[0] = "otra"
+    assert len(buffer._razones) == 2
+    assert list(buffer.columna_razones()[:2]) == ["otra", "Fila vacía"]
+
+
+def test_expandir_de_unicos_a_filas():
+    unicos = BufferResultados(2)
+    unicos.categorias[0], unicos.razones[0] = "Otros", "a"
+    unicos.categorias[1], unicos.razones[1] = "ERROR_API", "b"
+    filas = unicos.expandir([0, -1, 1, 0], "SIN_TEXTO", "vacía")
+    assert list(filas.categorias) == ["Otros", "SIN_TEXTO", "ERROR_API", "Otros"]
+    assert list(filas.razones) == ["a", "vacía", "b", "a"]
+
+
+def test_muchas_categorias_no_reconocidas_pasan_a_int16():
+    buffer = BufferResultados(200)
+    for i in range(200):
+        buffer.categorias[i] = f"inventada {i}"
+    assert buffer.codigos.dtype == np.int16
+    assert buffer.categorias[199] == "inventada 199"
+    assert buffer.columna_categorias()[199] == "inventada 199"